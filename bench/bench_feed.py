@@ -0,0 +1,93 @@
+"""Compare the home feed engines on a synthetic database.
+
+Usage: python bench/bench_feed.py [FOLLOWING]
+
+Builds a temporary database of USERS accounts with POSTS_PER_USER posts
+each, in which the viewer follows FOLLOWING accounts (default 500), then
+reports the best-of-REPEAT time to read the first page, and a page deep in
+the history, with each FEED_ENGINE setting.
+"""
+import pathlib
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import insta4288
+from insta4288.rows import record_factory
+
+USERS = 2_000
+POSTS_PER_USER = 20
+REPEAT = 20
+PAGE_SIZE = 10
+SQL_DIR = pathlib.Path(__file__).resolve().parent.parent/"sql"
+
+
+def build_database(path, following):
+    """Create the schema, fill it and apply the migrations."""
+    connection = sqlite3.connect(path)
+    connection.executescript((SQL_DIR/"schema.sql").read_text())
+    rng = random.Random(4288)
+    users = [f"user{i}" for i in range(USERS)]
+    connection.executemany(
+        "INSERT INTO users(username, fullname, email, filename, password) "
+        "VALUES (?, ?, ?, 'x.jpg', 'x')",
+        [(name, name, f"{name}@example.com") for name in users],
+    )
+    connection.executemany(
+        "INSERT INTO following(username1, username2) VALUES ('user0', ?)",
+        [(name,) for name in rng.sample(users[1:], following)],
+    )
+    # Interleave authors so postid order mixes everyone's posts
+    connection.executemany(
+        "INSERT INTO posts(owner, filename) VALUES (?, 'x.jpg')",
+        [(rng.choice(users),) for _ in range(USERS * POSTS_PER_USER)],
+    )
+    connection.commit()
+    for migration in sorted((SQL_DIR/"migrations").glob("*.sql")):
+        connection.executescript(migration.read_text())
+    connection.execute("ANALYZE")
+    connection.close()
+
+
+def measure(connection, engine, before):
+    """Return the best time to read one page with `engine`."""
+    insta4288.app.config["FEED_ENGINE"] = engine
+    insta4288.app.config["FEED_CACHE"] = False
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        rows = insta4288.feed.fetch_page(connection, "user0", before,
+                                         PAGE_SIZE)
+        best = min(best, time.perf_counter() - start)
+    assert len(rows) == PAGE_SIZE
+    return best
+
+
+def main():
+    """Run every engine on the first page and on a page deep in history."""
+    following = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = pathlib.Path(tmpdir)/"feed.sqlite3"
+        build_database(path, following)
+        connection = sqlite3.connect(path)
+        connection.row_factory = record_factory
+        deep = connection.execute(
+            "SELECT postid FROM timeline WHERE username = 'user0' "
+            "ORDER BY postid LIMIT 1 OFFSET 100"
+        ).fetchone()["postid"]
+
+        print(f"viewer follows {following} of {USERS} accounts, "
+              f"{USERS * POSTS_PER_USER} posts, page size {PAGE_SIZE}")
+        print(f"{'engine':<10} {'first page':>12} {'deep page':>12}")
+        for engine in ("sql", "timeline", "merge"):
+            first = measure(connection, engine, 2 ** 63 - 1)
+            older = measure(connection, engine, deep)
+            print(f"{engine:<10} {first * 1000:9.2f} ms "
+                  f"{older * 1000:9.2f} ms")
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
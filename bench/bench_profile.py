@@ -0,0 +1,94 @@
+"""Time the profile page query against the account's follower count.
+
+Usage: python bench/bench_profile.py [FOLLOWERS]
+
+Builds a temporary database in which one account, "star", has FOLLOWERS
+followers (default 1,000,000) and POSTS posts, and a second account,
+"quiet", has the same posts and one follower.  Reports the best-of-REPEAT
+time for load_profile() on each, as seen by a follower and by a stranger.
+The two should match: the header reads the counters kept in user_stats and
+logname's relationship is one primary key lookup.
+"""
+import pathlib
+import sqlite3
+import sys
+import tempfile
+import time
+
+import insta4288
+from insta4288.rows import record_factory
+
+POSTS = 24
+REPEAT = 200
+SQL_DIR = pathlib.Path(__file__).resolve().parent.parent/"sql"
+
+
+def build_database(path, followers):
+    """Create the schema, fill it and apply the migrations."""
+    connection = sqlite3.connect(path)
+    connection.executescript((SQL_DIR/"schema.sql").read_text())
+    # Migrations first, so the triggers keep user_stats as rows arrive
+    for migration in sorted((SQL_DIR/"migrations").glob("*.sql")):
+        connection.executescript(migration.read_text())
+    fans = (f"fan{i}" for i in range(followers))
+    connection.executemany(
+        "INSERT INTO users(username, fullname, email, filename, password) "
+        "VALUES (?, ?, ?, 'x.jpg', 'x')",
+        [(name, name, f"{name}@example.com")
+         for name in ("star", "quiet", "stranger")],
+    )
+    connection.executemany(
+        "INSERT INTO users(username, fullname, email, filename, password) "
+        "VALUES (?, ?, '', 'x.jpg', 'x')",
+        ((name, name) for name in fans),
+    )
+    connection.executemany(
+        "INSERT INTO following(username1, username2) VALUES (?, 'star')",
+        ((f"fan{i}",) for i in range(followers)),
+    )
+    connection.execute(
+        "INSERT INTO following(username1, username2) VALUES ('fan0', 'quiet')"
+    )
+    connection.executemany(
+        "INSERT INTO posts(owner, filename) VALUES (?, 'x.jpg')",
+        [(owner,) for owner in ("star", "quiet") for _ in range(POSTS)],
+    )
+    connection.commit()
+    connection.execute("ANALYZE")
+    connection.close()
+
+
+def measure(connection, logname, username):
+    """Return the best time to load username's profile as logname."""
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        profile = insta4288.views.users.load_profile(
+            connection, logname, username, insta4288.feed.NEWEST, POSTS
+        )
+        best = min(best, time.perf_counter() - start)
+    assert len(profile["posts"]) == POSTS
+    return best, profile["followers"]
+
+
+def main():
+    """Load both profiles as a follower and as a stranger."""
+    followers = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = pathlib.Path(tmpdir)/"profile.sqlite3"
+        build_database(path, followers)
+        connection = sqlite3.connect(path)
+        connection.row_factory = record_factory
+
+        print(f"{'profile':<8} {'followers':>10} {'as fan0':>12} "
+              f"{'as stranger':>12}")
+        for username in ("quiet", "star"):
+            fan, count = measure(connection, "fan0", username)
+            stranger, _ = measure(connection, "stranger", username)
+            print(f"{username:<8} {count:>10} {fan * 1e6:9.1f} us "
+                  f"{stranger * 1e6:9.1f} us")
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
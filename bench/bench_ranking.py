@@ -0,0 +1,66 @@
+"""Time ranked feed scoring.
+
+Usage: python bench/bench_ranking.py [CANDIDATES]
+
+Builds CANDIDATES (default 10,000) random candidate rows, as the
+rank_candidates query returns them, and reports the best-of-REPEAT time to
+load them into NumPy, to score them and to cut the first page.
+"""
+import random
+import sys
+import time
+
+import numpy as np
+
+import insta4288
+from insta4288 import ranking
+
+REPEAT = 50
+PAGE_SIZE = 10
+
+
+def candidate_rows(count):
+    """Return `count` random (postid, created, likes, comments, affinity)."""
+    rng = random.Random(4288)
+    now = int(time.time())
+    return [
+        (postid, now - rng.randrange(30 * 86400), rng.randrange(200),
+         rng.randrange(30), rng.choice((0, 0, 0, 1, 5, 20)))
+        for postid in range(count, 0, -1)
+    ]
+
+
+def best_of(function, *args):
+    """Return the best time for function(*args) and its result."""
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    """Time each step on the same candidates."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rows = candidate_rows(count)
+    config = insta4288.app.config
+    now = time.time()
+
+    load, candidates = best_of(
+        lambda: np.fromiter(rows, dtype=ranking.CANDIDATE, count=len(rows))
+    )
+    scoring, scores = best_of(
+        ranking.score, candidates, now, config["FEED_RANK_HALF_LIFE"],
+        config["FEED_RANK_WEIGHTS"],
+    )
+    cut, _ = best_of(ranking.top, candidates["postid"], scores, 0, PAGE_SIZE)
+
+    print(f"{count} candidates, best of {REPEAT}")
+    print(f"load   {load * 1000:7.2f} ms")
+    print(f"score  {scoring * 1000:7.2f} ms")
+    print(f"top    {cut * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
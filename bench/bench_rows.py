@@ -0,0 +1,80 @@
+"""Compare row factories on 10k feed-shaped rows.
+
+Usage: python bench/bench_rows.py
+
+Reports time and peak allocated memory for fetching 10,000 rows with the
+original dict_factory (with and without the extra dict() copy the views used
+to make) and with insta4288.rows.record_factory.
+"""
+import sqlite3
+import time
+import tracemalloc
+
+from insta4288.rows import record_factory
+
+ROWS = 10_000
+REPEAT = 20
+QUERY = """
+    SELECT postid, filename AS img_url, owner, owner_img_url, created,
+           likes, user_liked
+    FROM feed
+"""
+
+
+def dict_factory(cursor, row):
+    """Return a dict keyed on column name (the factory being replaced)."""
+    return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
+
+
+def dict_factory_copied(connection):
+    """Fetch with dict_factory, then copy each row as the views did."""
+    return [dict(row) for row in connection.execute(QUERY).fetchall()]
+
+
+def make_connection(factory):
+    """Return an in-memory database holding ROWS feed rows."""
+    connection = sqlite3.connect(":memory:")
+    connection.execute(
+        "CREATE TABLE feed(postid INTEGER, filename TEXT, owner TEXT, "
+        "owner_img_url TEXT, created TEXT, likes INTEGER, user_liked INTEGER)"
+    )
+    connection.executemany(
+        "INSERT INTO feed VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(i, f"{i:040x}.jpg", f"user{i % 97}", f"{i % 97:040x}.jpg",
+          "2024-01-01 00:00:00", i % 13, i % 2) for i in range(ROWS)],
+    )
+    connection.row_factory = factory
+    return connection
+
+
+def measure(label, connection, fetch):
+    """Print best-of-REPEAT time and peak allocation for one strategy."""
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fetch(connection)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    rows = fetch(connection)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(rows) == ROWS
+    print(f"{label:<28} {best * 1000:8.2f} ms {peak / 1024:10.0f} KiB")
+
+
+def main():
+    """Run all strategies."""
+    print(f"{'strategy':<28} {'time':>11} {'peak mem':>14}  ({ROWS} rows)")
+    measure("dict_factory + dict() copy", make_connection(dict_factory),
+            dict_factory_copied)
+    measure("dict_factory",
+            make_connection(dict_factory),
+            lambda connection: connection.execute(QUERY).fetchall())
+    measure("record_factory",
+            make_connection(record_factory),
+            lambda connection: connection.execute(QUERY).fetchall())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Compare relative timestamp formatting with arrow's humanize().
+
+Usage: python bench/bench_timestamps.py [POSTS]
+
+Formats POSTS (default 1000) `created` values, spread over the last two
+years, the way a page of that many posts would: once per post with arrow,
+and with insta4288.timestamps against a single "now".  Reports the
+best-of-REPEAT time for each, and checks that the labels agree.
+"""
+import random
+import sys
+import time
+
+import arrow
+
+from insta4288 import timestamps
+
+REPEAT = 20
+SPAN = 2 * 365 * 86400
+
+
+def created_values(count):
+    """Return `count` SQLite timestamps from the last two years."""
+    rng = random.Random(4288)
+    now = time.time()
+    return [
+        time.strftime("%Y-%m-%d %H:%M:%S",
+                      time.gmtime(now - rng.randrange(SPAN)))
+        for _ in range(count)
+    ]
+
+
+def best_of(format_page, values):
+    """Return the best time for format_page(values) and its labels."""
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        labels = format_page(values)
+        best = min(best, time.perf_counter() - start)
+    return best, labels
+
+
+def with_arrow(values):
+    """Format each value with arrow, as the views used to."""
+    return [arrow.get(value).humanize() for value in values]
+
+
+def with_timestamps(values):
+    """Format each value against one "now", as a request does."""
+    now = time.time()
+    return [timestamps.humanize(value, now) for value in values]
+
+
+def main():
+    """Time both formatters on the same values."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    values = created_values(count)
+    arrow_time, expected = best_of(with_arrow, values)
+    fast_time, labels = best_of(with_timestamps, values)
+    mismatches = sum(a != b for a, b in zip(expected, labels))
+
+    print(f"{count} timestamps, best of {REPEAT}")
+    print(f"arrow       {arrow_time * 1000:8.2f} ms")
+    print(f"timestamps  {fast_time * 1000:8.2f} ms "
+          f"({arrow_time / fast_time:.0f}x)")
+    print(f"labels that differ: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,3 +21,9 @@ app.config.from_envvar('INSTA4288_SETTINGS', silent=True)
 # going to tell pylint and pycodestyle to ignore this coding style violation.
 import insta4288.views  # noqa: E402  pylint: disable=wrong-import-position
 import insta4288.model  # noqa: E402  pylint: disable=wrong-import-position
+import insta4288.queries  # noqa: E402  pylint: disable=wrong-import-position
+import insta4288.timestamps  # noqa: E402  pylint: disable=wrong-import-position
+import insta4288.feed  # noqa: E402  pylint: disable=wrong-import-position
+import insta4288.ranking  # noqa: E402  pylint: disable=wrong-import-position
+import insta4288.fragment_cache  # noqa: E402  pylint: disable=wrong-import-position
+import insta4288.api  # noqa: E402  pylint: disable=wrong-import-position
@@ -0,0 +1,35 @@
+"""Insta4288 JSON API, version 1.
+
+URLs:
+    /api/v1/feed/
+    /api/v1/posts/<postid>/
+    /api/v1/posts/<postid>/comments/
+    /api/v1/users/<username>/
+    /api/v1/users/<username>/posts/
+
+Responses are built by the same loaders as the HTML views and carry a strong
+ETag computed from data versions (see insta4288/api/etags.py).  Errors are
+returned as JSON.
+"""
+import flask
+import werkzeug.exceptions
+import insta4288
+
+blueprint = flask.Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+@blueprint.errorhandler(werkzeug.exceptions.HTTPException)
+def handle_error(error):
+    """Return an HTTP error as JSON instead of an HTML page."""
+    response = flask.jsonify(message=error.description,
+                             status_code=error.code)
+    response.status_code = error.code
+    return response
+
+
+# Routes must be on the blueprint before it is registered
+import insta4288.api.feed  # noqa: E402  pylint: disable=wrong-import-position
+import insta4288.api.posts  # noqa: E402  pylint: disable=wrong-import-position
+import insta4288.api.users  # noqa: E402  pylint: disable=wrong-import-position
+
+insta4288.app.register_blueprint(blueprint)
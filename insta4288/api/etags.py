@@ -0,0 +1,39 @@
+"""Conditional GET for the JSON API.
+
+An API response depends on the request URL, on who is asking, and on rows
+whose versions are stamped by sql/migrations/0005_data_versions.sql.  A
+view reads just those versions first, and if the client already holds the
+ETag they hash to, answers 304 without running the queries that build the
+response body.
+"""
+import hashlib
+import json
+import flask
+
+
+def make_etag(*versions):
+    """Return a strong ETag for this request, viewer and `versions`."""
+    key = json.dumps([
+        flask.request.full_path, flask.session.get('logname'), versions,
+    ])
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def not_modified(etag):
+    """Return a 304 response if the client holds `etag`, or None."""
+    if not flask.request.if_none_match.contains_weak(etag):
+        return None
+    return _tag(flask.Response(status=304), etag)
+
+
+def json_response(etag, payload):
+    """Return `payload` as JSON, tagged with `etag`."""
+    return _tag(flask.jsonify(payload), etag)
+
+
+def _tag(response, etag):
+    """Set the ETag, and make clients revalidate before reusing a copy."""
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
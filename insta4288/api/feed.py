@@ -0,0 +1,57 @@
+"""
+JSON API for the home feed.
+
+URL:
+    /api/v1/feed/?before=<postid>&limit=<n>
+"""
+import json
+import flask
+import insta4288
+from insta4288.api import blueprint
+from insta4288.api.etags import json_response, make_etag, not_modified
+from insta4288.views.paging import page_args
+from insta4288.api.posts import post_json
+
+
+@blueprint.route('/feed/')
+def get_feed():
+    """Return a page of logname's feed, newest first.
+
+    Paging works as on the HTML feed.  The ETag covers the page's postids,
+    plus one to tell if there are more, and the versions of those posts and
+    their owners.  A client that holds it gets a 304 after reading the
+    postids (usually from the feed cache) and one query for the versions.
+    """
+    logname = flask.session.get('logname')
+    before, limit = page_args('FEED', 'before', insta4288.feed.NEWEST)
+
+    with insta4288.model.read_scope() as connection:
+        postids = insta4288.feed.page_postids(
+            connection, logname, before, limit + 1
+        )
+        versions = insta4288.queries.fetchall(
+            connection, 'feed_versions', (json.dumps(postids),)
+        )
+        etag = make_etag([
+            (row['postid'], row['post_version'], row['owner_version'])
+            for row in versions
+        ])
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        posts = insta4288.feed.add_likes_and_comments(
+            connection, logname,
+            insta4288.feed.posts_by_id(connection, postids[:limit]),
+        )
+
+    next_url = None
+    if len(postids) > limit:
+        next_url = flask.url_for(
+            'api.get_feed', before=postids[limit - 1],
+            limit=flask.request.args.get('limit', type=int),
+        )
+    return json_response(etag, {
+        'results': [post_json(post) for post in posts],
+        'next': next_url,
+        'url': flask.request.full_path.rstrip('?'),
+    })
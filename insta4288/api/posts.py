@@ -0,0 +1,117 @@
+"""
+JSON API for single posts.
+
+URLs:
+    /api/v1/posts/<postid>/
+    /api/v1/posts/<postid>/comments/?after=<commentid>&limit=<n>
+"""
+import flask
+import insta4288
+from insta4288.api import blueprint
+from insta4288.api.etags import json_response, make_etag, not_modified
+from insta4288.views.paging import page_args
+
+
+def post_json(post):
+    """Return the API representation of a post row with its comments."""
+    return {
+        'postid': post['postid'],
+        'url': flask.url_for('api.get_post', postid=post['postid']),
+        'post_show_url': flask.url_for(
+            'show_post', postid_url_slug=post['postid']
+        ),
+        'owner': post['owner'],
+        'owner_show_url': flask.url_for(
+            'show_user', user_url_slug=post['owner']
+        ),
+        'owner_img_url': flask.url_for(
+            'uploads', filename=post['owner_img_url']
+        ),
+        'img_url': flask.url_for('uploads', filename=post['img_url']),
+        'created': post['created'],
+        'likes': {
+            'count': post['likes'],
+            'logname_likes_this': bool(post['user_liked']),
+        },
+        'comment_count': post['comment_count'],
+        'comments': [comment_json(row) for row in post['comments']],
+    }
+
+
+def comment_json(comment):
+    """Return the API representation of a comment row."""
+    return {
+        'commentid': comment['commentid'],
+        'owner': comment['owner'],
+        'owner_show_url': flask.url_for(
+            'show_user', user_url_slug=comment['owner']
+        ),
+        'text': comment['text'],
+        'logname_owns_this':
+            comment['owner'] == flask.session.get('logname'),
+    }
+
+
+def _post_etag(connection, postid):
+    """Return the ETag for a post's resources, or abort(404)."""
+    row = insta4288.queries.fetchone(connection, 'post_version', (postid,))
+    if row is None:
+        flask.abort(404)
+    return make_etag(row['post_version'], row['owner_version'])
+
+
+def _next_comments(postid, comments, more):
+    """Return the URL of the next page of comments, or None."""
+    if not more:
+        return None
+    return flask.url_for(
+        'api.get_comments', postid=postid,
+        after=comments[-1]['commentid'],
+        limit=flask.request.args.get('limit', type=int),
+    )
+
+
+@blueprint.route('/posts/<int:postid>/')
+def get_post(postid):
+    """Return a post with its likes and first page of comments.
+
+    ?after= and ?limit= page the comments as on the comments endpoint.
+    """
+    logname = flask.session.get('logname')
+    after, limit = page_args('COMMENT', 'after', 0)
+    with insta4288.model.read_scope() as connection:
+        etag = _post_etag(connection, postid)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        post = insta4288.views.posts.load_post(
+            connection, logname, postid, after, limit
+        )
+    payload = post_json(post)
+    payload['next_comments'] = _next_comments(
+        postid, post['comments'], post['more_comments']
+    )
+    return json_response(etag, payload)
+
+
+@blueprint.route('/posts/<int:postid>/comments/')
+def get_comments(postid):
+    """Return a page of a post's comments, oldest first.
+
+    ?after=<commentid> continues after that comment, and ?limit=N sets the
+    page size.
+    """
+    after, limit = page_args('COMMENT', 'after', 0)
+    with insta4288.model.read_scope() as connection:
+        etag = _post_etag(connection, postid)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        comments, more = insta4288.views.posts.load_comments(
+            connection, postid, after, limit
+        )
+    return json_response(etag, {
+        'comments': [comment_json(row) for row in comments],
+        'next': _next_comments(postid, comments, more),
+        'url': flask.request.full_path.rstrip('?'),
+    })
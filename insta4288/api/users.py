@@ -0,0 +1,101 @@
+"""
+JSON API for user profiles.
+
+URLs:
+    /api/v1/users/<username>/
+    /api/v1/users/<username>/posts/?before=<postid>&limit=<n>
+"""
+import flask
+import insta4288
+from insta4288.api import blueprint
+from insta4288.api.etags import json_response, make_etag, not_modified
+from insta4288.views.paging import page_args
+
+
+def _user_etag(connection, username):
+    """Return the ETag for a user's resources, or abort(404)."""
+    row = insta4288.queries.fetchone(connection, 'user_version', (username,))
+    if row is None:
+        flask.abort(404)
+    return make_etag(row['version'])
+
+
+def _next_posts(username, profile):
+    """Return the URL of the next page of a user's posts, or None."""
+    if not profile['more_posts']:
+        return None
+    return flask.url_for(
+        'api.get_user_posts', username=username,
+        before=profile['posts'][-1]['postid'],
+        limit=flask.request.args.get('limit', type=int),
+    )
+
+
+def _posts_json(posts):
+    """Return the API representation of a page of grid posts."""
+    return [
+        {
+            'postid': post['postid'],
+            'url': flask.url_for('api.get_post', postid=post['postid']),
+            'img_url': flask.url_for('uploads', filename=post['img_url']),
+        }
+        for post in posts
+    ]
+
+
+@blueprint.route('/users/<username>/')
+def get_user(username):
+    """Return a user's profile, counts and first page of posts.
+
+    ?before= and ?limit= page the posts as on the posts endpoint.  Posts
+    and deletes stamp a new user version, so the ETag covers every page.
+    """
+    logname = flask.session.get('logname')
+    before, limit = page_args('PROFILE', 'before', insta4288.feed.NEWEST)
+    with insta4288.model.read_scope() as connection:
+        etag = _user_etag(connection, username)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        profile = insta4288.views.users.load_profile(
+            connection, logname, username, before, limit
+        )
+
+    return json_response(etag, {
+        'username': profile['username'],
+        'fullname': profile['fullname'],
+        'user_img_url': flask.url_for(
+            'uploads', filename=profile['user_img_url']
+        ),
+        'total_posts': profile['total_posts'],
+        'followers': profile['followers'],
+        'following': profile['following'],
+        'logname_follows_username': profile['logname_follows_username'],
+        'posts': _posts_json(profile['posts']),
+        'next_posts': _next_posts(username, profile),
+        'url': flask.request.path,
+    })
+
+
+@blueprint.route('/users/<username>/posts/')
+def get_user_posts(username):
+    """Return a page of a user's posts, newest first.
+
+    ?before=<postid> continues below that post, and ?limit=N sets the page
+    size.
+    """
+    logname = flask.session.get('logname')
+    before, limit = page_args('PROFILE', 'before', insta4288.feed.NEWEST)
+    with insta4288.model.read_scope() as connection:
+        etag = _user_etag(connection, username)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        profile = insta4288.views.users.load_profile(
+            connection, logname, username, before, limit
+        )
+    return json_response(etag, {
+        'posts': _posts_json(profile['posts']),
+        'next': _next_posts(username, profile),
+        'url': flask.request.full_path.rstrip('?'),
+    })
@@ -16,5 +16,132 @@ UPLOAD_FOLDER = INSTA4288_ROOT/'var'/'uploads'
 ALLOWED_EXTENSIONS = set(['png', 'jpg', 'jpeg', 'gif'])
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024
 
+# Home feed page size, and the largest page a ?limit= may ask for
+FEED_PAGE_SIZE = 10
+FEED_MAX_PAGE_SIZE = 50
+
+# Feed posts show only their newest FEED_COMMENT_PREVIEW comments, with a
+# link to the post page when there are more
+FEED_COMMENT_PREVIEW = 3
+
+# How the home feed is read: 'timeline' pages through the precomputed
+# timeline table, 'sql' selects from posts by everyone logname follows, and
+# 'merge' reads each followed account's newest posts and merges them in
+# Python (bench/bench_feed.py compares the three).
+# New posts are copied into the timelines of their owner's followers unless
+# the owner has more than TIMELINE_FANOUT_LIMIT followers; those posts are
+# merged in when the feed is read instead.  The choice is made once per post.
+# After changing the limit, run bin/insta4288db timeline with the same
+# TIMELINE_FANOUT_LIMIT.
+FEED_ENGINE = 'timeline'
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Comments on a post page are paged oldest first, COMMENT_PAGE_SIZE at a
+# time; ?limit= may ask for up to COMMENT_MAX_PAGE_SIZE
+COMMENT_PAGE_SIZE = 20
+COMMENT_MAX_PAGE_SIZE = 100
+
+# Followers and following lists are paged by username, PEOPLE_PAGE_SIZE at
+# a time; ?limit= may ask for up to PEOPLE_MAX_PAGE_SIZE
+PEOPLE_PAGE_SIZE = 50
+PEOPLE_MAX_PAGE_SIZE = 200
+
+# The profile post grid is paged newest first, PROFILE_PAGE_SIZE posts at a
+# time; ?limit= may ask for up to PROFILE_MAX_PAGE_SIZE
+PROFILE_PAGE_SIZE = 12
+PROFILE_MAX_PAGE_SIZE = 60
+
+# Cache the parts of a post page every viewer sees alike, for up to
+# POST_FRAGMENT_CACHE_SIZE pages per worker (insta4288/fragment_cache.py)
+POST_FRAGMENT_CACHE = True
+POST_FRAGMENT_CACHE_SIZE = 1024
+
+# Ranked feed, chosen per request with /?ranked=1 or /?ranked=0, and used by
+# default when FEED_RANKED is set.  The newest FEED_RANK_CANDIDATES posts of
+# the feed are scored by recency, halving every FEED_RANK_HALF_LIFE hours,
+# times 1 plus the weighted logs of likes, comments and logname's past
+# interactions with the author (see insta4288/ranking.py).
+FEED_RANKED = False
+FEED_RANK_CANDIDATES = 10000
+FEED_RANK_HALF_LIFE = 24.0
+FEED_RANK_WEIGHTS = {'likes': 1.0, 'comments': 1.5, 'affinity': 2.0}
+
+# Per-worker cache of each user's newest FEED_CACHE_DEPTH feed postids,
+# evicting least recently used feeds beyond FEED_CACHE_BUDGET bytes.  Writes
+# in this worker update it at once; with several worker processes, a write
+# in one reaches the others' caches after at most FEED_CACHE_TTL seconds.
+# Feeds are read into the cache with FEED_ENGINE, the same as cache misses.
+FEED_CACHE = True
+FEED_CACHE_DEPTH = 500
+FEED_CACHE_BUDGET = 16 * 1024 * 1024
+FEED_CACHE_TTL = 30.0
+
+# Stream the feed and the follower and following lists: the page is sent as
+# it renders, while its rows are still being read.  A streamed response's
+# Server-Timing header only counts queries run before the first byte; the
+# log line at the end of the request counts them all.
+STREAM_TEMPLATES = False
+
+# Wrap relative post timestamps ("3 hours ago") in <time datetime="...">
+# with the absolute UTC time, so client scripts can keep them current.
+TIMESTAMP_ELEMENT = True
+
 # Database file is var/insta4288.sqlite3
 DATABASE_FILENAME = INSTA4288_ROOT/'var'/'insta4288.sqlite3'
+
+# Connection pool: at most DB_POOL_SIZE read-only connections per worker
+# process, and a request waits up to DB_POOL_TIMEOUT seconds for one.  Each
+# worker has a single writer connection; POST handlers queue for it for up to
+# DB_WRITE_TIMEOUT seconds.  Set the size to 0 to open a fresh connection for
+# every request.
+DB_POOL_SIZE = 8
+DB_POOL_TIMEOUT = 5.0
+DB_WRITE_TIMEOUT = 10.0
+
+# Starting a transaction on a locked database is retried with a random
+# backoff between 0 and min(DB_BUSY_BACKOFF_CAP, DB_BUSY_BACKOFF_BASE * 2**n)
+# seconds.  After DB_BUSY_DEADLINE seconds the request gets a 503 with
+# Retry-After.  Each attempt also waits out busy_timeout from SQLITE_PROFILE.
+DB_BUSY_DEADLINE = 10.0
+DB_BUSY_BACKOFF_BASE = 0.005
+DB_BUSY_BACKOFF_CAP = 0.25
+
+# Group commit for likes, comments and follows: a writer thread applies up to
+# GROUP_COMMIT_MAX_BATCH mutations, gathered for at most GROUP_COMMIT_MAX_DELAY
+# seconds, in one transaction.  Each request waits for its batch's commit.
+GROUP_COMMIT = False
+GROUP_COMMIT_MAX_BATCH = 64
+GROUP_COMMIT_MAX_DELAY = 0.005
+
+# Per-connection prepared statement cache.  It must hold every query in
+# insta4288/queries.py, which new connections prepare up front when
+# DB_PREWARM_STATEMENTS is set.
+DB_CACHED_STATEMENTS = 128
+DB_PREWARM_STATEMENTS = True
+
+# Serve per-query and pool counters at /debug/stats/.  Always on when the app
+# runs in debug mode.
+STATS_ENDPOINT = False
+
+# Per-request SQL totals are logged at the end of every request and, with
+# SQL_SERVER_TIMING, sent to the client in a Server-Timing header.  A request
+# running more than SQL_QUERY_WARN_THRESHOLD queries (usually an N+1 loop) is
+# logged as a warning; 0 turns the warning off.
+SQL_SERVER_TIMING = True
+SQL_QUERY_WARN_THRESHOLD = 20
+
+# SQLite performance profile, applied in this order to every new connection.
+# WAL lets readers proceed while a writer commits, synchronous=NORMAL is
+# durable across application crashes in WAL mode, and busy_timeout makes
+# concurrent writers wait (in milliseconds) instead of failing immediately.
+# A negative cache_size is in KiB.  journal_mode is persistent and is also
+# set by bin/insta4288db create/reset.
+SQLITE_PROFILE = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -16 * 1024,
+    'temp_store': 'MEMORY',
+    'wal_autocheckpoint': 1000,
+}
@@ -0,0 +1,270 @@
+"""Home feed engines and timeline maintenance.
+
+fetch_page() reads one page of the home feed, from the feed cache when it
+can and otherwise with the engine named by FEED_ENGINE in config.py.  The
+cache is filled with the same engine, so FEED_ENGINE decides how every feed
+read reaches the database.
+
+The write helpers keep the timeline table in step with the write paths in
+views/actions.py.  Each runs inside the caller's write transaction and
+returns a function that applies the same change to the feed cache; call it
+once the transaction has committed.
+"""
+import heapq
+import itertools
+import json
+import insta4288
+from insta4288.feed_cache import slice_page
+
+# Cursor for the first page: larger than any postid
+NEWEST = 2 ** 63 - 1
+
+
+def _no_cache_update():
+    """Stand-in for a cache update when the feed cache is off."""
+
+
+def fetch_page(connection, logname, before, limit):
+    """Return up to `limit` feed posts with postid below `before`.
+
+    Rows are newest first and carry postid, img_url, owner, owner_img_url,
+    created and likes.
+    """
+    while True:
+        postids = _cached_page(connection, logname, before, limit)
+        if postids is None:
+            return _engine_page(connection, logname, before, limit)
+        posts = posts_by_id(connection, postids)
+        if len(posts) == len(postids):
+            return posts
+        # Another worker deleted some of these posts; forget them and read
+        # the page again, so it is still full when older posts exist
+        found = {post['postid'] for post in posts}
+        insta4288.feed_cache.get_cache().remove(
+            [logname], [postid for postid in postids if postid not in found]
+        )
+
+
+def page_postids(connection, logname, before, limit):
+    """Return only the postids of the page fetch_page() would return."""
+    postids = _cached_page(connection, logname, before, limit)
+    if postids is None:
+        postids = [
+            row['postid']
+            for row in _engine_page(connection, logname, before, limit)
+        ]
+    return postids
+
+
+def add_likes_and_comments(connection, logname, posts):
+    """Set user_liked and comments on each of a page of feed rows.
+
+    Two queries for the whole page: which posts logname liked, and the
+    newest FEED_COMMENT_PREVIEW comments of each, in commentid order.  The
+    rows' comment_count gives the full number.
+    """
+    postids = json.dumps([post['postid'] for post in posts])
+    liked = {
+        row['postid'] for row in insta4288.queries.fetchall(
+            connection, 'feed_liked', (logname, postids)
+        )
+    }
+    comments = insta4288.queries.fetchall(
+        connection, 'feed_comments',
+        (postids, insta4288.app.config['FEED_COMMENT_PREVIEW']),
+    )
+    comments_by_post = {post['postid']: [] for post in posts}
+    for comment in comments:
+        comments_by_post[comment['postid']].append(comment)
+    for post in posts:
+        post['user_liked'] = post['postid'] in liked
+        post['comments'] = comments_by_post[post['postid']]
+    return posts
+
+
+def _cached_page(connection, logname, before, limit):
+    """Return a page of postids from the feed cache, or None."""
+    cache = insta4288.feed_cache.get_cache()
+    if cache is None:
+        return None
+    postids = cache.page(logname, before, limit)
+    if postids is None and before == NEWEST:
+        postids = slice_page(*warm(connection, logname), before, limit)
+    return postids
+
+
+def warm(connection, logname):
+    """Load logname's newest postids into the feed cache.
+
+    Return (postids, complete) as read, whether or not they were cached.
+    """
+    cache = insta4288.feed_cache.get_cache()
+    version = cache.version(logname)
+    postids = _engine_postids(connection, logname, cache.depth + 1)
+    complete = len(postids) <= cache.depth
+    cache.put(logname, postids, complete, version)
+    return postids[:cache.depth], complete
+
+
+def posts_by_id(connection, postids):
+    """Return the feed rows for `postids`, newest first."""
+    if not postids:
+        return []
+    return insta4288.queries.fetchall(
+        connection, 'feed_posts_by_id', (json.dumps(postids),)
+    )
+
+
+def _engine_page(connection, logname, before, limit):
+    """Read a feed page with the configured FEED_ENGINE."""
+    config = insta4288.app.config
+    engine = config['FEED_ENGINE']
+    if engine == 'timeline':
+        return insta4288.queries.fetchall(
+            connection, 'feed_timeline',
+            (logname, before, logname, before, limit),
+        )
+    if engine == 'sql':
+        return insta4288.queries.fetchall(
+            connection, 'feed_posts', (logname, logname, before, limit)
+        )
+    if engine == 'merge':
+        return _merge_page(connection, logname, before, limit)
+    raise ValueError(f"unknown FEED_ENGINE {engine!r}")
+
+
+def _engine_postids(connection, logname, limit):
+    """Return logname's newest `limit` feed postids with FEED_ENGINE."""
+    engine = insta4288.app.config['FEED_ENGINE']
+    if engine == 'timeline':
+        rows = insta4288.queries.fetchall(
+            connection, 'feed_timeline_ids', (logname, logname, limit)
+        )
+        return [row['postid'] for row in rows]
+    if engine == 'merge':
+        return _merge_postids(connection, logname, NEWEST, limit)
+    return [
+        row['postid']
+        for row in _engine_page(connection, logname, NEWEST, limit)
+    ]
+
+
+def _merge_page(connection, logname, before, limit):
+    """Build a feed page by merging each author's newest posts.
+
+    No author can contribute more than `limit` posts to the page, so one
+    index range of at most `limit` postids per author is enough.  heapq
+    merges the descending runs and stops once the page is full; the whole
+    union is never sorted.  Work is bounded by page size times the number
+    of accounts followed.
+    """
+    return posts_by_id(
+        connection, _merge_postids(connection, logname, before, limit)
+    )
+
+
+def _merge_postids(connection, logname, before, limit):
+    """Return the postids of the page _merge_page() builds."""
+    authors = insta4288.queries.fetchall(
+        connection, 'feed_authors', (logname, logname)
+    )
+    runs = [
+        [row['postid'] for row in insta4288.queries.fetchall(
+            connection, 'author_postids', (author['username'], before, limit)
+        )]
+        for author in authors
+    ]
+    return list(itertools.islice(heapq.merge(*runs, reverse=True), limit))
+
+
+def _readers(connection, username):
+    """Return `username` and its followers, whose feeds show its posts."""
+    rows = insta4288.queries.fetchall(
+        connection, 'user_follower_names', (username,)
+    )
+    return [username] + [row['username1'] for row in rows]
+
+
+def _newest_postids(connection, username, cache):
+    """Return the postids of `username` that can appear in a cached feed.
+
+    A post older than its author's newest `depth` posts has at least `depth`
+    newer posts in every feed it is in, so it is never cached.
+    """
+    rows = insta4288.queries.fetchall(
+        connection, 'author_postids', (username, NEWEST, cache.depth)
+    )
+    return [row['postid'] for row in rows]
+
+
+def fan_out(connection, owner, postid):
+    """Add a new post to its owner's timeline and its followers' timelines.
+
+    When the owner is above the fan-out limit, the post is recorded in
+    merged_posts instead and reads merge it in for every follower, now and
+    later, whatever the owner's follower count becomes.
+    """
+    limit = insta4288.app.config['TIMELINE_FANOUT_LIMIT']
+    insta4288.queries.execute(
+        connection, 'timeline_insert', (owner, postid)
+    )
+    insta4288.queries.execute(
+        connection, 'timeline_fan_out', (postid, owner, owner, limit)
+    )
+    insta4288.queries.execute(
+        connection, 'merged_post_insert', (owner, postid, owner, limit)
+    )
+    cache = insta4288.feed_cache.get_cache()
+    if cache is None:
+        return _no_cache_update
+    readers = _readers(connection, owner)
+    return lambda: cache.insert(readers, postid)
+
+
+def post_deleted(connection, owner, postid):
+    """Prepare to drop a post from the feed cache; call before deleting.
+
+    The timeline rows go with the post through the foreign key cascade.
+    """
+    cache = insta4288.feed_cache.get_cache()
+    if cache is None:
+        return _no_cache_update
+    readers = _readers(connection, owner)
+    return lambda: cache.remove(readers, [postid])
+
+
+def account_deleted(connection, username):
+    """Prepare to drop cached feeds showing a user; call before deleting."""
+    cache = insta4288.feed_cache.get_cache()
+    if cache is None:
+        return _no_cache_update
+    readers = _readers(connection, username)
+    return lambda: cache.discard(readers)
+
+
+def follow(connection, follower, followee):
+    """Copy the posts of a newly followed account into the timeline.
+
+    Posts in merged_posts are left out; reads merge them in.
+    """
+    insta4288.queries.execute(
+        connection, 'timeline_backfill', (follower, followee)
+    )
+    cache = insta4288.feed_cache.get_cache()
+    if cache is None:
+        return _no_cache_update
+    postids = _newest_postids(connection, followee, cache)
+    complete = len(postids) < cache.depth
+    return lambda: cache.merge(follower, postids, complete)
+
+
+def unfollow(connection, follower, followee):
+    """Remove the posts of an unfollowed account from the timeline."""
+    insta4288.queries.execute(
+        connection, 'timeline_prune', (follower, followee)
+    )
+    cache = insta4288.feed_cache.get_cache()
+    if cache is None:
+        return _no_cache_update
+    postids = _newest_postids(connection, followee, cache)
+    return lambda: cache.remove([follower], postids)
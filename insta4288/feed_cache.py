@@ -0,0 +1,218 @@
+"""Per-worker cache of materialized home feeds.
+
+Each cached feed is the newest FEED_CACHE_DEPTH postids of one user's feed,
+held newest first in an array('q') (8 bytes per post).  A feed page served
+from the cache only needs the database for the page's post details.
+
+Entries are filled on a miss and when a user logs in, and are updated in
+place after each committed write that changes feed membership: new and
+deleted posts, follows and unfollows (see insta4288/feed.py).  Least
+recently used entries are evicted once the arrays exceed FEED_CACHE_BUDGET
+bytes.
+
+The cache lives in one worker process.  Writes handled by another worker
+are not seen here until the entry is older than FEED_CACHE_TTL seconds,
+except that posts found missing when a page is read are dropped from the
+entry then (see fetch_page() in insta4288/feed.py).
+"""
+import bisect
+import collections
+import heapq
+import itertools
+import threading
+import time
+from array import array
+import insta4288
+
+
+class FeedCache:
+    """LRU map from username to (postids, complete, filled_at).
+
+    `complete` is True when the array holds the user's entire feed, so
+    pages past its end are known to be empty.
+    """
+
+    def __init__(self, budget, depth, ttl):
+        """Create an empty cache holding at most `budget` bytes of postids."""
+        self._limits = (budget, depth, ttl)
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._stats = collections.Counter()
+        # Update counters of the users with a fill in progress
+        self._versions = {}
+
+    @property
+    def depth(self):
+        """Return the number of postids kept per user."""
+        return self._limits[1]
+
+    def page(self, username, before, limit):
+        """Return up to `limit` cached postids below `before`, or None.
+
+        None means the cache cannot answer: the user has no fresh entry, or
+        the page runs past the cached part of an incomplete feed.
+        """
+        with self._lock:
+            entry = self._entries.get(username)
+            now = time.monotonic()
+            if entry is None or now - entry[2] > self._limits[2]:
+                self._stats['misses'] += 1
+                return None
+            page = slice_page(entry[0], entry[1], before, limit)
+            if page is None:
+                self._stats['beyond_depth'] += 1
+                return None
+            self._entries.move_to_end(username)
+            self._stats['hits'] += 1
+            return page
+
+    def version(self, username):
+        """Return a counter that changes with every update to a user's feed.
+
+        Read it before querying a feed to fill the cache, and pass it to
+        put(), so that a feed read before a concurrent write is not cached
+        after that write has already updated the cache.  Writes to other
+        users' feeds leave it alone.
+        """
+        with self._lock:
+            return self._versions.setdefault(username, 0)
+
+    def put(self, username, postids, complete, version):
+        """Cache a user's newest postids, newest first."""
+        with self._lock:
+            if self._versions.pop(username, None) != version:
+                self._stats['stale_fills'] += 1
+                return
+            self._store(username, array('q', postids[:self.depth]),
+                        complete and len(postids) <= self.depth)
+            self._stats['fills'] += 1
+
+    def insert(self, usernames, postid):
+        """Add a new post to these users' feeds."""
+        with self._lock:
+            self._touch(usernames)
+            for username in usernames:
+                self._merge(username, [postid], True)
+
+    def merge(self, username, postids, complete):
+        """Merge a newly followed account's newest postids into a feed.
+
+        `complete` says whether `postids` holds all of that account's posts.
+        """
+        with self._lock:
+            self._touch([username])
+            self._merge(username, postids, complete)
+
+    def _touch(self, usernames):
+        """Invalidate the fills in progress for these users."""
+        for username in usernames:
+            if username in self._versions:
+                self._versions[username] += 1
+
+    def _merge(self, username, postids, complete):
+        """Merge descending `postids` into an entry, dropping duplicates."""
+        entry = self._entries.get(username)
+        if entry is None:
+            return
+        merged = array('q', itertools.islice(
+            (postid for postid, _ in itertools.groupby(
+                heapq.merge(entry[0], postids, reverse=True)
+            )),
+            self.depth + 1,
+        ))
+        self._store(username, merged[:self.depth],
+                    entry[1] and complete and len(merged) <= self.depth,
+                    entry[2])
+        self._stats['updates'] += 1
+
+    def remove(self, usernames, postids):
+        """Remove posts from these users' feeds."""
+        gone = set(postids)
+        with self._lock:
+            self._touch(usernames)
+            for username in usernames:
+                entry = self._entries.get(username)
+                if entry is not None:
+                    kept = array('q', (p for p in entry[0] if p not in gone))
+                    self._store(username, kept, entry[1], entry[2])
+                    self._stats['updates'] += 1
+
+    def discard(self, usernames):
+        """Drop these users' entries."""
+        with self._lock:
+            self._touch(usernames)
+            for username in usernames:
+                entry = self._entries.pop(username, None)
+                if entry is not None:
+                    self._bytes -= _size(entry[0])
+                    self._stats['invalidations'] += 1
+
+    def stats(self):
+        """Return hit, miss and eviction counters and current memory use."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot.update(entries=len(self._entries), bytes=self._bytes,
+                            budget=self._limits[0])
+        lookups = snapshot.get('hits', 0) + snapshot.get('misses', 0)
+        snapshot['hit_rate'] = (round(snapshot.get('hits', 0) / lookups, 3)
+                                if lookups else None)
+        return snapshot
+
+    def _store(self, username, postids, complete, filled_at=None):
+        """Replace an entry, then evict until the cache fits its budget."""
+        old = self._entries.pop(username, None)
+        if old is not None:
+            self._bytes -= _size(old[0])
+        if filled_at is None:
+            filled_at = time.monotonic()
+        self._entries[username] = (postids, complete, filled_at)
+        self._bytes += _size(postids)
+        while self._bytes > self._limits[0] and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= _size(evicted[0])
+            self._stats['evictions'] += 1
+
+
+def slice_page(postids, complete, before, limit):
+    """Return up to `limit` of descending `postids` below `before`.
+
+    Return None if the page may continue past the end of an incomplete
+    list.
+    """
+    start = bisect.bisect_right(postids, -before, key=lambda x: -x)
+    if not complete and start + limit > len(postids):
+        return None
+    return list(postids[start:start + limit])
+
+
+def _size(postids):
+    """Return the bytes an array of postids occupies."""
+    return postids.itemsize * len(postids)
+
+
+def get_cache():
+    """Return this worker's feed cache, or None when FEED_CACHE is off.
+
+    The cache belongs to the database file on disk; if the file has been
+    replaced (bin/insta4288db reset), a new, empty cache takes its place.
+    """
+    config = insta4288.app.config
+    if not config['FEED_CACHE']:
+        return None
+    identity = insta4288.model.get_pools()['identity']
+    state = insta4288.app.extensions.setdefault('feed_cache', {})
+    if state.get('identity') != identity or 'cache' not in state:
+        state['identity'] = identity
+        state['cache'] = FeedCache(
+            budget=config['FEED_CACHE_BUDGET'],
+            depth=config['FEED_CACHE_DEPTH'],
+            ttl=config['FEED_CACHE_TTL'],
+        )
+    return state['cache']
+
+
+def cache_stats():
+    """Return the feed cache counters, or None if there is no cache."""
+    state = insta4288.app.extensions.get('feed_cache', {})
+    return state['cache'].stats() if 'cache' in state else None
@@ -0,0 +1,84 @@
+"""Per-worker cache of rendered post page fragments.
+
+The parts of /posts/<postid>/ that every viewer sees alike (the image, the
+owner, the like count and a page of comments) are rendered once and kept
+here, tagged with the post's and its owner's data versions (see
+sql/migrations/0005_data_versions.sql).  Likes, comments, deletes and
+profile edits stamp new versions in the database, whichever worker made
+them, so a cached entry with other versions is stale and is replaced.
+
+Viewer-specific parts (the like button, delete buttons, the relative
+timestamp) are rendered per request around the cached fragments.
+"""
+import collections
+import threading
+import insta4288
+
+
+class FragmentCache:
+    """LRU map from a page key to (versions, fragments)."""
+
+    def __init__(self, size):
+        """Create an empty cache holding at most `size` pages."""
+        self._size = size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+
+    def get(self, key, versions):
+        """Return the fragments cached for `key` at `versions`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry[0] != versions:
+                self._stats['stale'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def put(self, key, versions, fragments):
+        """Cache the fragments for `key` at `versions`."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (versions, fragments)
+            self._stats['fills'] += 1
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def stats(self):
+        """Return hit, miss and eviction counters and the entry count."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot.update(entries=len(self._entries), size=self._size)
+        lookups = sum(snapshot.get(name, 0)
+                      for name in ('hits', 'misses', 'stale'))
+        snapshot['hit_rate'] = (round(snapshot.get('hits', 0) / lookups, 3)
+                                if lookups else None)
+        return snapshot
+
+
+def get_cache():
+    """Return this worker's fragment cache, or None when it is off.
+
+    Versions restart when the database file is replaced (bin/insta4288db
+    reset), so the cache belongs to the file on disk, like the feed cache.
+    """
+    config = insta4288.app.config
+    if not config['POST_FRAGMENT_CACHE']:
+        return None
+    identity = insta4288.model.get_pools()['identity']
+    state = insta4288.app.extensions.setdefault('fragment_cache', {})
+    if state.get('identity') != identity or 'cache' not in state:
+        state['identity'] = identity
+        state['cache'] = FragmentCache(config['POST_FRAGMENT_CACHE_SIZE'])
+    return state['cache']
+
+
+def cache_stats():
+    """Return the fragment cache counters, or None if there is no cache."""
+    state = insta4288.app.extensions.get('fragment_cache', {})
+    return state['cache'].stats() if 'cache' in state else None
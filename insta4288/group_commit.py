@@ -0,0 +1,168 @@
+"""Group commit for small, frequent writes.
+
+With GROUP_COMMIT enabled, like, comment and follow handlers hand their
+mutation to a single writer thread instead of committing it themselves.  The
+writer collects mutations for up to GROUP_COMMIT_MAX_DELAY seconds or
+GROUP_COMMIT_MAX_BATCH mutations, applies them in one transaction with a
+savepoint around each, and commits once.  Every request waits until the
+commit covering its mutation is durable, then sees its mutation's result or
+exception (for example a 409 from flask.abort) as if it had run inline.
+"""
+import collections
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from werkzeug.exceptions import HTTPException
+from insta4288.pool import PoolTimeout
+from insta4288.transactions import DatabaseBusy
+
+# Exceptions a mutation may raise to reject itself without failing its batch
+MUTATION_ERRORS = (HTTPException, sqlite3.Error)
+
+
+class GroupCommitWriter:
+    """Background thread that batches mutations into shared transactions.
+
+    `get_pool` returns the pool to borrow a read-write connection from for
+    each batch, so the writer shares the worker's writer pool with the
+    unbatched handlers.  `begin(connection)` opens each batch's write
+    transaction, retrying while the database is busy.
+    """
+
+    def __init__(self, get_pool, begin, max_batch, max_delay):
+        """Start the writer thread."""
+        self._get_pool = get_pool
+        self._begin = begin
+        self._limits = (max_batch, max_delay)
+        self._pending = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._stats = {
+            "batches": 0,
+            "mutations": 0,
+            "failed_batches": 0,
+            "max_batch": 0,
+            "batch_sizes": collections.Counter(),
+        }
+        self._thread = None
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        """Start the writer thread, or restart it if a bug killed it."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="group-commit", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, mutation):
+        """Queue `mutation(connection)` and return a Future for its result."""
+        self._ensure_thread()
+        future = Future()
+        self._pending.put((mutation, future))
+        return future
+
+    def stats(self):
+        """Return batch counters, including a histogram of batch sizes."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["batch_sizes"] = dict(
+                sorted(self._stats["batch_sizes"].items())
+            )
+        snapshot["queued"] = self._pending.qsize()
+        return snapshot
+
+    def _collect(self):
+        """Block for one mutation, then gather more until a limit is hit."""
+        max_batch, max_delay = self._limits
+        batch = [self._pending.get()]
+        deadline = time.monotonic() + max_delay
+        while len(batch) < max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Apply batches forever.
+
+        If a batch raises something unexpected, its requests are failed
+        rather than left waiting, and the exception ends this thread; the
+        next submit() starts a new one.
+        """
+        while True:
+            batch = self._collect()
+            try:
+                self._commit_batch(batch)
+            finally:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(
+                            RuntimeError("group commit writer failed")
+                        )
+
+    def _commit_batch(self, batch):
+        """Apply one batch in a single transaction and resolve its futures."""
+        outcomes = []
+        pool = self._get_pool()
+        try:
+            connection = pool.checkout()
+        except (PoolTimeout, sqlite3.Error) as error:
+            self._fail(batch, error)
+            return
+
+        committed = False
+        try:
+            self._begin(connection)
+            for mutation, _ in batch:
+                outcomes.append(_apply(connection, mutation))
+            connection.commit()
+            committed = True
+        except (DatabaseBusy, sqlite3.Error) as error:
+            self._fail(batch, error)
+        finally:
+            pool.checkin(connection, discard=not committed)
+        if not committed:
+            return
+
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["mutations"] += len(batch)
+            self._stats["max_batch"] = max(self._stats["max_batch"],
+                                           len(batch))
+            self._stats["batch_sizes"][len(batch)] += 1
+        for (_, future), (result, error) in zip(batch, outcomes):
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _fail(self, batch, error):
+        """Report a batch that could not be committed to all its requests."""
+        with self._lock:
+            self._stats["failed_batches"] += 1
+        for _, future in batch:
+            future.set_exception(error)
+
+
+def _apply(connection, mutation):
+    """Run one mutation inside a savepoint; return (result, exception).
+
+    A mutation that raises is rolled back to its savepoint without
+    affecting the rest of the batch.
+    """
+    connection.execute("SAVEPOINT mutation")
+    try:
+        result = mutation(connection)
+    except MUTATION_ERRORS as error:
+        connection.execute("ROLLBACK TO mutation")
+        connection.execute("RELEASE mutation")
+        return None, error
+    connection.execute("RELEASE mutation")
+    return result, None
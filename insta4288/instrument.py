@@ -0,0 +1,97 @@
+"""Per-request SQL instrumentation.
+
+Every query a view runs goes through the catalog in insta4288.queries, which
+reports each call here.  For the current request we keep the number of
+statements, the time spent in SQLite and the rows fetched or changed, plus a
+count per query name so that an N+1 pattern shows up as one name repeated
+many times.
+
+At the end of the request the totals are sent to the client in a
+Server-Timing header (visible in the browser's developer tools) and written
+to the log as a single key=value line.  A request that runs more than
+SQL_QUERY_WARN_THRESHOLD statements is logged as a warning naming its most
+repeated query.
+"""
+import collections
+import time
+import flask
+import insta4288
+
+
+def note(name, elapsed, rows):
+    """Add one query call to the current request's counters, if any.
+
+    Calls made outside a request, such as by the group commit writer thread,
+    are not attributed to a request.
+    """
+    if not flask.has_request_context():
+        return
+    counters = flask.g.get('sql_counters')
+    if counters is None:
+        counters = flask.g.sql_counters = {
+            'statements': 0,
+            'seconds': 0.0,
+            'rows': 0,
+            'by_name': collections.Counter(),
+        }
+    counters['statements'] += 1
+    counters['seconds'] += elapsed
+    counters['rows'] += rows
+    counters['by_name'][name] += 1
+
+
+def request_counters():
+    """Return the current request's SQL counters (zeros if it ran none)."""
+    counters = flask.g.get('sql_counters')
+    if counters is None:
+        return {'statements': 0, 'seconds': 0.0, 'rows': 0,
+                'by_name': collections.Counter()}
+    return counters
+
+
+@insta4288.app.before_request
+def start_timer():
+    """Remember when the request started."""
+    flask.g.request_started = time.perf_counter()
+
+
+@insta4288.app.after_request
+def add_server_timing(response):
+    """Report SQL time and counts in a Server-Timing header."""
+    counters = request_counters()
+    flask.g.response_status = response.status_code
+    if insta4288.app.config['SQL_SERVER_TIMING']:
+        total = time.perf_counter() - flask.g.get(
+            'request_started', time.perf_counter()
+        )
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={counters["seconds"] * 1000:.3f};'
+            f'desc="{counters["statements"]} queries, '
+            f'{counters["rows"]} rows"',
+        )
+        response.headers.add('Server-Timing', f'app;dur={total * 1000:.3f}')
+    return response
+
+
+@insta4288.app.teardown_request
+def log_sql_counters(error):
+    """Log one line of SQL totals, warning when the query count is high."""
+    assert error or not error  # Needed to avoid superfluous style error
+    counters = request_counters()
+    statements = counters['statements']
+    line = (
+        f"method={flask.request.method} path={flask.request.path} "
+        f"status={flask.g.get('response_status', 500)} "
+        f"queries={statements} db_ms={counters['seconds'] * 1000:.3f} "
+        f"rows={counters['rows']}"
+    )
+    threshold = insta4288.app.config['SQL_QUERY_WARN_THRESHOLD']
+    if threshold and statements > threshold:
+        name, calls = counters['by_name'].most_common(1)[0]
+        insta4288.app.logger.warning(
+            "sql %s threshold=%d top_query=%s top_calls=%d",
+            line, threshold, name, calls,
+        )
+    else:
+        insta4288.app.logger.info("sql %s", line)
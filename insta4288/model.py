@@ -1,45 +1,329 @@
 """Insta4288 model (database) API."""
+import concurrent.futures
+import contextlib
+import functools
+import os
+import pathlib
 import sqlite3
+import threading
 import flask
+import flask.json.provider
 import insta4288
+from insta4288.group_commit import GroupCommitWriter
+from insta4288.pool import ConnectionPool, PoolTimeout
+from insta4288.rows import Record, record_factory
+from insta4288.transactions import DatabaseBusy, begin
 
+# Guards creation of the per-process group commit writer
+_GROUP_COMMIT_LOCK = threading.Lock()
 
-def dict_factory(cursor, row):
-    """Convert database row objects to a dictionary keyed on column name.
+# Guards replacing the per-process connection pools
+_POOLS_LOCK = threading.Lock()
 
-    This is useful for building dictionaries which are then used to render a
-    template.  Note that this would be inefficient for large queries.
+
+class RecordJSONProvider(flask.json.provider.DefaultJSONProvider):
+    """Flask's JSON provider, also serializing rows as JSON objects."""
+
+    @staticmethod
+    def default(o):
+        """Return a row as a dict; defer anything else to Flask."""
+        if isinstance(o, Record):
+            return dict(o)
+        return flask.json.provider.DefaultJSONProvider.default(o)
+
+
+insta4288.app.json = RecordJSONProvider(insta4288.app)
+
+
+def connect(readonly=False):
+    """Open and configure a new database connection.
+
+    Read-only connections are opened with mode=ro, so they can never take a
+    write lock.  Pooled connections are shared between worker threads, one
+    request at a time, so the same-thread check is disabled.
     """
-    return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
+    config = insta4288.app.config
+    db_filename = pathlib.Path(config['DATABASE_FILENAME']).resolve()
+    if readonly:
+        database, uri = f"{db_filename.as_uri()}?mode=ro", True
+    else:
+        database, uri = str(db_filename), False
+    connection = sqlite3.connect(
+        database,
+        uri=uri,
+        check_same_thread=False,
+        cached_statements=config['DB_CACHED_STATEMENTS'],
+    )
+    connection.row_factory = record_factory
+
+    # Foreign keys have to be enabled per-connection.  This is an sqlite3
+    # backwards compatibility thing.
+    connection.execute("PRAGMA foreign_keys = ON")
+    apply_profile(connection, readonly)
+    if config['DB_PREWARM_STATEMENTS']:
+        insta4288.queries.prewarm(connection)
+    return connection
+
+
+def apply_profile(connection, readonly=False):
+    """Apply the SQLITE_PROFILE pragmas from config.py to a connection.
+
+    The journal mode is a property of the database file, so only read-write
+    connections try to change it.
+    """
+    for pragma, value in insta4288.app.config['SQLITE_PROFILE'].items():
+        if readonly and pragma == 'journal_mode':
+            continue
+        connection.execute(f"PRAGMA {pragma} = {value}").fetchall()
+
+
+def effective_profile(connection):
+    """Return the value SQLite reports for each SQLITE_PROFILE pragma."""
+    cursor = connection.cursor()
+    cursor.row_factory = None
+    return {
+        pragma: cursor.execute(f"PRAGMA {pragma}").fetchone()[0]
+        for pragma in insta4288.app.config['SQLITE_PROFILE']
+    }
+
+
+def _db_identity():
+    """Return a key identifying the database file currently on disk.
+
+    bin/insta4288db reset replaces the file, usually reusing the inode, and
+    rewrites the generation file next to it, so the key is the database's
+    (device, inode) and the generation file's modification time.  Writes and
+    checkpoints leave all three unchanged.
+    """
+    filename = insta4288.app.config['DATABASE_FILENAME']
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    try:
+        generation = os.stat(f"{filename}-generation").st_mtime_ns
+    except FileNotFoundError:
+        generation = None
+    return (stat.st_dev, stat.st_ino, generation)
+
+
+def get_pools():
+    """Return the reader and writer pools for the database file on disk.
+
+    Readers share a pool of DB_POOL_SIZE read-only connections.  Writes go
+    through a pool of exactly one connection, so a worker process never has
+    two write transactions contending for the database lock.  When the file
+    has been replaced since the pools were created, they are retired and
+    fresh ones take their place, by one thread only.
+    """
+    identity = _db_identity()
+    state = insta4288.app.extensions.setdefault('sqlite_pool', {})
+    if state.get('identity') == identity and 'read' in state:
+        return state
+    with _POOLS_LOCK:
+        if state.get('identity') != identity or 'read' not in state:
+            _replace_pools(state, identity)
+    return state
+
+
+def _replace_pools(state, identity):
+    """Close the pools in `state` and open new ones for `identity`."""
+    for kind in ('read', 'write'):
+        if kind in state:
+            state[kind].close()
+    config = insta4288.app.config
+    state['read'] = ConnectionPool(
+        functools.partial(connect, readonly=True),
+        size=config['DB_POOL_SIZE'],
+        timeout=config['DB_POOL_TIMEOUT'],
+    )
+    state['write'] = ConnectionPool(
+        connect, size=1, timeout=config['DB_WRITE_TIMEOUT'],
+    )
+    # Published last, so threads that skip the lock see complete pools
+    state['identity'] = identity
+    if identity is not None:
+        _log_profile(state['write'])
+
+
+def _log_profile(pool):
+    """Log the settings SQLite actually accepted, once per pool."""
+    connection = pool.checkout()
+    try:
+        insta4288.app.logger.info(
+            "SQLite profile for %s: %s",
+            insta4288.app.config['DATABASE_FILENAME'],
+            effective_profile(connection),
+        )
+    finally:
+        pool.checkin(connection)
+
+
+def pool_stats():
+    """Return size and wait-time counters for the reader and writer pools."""
+    pools = get_pools()
+    return {kind: pools[kind].stats() for kind in ('read', 'write')}
+
+
+def _checkout(kind):
+    """Return (pool, connection) for `kind`; pool is None when unpooled."""
+    if insta4288.app.config['DB_POOL_SIZE'] > 0:
+        pool = get_pools()[kind]
+        return pool, pool.checkout()
+    return None, connect(readonly=kind == 'read')
+
+
+def _release(pool, connection):
+    """Roll back anything left open and return the connection to its pool."""
+    if pool is not None:
+        pool.checkin(connection)
+        return
+    try:
+        connection.rollback()
+    finally:
+        connection.close()
+
+
+def _busy_policy():
+    """Return the (deadline, base, cap) SQLITE_BUSY retry policy."""
+    config = insta4288.app.config
+    return (config['DB_BUSY_DEADLINE'], config['DB_BUSY_BACKOFF_BASE'],
+            config['DB_BUSY_BACKOFF_CAP'])
 
 
 def get_db():
-    """Open a new database connection.
+    """Check out a read-only database connection for the current request.
+
+    Used by the GET views, normally through read_scope().  Writes through
+    this connection fail with sqlite3.OperationalError; use write_scope()
+    instead.
 
     Flask docs:
     https://flask.palletsprojects.com/en/1.0.x/appcontext/#storing-data
     """
     if 'sqlite_db' not in flask.g:
-        db_filename = insta4288.app.config['DATABASE_FILENAME']
-        flask.g.sqlite_db = sqlite3.connect(str(db_filename))
-        flask.g.sqlite_db.row_factory = dict_factory
+        flask.g.sqlite_db = _checkout('read')
+    return flask.g.sqlite_db[1]
 
-        # Foreign keys have to be enabled per-connection.  This is an sqlite3
-        # backwards compatibility thing.
-        flask.g.sqlite_db.execute("PRAGMA foreign_keys = ON")
 
-    return flask.g.sqlite_db
+@contextlib.contextmanager
+def read_scope():
+    """Run the enclosed queries against one consistent snapshot.
+
+    The snapshot is released when the block exits, so render templates
+    after it, not inside it.
+    """
+    connection = get_db()
+    begin(connection, immediate=False, policy=_busy_policy())
+    try:
+        yield connection
+    finally:
+        connection.rollback()
+
+
+@contextlib.contextmanager
+def stream_scope():
+    """Run the enclosed queries in one snapshot on a separate connection.
+
+    For generators read while a streamed response is being sent, after the
+    app context may have been torn down and the request's connection
+    returned to its pool.  The connection is checked out here and returned
+    when the block exits, when the generator finishes or is closed.
+    """
+    pool, connection = _checkout('read')
+    try:
+        begin(connection, immediate=False, policy=_busy_policy())
+        yield connection
+    finally:
+        _release(pool, connection)
+
+
+@contextlib.contextmanager
+def write_scope():
+    """Run the enclosed queries in a BEGIN IMMEDIATE transaction.
+
+    The write lock is taken up front, retrying while the database is busy,
+    so existence checks and writes see a consistent database.  The
+    transaction commits as soon as the block exits and rolls back if it
+    raises, such as through flask.abort().  The worker's single writer
+    connection is checked out for the block only, so other requests can
+    write while this one removes files or renders its response.
+    """
+    pool, connection = _checkout('write')
+    try:
+        begin(connection, immediate=True, policy=_busy_policy())
+        yield connection
+        connection.commit()
+    finally:
+        _release(pool, connection)
+
+
+def _group_commit_writer():
+    """Return this worker's group commit writer, starting it if needed."""
+    with _GROUP_COMMIT_LOCK:
+        if 'group_commit' not in insta4288.app.extensions:
+            config = insta4288.app.config
+            insta4288.app.extensions['group_commit'] = GroupCommitWriter(
+                lambda: get_pools()['write'],
+                functools.partial(begin, immediate=True,
+                                  policy=_busy_policy()),
+                max_batch=config['GROUP_COMMIT_MAX_BATCH'],
+                max_delay=config['GROUP_COMMIT_MAX_DELAY'],
+            )
+        return insta4288.app.extensions['group_commit']
+
+
+def group_commit_stats():
+    """Return group commit batch counters, or None if it never ran."""
+    writer = insta4288.app.extensions.get('group_commit')
+    return None if writer is None else writer.stats()
+
+
+def run_write(mutation):
+    """Apply `mutation(connection)` as a write and return its result.
+
+    With GROUP_COMMIT enabled the mutation joins the next group commit batch
+    and this call returns once that batch is durable; exceptions raised by
+    the mutation, such as flask.abort(), are re-raised here.  Otherwise it
+    runs in its own write_scope().
+    """
+    config = insta4288.app.config
+    if not config['GROUP_COMMIT']:
+        with write_scope() as connection:
+            return mutation(connection)
+    future = _group_commit_writer().submit(mutation)
+    return future.result(timeout=config['DB_WRITE_TIMEOUT'])
+
+
+@insta4288.app.errorhandler(DatabaseBusy)
+@insta4288.app.errorhandler(PoolTimeout)
+@insta4288.app.errorhandler(concurrent.futures.TimeoutError)
+def database_busy(error):
+    """Answer 503 with Retry-After when the database stayed locked.
+
+    Also used when no pooled connection came free in time, and when a group
+    commit batch did not become durable within DB_WRITE_TIMEOUT.
+    """
+    insta4288.app.logger.warning("%s: %s", flask.request.path, error)
+    return flask.Response(
+        "Service Unavailable: the database is busy, try again shortly.\n",
+        status=503,
+        headers={'Retry-After': '1'},
+        mimetype='text/plain',
+    )
 
 
 @insta4288.app.teardown_appcontext
 def close_db(error):
-    """Close the database at the end of a request.
+    """Return the request's read connection to its pool.
+
+    Snapshots are ended by read_scope(), so anything still open here was
+    abandoned by an exception and is rolled back.
 
     Flask docs:
     https://flask.palletsprojects.com/en/1.0.x/appcontext/#storing-data
     """
     assert error or not error  # Needed to avoid superfluous style error
-    sqlite_db = flask.g.pop('sqlite_db', None)
-    if sqlite_db is not None:
-        sqlite_db.commit()
-        sqlite_db.close()
+    held = flask.g.pop('sqlite_db', None)
+    if held is not None:
+        _release(*held)
@@ -0,0 +1,131 @@
+"""Bounded pool of pre-configured sqlite3 connections.
+
+Connections are checked out for the lifetime of one request and checked back
+in at teardown, so the SQLite page cache and prepared statement cache survive
+from one request to the next.
+"""
+import sqlite3
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available before the timeout."""
+
+
+class ConnectionPool:
+    """Checkout-based pool holding at most `size` open connections.
+
+    `connect` is a zero-argument callable returning a new, fully configured
+    connection.  Idle connections are reused most-recently-used first so that
+    a lightly loaded server keeps its caches warm.
+    """
+
+    def __init__(self, connect, size, timeout):
+        """Create an empty pool; connections are opened lazily."""
+        self._connect = connect
+        self._timeout = timeout
+        self._idle = []
+        self._available = threading.Condition()
+        self._closed = False
+        self._stats = {
+            "size": size,
+            "open": 0,
+            "in_use": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+            "timeouts": 0,
+            "discarded": 0,
+        }
+
+    def _has_free_slot(self):
+        return self._stats["in_use"] < self._stats["size"]
+
+    def checkout(self):
+        """Return a connection, waiting up to the pool timeout for a slot."""
+        with self._available:
+            if not self._has_free_slot():
+                start = time.perf_counter()
+                if not self._available.wait_for(self._has_free_slot,
+                                                timeout=self._timeout):
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"no database connection free after {self._timeout}s"
+                    )
+                waited = time.perf_counter() - start
+                self._stats["waits"] += 1
+                self._stats["wait_total"] += waited
+                self._stats["wait_max"] = max(self._stats["wait_max"], waited)
+            self._stats["in_use"] += 1
+            self._stats["checkouts"] += 1
+            connection = self._idle.pop() if self._idle else None
+
+        if connection is None:
+            try:
+                connection = self._connect()
+            except Exception:
+                with self._available:
+                    self._stats["in_use"] -= 1
+                    self._available.notify()
+                raise
+            with self._available:
+                self._stats["open"] += 1
+        return connection
+
+    def _release_slot(self, connection=None):
+        """Free a checkout slot, keeping `connection` idle if given.
+
+        Returns a connection the caller must close because the pool was
+        retired while it was checked out.
+        """
+        with self._available:
+            self._stats["in_use"] -= 1
+            self._available.notify()
+            if connection is not None and not self._closed:
+                self._idle.append(connection)
+                return None
+            self._stats["open"] -= 1
+            self._stats["discarded"] += 1
+            return connection
+
+    def checkin(self, connection, discard=False):
+        """Return a connection to the pool after resetting its state.
+
+        Any transaction left open by the request is rolled back.  Connections
+        that fail to reset, or that belong to a closed pool, are closed.
+        """
+        if not discard:
+            try:
+                if connection.in_transaction:
+                    connection.rollback()
+            except sqlite3.Error:
+                discard = True
+
+        if discard:
+            self._release_slot()
+            connection.close()
+        else:
+            retired = self._release_slot(connection)
+            if retired is not None:
+                retired.close()
+
+    def close(self):
+        """Close idle connections and retire the pool.
+
+        Connections still checked out are closed when they are checked in.
+        """
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._stats["open"] -= len(idle)
+        for connection in idle:
+            connection.close()
+
+    def stats(self):
+        """Return a snapshot of pool counters."""
+        with self._available:
+            snapshot = dict(self._stats)
+            snapshot["idle"] = len(self._idle)
+        return snapshot
@@ -0,0 +1,466 @@
+"""Insta4288 named query catalog.
+
+Every SQL statement the views run is declared once in SQL, keyed by name.
+Views call fetchone(), fetchall() or execute() with a query name; each call
+adds to that query's counters (calls, total and max latency, rows), which
+stats() reports, and to the current request's totals in insta4288.instrument.
+
+Using one constant string per statement also keeps sqlite3's per-connection
+statement cache effective: prewarm() prepares the read queries when a pooled
+connection is opened, so the first request served by it skips compilation.
+"""
+import threading
+import time
+from insta4288 import instrument
+
+SQL = {
+    # Home feed: one query each for the posts, the viewer's likes and the
+    # latest comments.  Posts are paged by keyset: the page holds posts with
+    # postid below the cursor, found per owner through the posts_owner
+    # index.  The page's postids are passed as one JSON array, so the SQL
+    # text stays constant whatever the page size.
+    "feed_posts": """
+        SELECT p.postid, p.filename as img_url, p.owner,
+               u.filename as owner_img_url, p.created as created,
+               COALESCE(s.like_count, 0) as likes,
+               COALESCE(s.comment_count, 0) as comment_count
+        FROM posts p
+        JOIN users u ON p.owner = u.username
+        LEFT JOIN post_stats s ON s.postid = p.postid
+        WHERE (p.owner = ? OR p.owner IN (
+            SELECT username2 FROM following WHERE username1 = ?
+        ))
+        AND p.postid < ?
+        ORDER BY p.postid DESC
+        LIMIT ?
+    """,
+    # Home feed from the precomputed timeline, plus the posts of followed
+    # accounts that were not copied into it (merged_posts).  The two sides
+    # are merged in postid order and cut at the page size.
+    "feed_timeline": """
+        SELECT p.postid, p.filename AS img_url, p.owner,
+               u.filename AS owner_img_url, p.created AS created,
+               COALESCE(s.like_count, 0) AS likes,
+               COALESCE(s.comment_count, 0) AS comment_count
+        FROM (
+            SELECT postid FROM timeline
+            WHERE username = ? AND postid < ?
+            UNION
+            SELECT m.postid
+            FROM following AS f
+            JOIN merged_posts AS m ON m.owner = f.username2
+            WHERE f.username1 = ? AND m.postid < ?
+            ORDER BY postid DESC
+            LIMIT ?
+        ) AS t
+        JOIN posts AS p ON p.postid = t.postid
+        JOIN users AS u ON u.username = p.owner
+        LEFT JOIN post_stats AS s ON s.postid = p.postid
+        ORDER BY p.postid DESC
+    """,
+    # Newest postids of a feed, to fill the feed cache (insta4288/feed.py)
+    "feed_timeline_ids": """
+        SELECT postid FROM timeline WHERE username = ?
+        UNION
+        SELECT m.postid
+        FROM following AS f
+        JOIN merged_posts AS m ON m.owner = f.username2
+        WHERE f.username1 = ?
+        ORDER BY postid DESC
+        LIMIT ?
+    """,
+
+    # Home feed by k-way merge: the accounts in logname's feed, the newest
+    # posts of one account (an index range on posts_owner, which holds
+    # (owner, postid)), and the details of the merged page.
+    "feed_authors": """
+        SELECT ? AS username
+        UNION
+        SELECT username2 FROM following WHERE username1 = ?
+    """,
+    "author_postids": """
+        SELECT postid FROM posts
+        WHERE owner = ? AND postid < ?
+        ORDER BY postid DESC
+        LIMIT ?
+    """,
+    "feed_posts_by_id": """
+        SELECT p.postid, p.filename AS img_url, p.owner,
+               u.filename AS owner_img_url, p.created AS created,
+               COALESCE(s.like_count, 0) AS likes,
+               COALESCE(s.comment_count, 0) AS comment_count
+        FROM posts AS p
+        JOIN users AS u ON u.username = p.owner
+        LEFT JOIN post_stats AS s ON s.postid = p.postid
+        WHERE p.postid IN (SELECT value FROM json_each(?))
+        ORDER BY p.postid DESC
+    """,
+    # Ranked feed candidates (insta4288/ranking.py): the newest posts of the
+    # feed with their counts, and how many of logname's likes and comments
+    # went to each author's posts.  Comments on logname's own posts are
+    # captions, so logname has no affinity with itself.
+    "rank_candidates": """
+        WITH affinity(owner, interactions) AS (
+            SELECT p.owner, COUNT(*)
+            FROM (
+                SELECT postid FROM likes WHERE owner = ?
+                UNION ALL
+                SELECT postid FROM comments WHERE owner = ?
+            ) AS i
+            JOIN posts AS p ON p.postid = i.postid AND p.owner != ?
+            GROUP BY p.owner
+        )
+        SELECT p.postid,
+               CAST(strftime('%s', p.created) AS INTEGER) AS created,
+               s.like_count AS likes, s.comment_count AS comments,
+               COALESCE(a.interactions, 0) AS affinity
+        FROM posts AS p
+        JOIN post_stats AS s ON s.postid = p.postid
+        LEFT JOIN affinity AS a ON a.owner = p.owner
+        WHERE p.owner = ? OR p.owner IN (
+            SELECT username2 FROM following WHERE username1 = ?
+        )
+        ORDER BY p.postid DESC
+        LIMIT ?
+    """,
+    "feed_liked": """
+        SELECT postid FROM likes
+        WHERE owner = ? AND postid IN (SELECT value FROM json_each(?))
+    """,
+    # The newest few comments of each post: one range of comments_postid,
+    # which is ordered by (postid, commentid), per post on the page.
+    "feed_comments": """
+        SELECT c.postid, c.commentid, c.owner, c.text
+        FROM json_each(?) AS j
+        JOIN comments AS c ON c.commentid IN (
+            SELECT commentid FROM comments
+            WHERE postid = j.value
+            ORDER BY commentid DESC
+            LIMIT ?
+        )
+        ORDER BY c.postid, c.commentid
+    """,
+
+    # Single post page
+    "post_detail": """
+        SELECT
+            p.postid,
+            p.filename AS img_url,
+            p.owner,
+            u.filename AS owner_img_url,
+            p.created AS created,
+            COALESCE(s.like_count, 0) AS likes,
+            COALESCE(s.comment_count, 0) AS comment_count,
+            (
+              SELECT COUNT(*) FROM likes WHERE postid = p.postid AND owner = ?
+            ) AS user_liked
+        FROM posts AS p
+        JOIN users AS u ON u.username = p.owner
+        LEFT JOIN post_stats AS s ON s.postid = p.postid
+        WHERE p.postid = ?
+    """,
+    # One page of a post's comments, oldest first, after a commentid
+    # cursor.  commentid is the rowid, so comments_postid(postid) is already
+    # ordered by (postid, commentid) and the page is one index range however
+    # many comments the post has.
+    "post_comments": """
+        SELECT commentid, owner, text
+        FROM comments
+        WHERE postid = ? AND commentid > ?
+        ORDER BY commentid
+        LIMIT ?
+    """,
+
+    # User pages
+    "user_summary": """
+        SELECT username, fullname, filename AS user_img_url
+        FROM users
+        WHERE username = ?
+    """,
+    # Profile header, logname's relationship and a page of the post grid in
+    # one round trip: one row per post before the cursor, newest first, with
+    # the header columns repeated, or a single row with a NULL postid when
+    # there are none.  Counts come from user_stats, so the cost does not grow
+    # with followers.  posts_owner holds (owner, postid), so the page is a
+    # range of that index.
+    "user_profile": """
+        SELECT u.username, u.fullname, u.filename AS user_img_url,
+               s.post_count, s.follower_count, s.following_count,
+               f.username1 IS NOT NULL AS logname_follows_username,
+               p.postid, p.filename AS img_url
+        FROM users AS u
+        LEFT JOIN user_stats AS s ON s.username = u.username
+        LEFT JOIN following AS f
+          ON f.username1 = ? AND f.username2 = u.username
+        LEFT JOIN posts AS p ON p.owner = u.username AND p.postid < ?
+        WHERE u.username = ?
+        ORDER BY p.postid DESC
+        LIMIT ?
+    """,
+    # A page of followers or following, by username without regard to case,
+    # after the cursor username (passed three times; '' starts from the top).
+    # The first cursor test bounds the index range, the second breaks ties
+    # between usernames that differ only in case.  The LEFT JOIN reads
+    # logname's own edge to each listed user.
+    "user_followers": """
+        SELECT u.username, u.filename AS user_img_url,
+               mine.username1 IS NOT NULL AS logname_follows_username
+        FROM following AS f
+        JOIN users AS u ON u.username = f.username1
+        LEFT JOIN following AS mine
+          ON mine.username1 = ? AND mine.username2 = f.username1
+        WHERE f.username2 = ?
+          AND f.username1 COLLATE NOCASE >= ?
+          AND (f.username1 COLLATE NOCASE > ? OR f.username1 > ?)
+        ORDER BY f.username1 COLLATE NOCASE, f.username1
+        LIMIT ?
+    """,
+    "user_following": """
+        SELECT u.username, u.filename AS user_img_url,
+               mine.username1 IS NOT NULL AS logname_follows_username
+        FROM following AS f
+        JOIN users AS u ON u.username = f.username2
+        LEFT JOIN following AS mine
+          ON mine.username1 = ? AND mine.username2 = f.username2
+        WHERE f.username1 = ?
+          AND f.username2 COLLATE NOCASE >= ?
+          AND (f.username2 COLLATE NOCASE > ? OR f.username2 > ?)
+        ORDER BY f.username2 COLLATE NOCASE, f.username2
+        LIMIT ?
+    """,
+    "user_follower_names":
+        "SELECT username1 FROM following WHERE username2 = ?",
+    "follow_exists": """
+        SELECT 1
+        FROM following
+        WHERE username1 = ? AND username2 = ?
+    """,
+    "explore_users": """
+        SELECT u.username, u.filename AS user_img_url
+        FROM users AS u
+        WHERE u.username != ?
+          AND u.username NOT IN (
+              SELECT username2
+              FROM following
+              WHERE username1 = ?
+          )
+        ORDER BY u.username COLLATE NOCASE
+    """,
+
+    # Data versions for API ETags and cached post page fragments
+    # (sql/migrations/0005_data_versions.sql).
+    # A post's response also shows its owner's photo, so it carries the
+    # owner's version too.
+    "post_version": """
+        SELECT p.postid, s.version AS post_version,
+               us.version AS owner_version
+        FROM posts AS p
+        JOIN post_stats AS s ON s.postid = p.postid
+        JOIN user_stats AS us ON us.username = p.owner
+        WHERE p.postid = ?
+    """,
+    "feed_versions": """
+        SELECT p.postid, s.version AS post_version,
+               us.version AS owner_version
+        FROM posts AS p
+        JOIN post_stats AS s ON s.postid = p.postid
+        JOIN user_stats AS us ON us.username = p.owner
+        WHERE p.postid IN (SELECT value FROM json_each(?))
+        ORDER BY p.postid DESC
+    """,
+    "user_version": "SELECT version FROM user_stats WHERE username = ?",
+
+    # Accounts
+    "account_detail": """
+        SELECT username, fullname, email, filename
+        AS user_img_url FROM users WHERE username = ?
+    """,
+    "account_exists": "SELECT 1 FROM users WHERE username = ?",
+    "account_password":
+        "SELECT username, password FROM users WHERE username = ?",
+    "account_filename": "SELECT filename FROM users WHERE username = ?",
+    "account_post_filenames": "SELECT filename FROM posts WHERE owner = ?",
+    "account_insert": """
+        INSERT INTO users(username, password, fullname, email, filename)
+        VALUES (?, ?, ?, ?, ?)
+    """,
+    "account_delete": "DELETE FROM users WHERE username = ?",
+    "account_update": """
+        UPDATE users SET fullname = ?, email = ? WHERE username = ?
+    """,
+    "account_update_with_photo": """
+        UPDATE users SET fullname = ?, email = ?,
+        filename = ? WHERE username = ?
+    """,
+    "account_update_password":
+        "UPDATE users SET password = ? WHERE username = ?",
+
+    # Likes
+    "like_exists": "SELECT 1 FROM likes WHERE owner = ? AND postid = ?",
+    "like_insert": "INSERT INTO likes(owner, postid) VALUES (?, ?)",
+    "like_delete": "DELETE FROM likes WHERE owner = ? AND postid = ?",
+
+    # Comments
+    "comment_owner": "SELECT owner FROM comments WHERE commentid = ?",
+    "comment_insert":
+        "INSERT INTO comments(owner, postid, text) VALUES (?, ?, ?)",
+    "comment_delete": "DELETE FROM comments WHERE commentid = ?",
+
+    # Posts
+    "post_exists": "SELECT 1 FROM posts WHERE postid = ?",
+    "post_owner":
+        "SELECT postid, owner, filename FROM posts WHERE postid = ?",
+    "post_insert": "INSERT INTO posts(owner, filename) VALUES (?, ?)",
+    "post_delete": "DELETE FROM posts WHERE postid = ?",
+
+    # Timeline maintenance, see insta4288/feed.py.  A new post is either
+    # copied to its owner's followers or recorded in merged_posts, by the
+    # owner's follower count at that moment; a new follower gets a copy of
+    # every post that is not in merged_posts.
+    "timeline_insert":
+        "INSERT OR IGNORE INTO timeline(username, postid) VALUES (?, ?)",
+    "timeline_fan_out": """
+        INSERT OR IGNORE INTO timeline(username, postid)
+        SELECT f.username1, ? FROM following AS f
+        WHERE f.username2 = ?
+          AND (SELECT follower_count FROM user_stats WHERE username = ?) <= ?
+    """,
+    "merged_post_insert": """
+        INSERT INTO merged_posts(owner, postid)
+        SELECT ?, ?
+        WHERE (SELECT follower_count FROM user_stats WHERE username = ?) > ?
+    """,
+    "timeline_backfill": """
+        INSERT OR IGNORE INTO timeline(username, postid)
+        SELECT ?, p.postid FROM posts AS p
+        WHERE p.owner = ?
+          AND NOT EXISTS (
+              SELECT 1 FROM merged_posts AS m
+              WHERE m.owner = p.owner AND m.postid = p.postid
+          )
+    """,
+    "timeline_prune": """
+        DELETE FROM timeline
+        WHERE username = ?
+          AND postid IN (SELECT postid FROM posts WHERE owner = ?)
+    """,
+
+    # Following
+    "follow_insert":
+        "INSERT INTO following(username1, username2) VALUES (?, ?)",
+    "follow_delete":
+        "DELETE FROM following WHERE username1 = ? AND username2 = ?",
+}
+
+# Rows fetched per step by iterate()
+ITERATE_BATCH = 64
+
+# Per-query counters: [calls, total seconds, max seconds, rows]
+_STATS = {name: [0, 0.0, 0.0, 0] for name in SQL}
+_STATS_LOCK = threading.Lock()
+
+
+def _record(name, elapsed, rows):
+    """Add one call to the counters for `name`."""
+    with _STATS_LOCK:
+        counters = _STATS[name]
+        counters[0] += 1
+        counters[1] += elapsed
+        counters[2] = max(counters[2], elapsed)
+        counters[3] += rows
+    instrument.note(name, elapsed, rows)
+
+
+def execute(connection, name, params=()):
+    """Run a write query by name and return its cursor.
+
+    The row count recorded is the number of rows the statement changed.
+    """
+    start = time.perf_counter()
+    cursor = connection.execute(SQL[name], params)
+    _record(name, time.perf_counter() - start, max(cursor.rowcount, 0))
+    return cursor
+
+
+def fetchone(connection, name, params=()):
+    """Run a read query by name and return its first row, or None."""
+    start = time.perf_counter()
+    row = connection.execute(SQL[name], params).fetchone()
+    _record(name, time.perf_counter() - start, int(row is not None))
+    return row
+
+
+def fetchall(connection, name, params=()):
+    """Run a read query by name and return all rows."""
+    start = time.perf_counter()
+    rows = connection.execute(SQL[name], params).fetchall()
+    _record(name, time.perf_counter() - start, len(rows))
+    return rows
+
+
+def iterate(connection, name, params=()):
+    """Run a read query by name and yield its rows as they are read.
+
+    Rows are fetched ITERATE_BATCH at a time rather than collected in a
+    list, so memory stays flat however many rows there are.  The call is
+    recorded when the rows run out or the caller stops early; its latency
+    counts only the time spent fetching.
+    """
+    start = time.perf_counter()
+    cursor = connection.execute(SQL[name], params)
+    elapsed = time.perf_counter() - start
+    rows = 0
+    try:
+        while True:
+            start = time.perf_counter()
+            batch = cursor.fetchmany(ITERATE_BATCH)
+            elapsed += time.perf_counter() - start
+            if not batch:
+                break
+            rows += len(batch)
+            yield from batch
+    finally:
+        cursor.close()
+        _record(name, elapsed, rows)
+
+
+def prewarm(connection):
+    """Prepare every read query on `connection`.
+
+    Each SELECT runs once with every parameter set to 0, which matches no
+    rows (and is a valid LIMIT) but leaves the compiled statement in the
+    connection's statement cache.  Write statements are not run; they are
+    compiled on first use.
+    """
+    for sql in SQL.values():
+        if sql.lstrip().upper().startswith("SELECT"):
+            connection.execute(sql, (0,) * sql.count("?")).fetchall()
+
+
+def stats():
+    """Return counters for every query that has been called, hottest first.
+
+    Latencies are in milliseconds.
+    """
+    with _STATS_LOCK:
+        snapshot = {name: list(counters) for name, counters in _STATS.items()}
+    report = {
+        name: {
+            "calls": calls,
+            "total_ms": round(total * 1000, 3),
+            "avg_ms": round(total * 1000 / calls, 3),
+            "max_ms": round(longest * 1000, 3),
+            "rows": rows,
+        }
+        for name, (calls, total, longest, rows) in snapshot.items()
+        if calls
+    }
+    return dict(sorted(report.items(),
+                       key=lambda item: item[1]["total_ms"], reverse=True))
+
+
+def reset_stats():
+    """Zero all query counters."""
+    with _STATS_LOCK:
+        for counters in _STATS.values():
+            counters[:] = [0, 0.0, 0.0, 0]
@@ -0,0 +1,76 @@
+"""Ranked home feed.
+
+The chronological feed orders posts by postid.  The ranked feed reads the
+newest FEED_RANK_CANDIDATES posts of the same feed with one query, which
+also returns each post's like and comment counts and how often logname has
+liked or commented on the author's posts.  NumPy scores every candidate at
+once:
+
+    score = 2 ** (-age_hours / FEED_RANK_HALF_LIFE) * (1
+            + likes weight * ln(1 + likes)
+            + comments weight * ln(1 + comments)
+            + affinity weight * ln(1 + logname's interactions with author))
+
+and the page is cut from the ranking, best first, with ties going to the
+newer post.  bench/bench_ranking.py times scoring 10,000 candidates.
+"""
+import numpy as np
+import insta4288
+
+# One candidate, as returned by the rank_candidates query
+CANDIDATE = np.dtype([
+    ('postid', np.int64),
+    ('created', np.int64),
+    ('likes', np.int64),
+    ('comments', np.int64),
+    ('affinity', np.int64),
+])
+
+
+def score(candidates, now, half_life, weights):
+    """Return the score of each row of a CANDIDATE array at time `now`."""
+    age_hours = np.maximum(now - candidates['created'], 0) / 3600.0
+    interest = (
+        1.0
+        + weights['likes'] * np.log1p(candidates['likes'])
+        + weights['comments'] * np.log1p(candidates['comments'])
+        + weights['affinity'] * np.log1p(candidates['affinity'])
+    )
+    return np.exp2(-age_hours / half_life) * interest
+
+
+def top(postids, scores, offset, limit):
+    """Return the postids ranked offset to offset + limit - 1, best first.
+
+    Only candidates scoring at least the last wanted rank's score are
+    sorted; np.partition finds that score in linear time.
+    """
+    end = min(offset + limit, len(scores))
+    if offset >= end:
+        return []
+    cutoff = -np.partition(-scores, end - 1)[end - 1]
+    best = np.flatnonzero(scores >= cutoff)
+    order = best[np.lexsort((-postids[best], -scores[best]))]
+    return postids[order[offset:end]].tolist()
+
+
+def fetch_page(connection, logname, offset, limit):
+    """Return up to `limit` feed posts from rank `offset` on, best first.
+
+    Rows have the same columns as insta4288.feed.fetch_page().
+    """
+    config = insta4288.app.config
+    rows = insta4288.queries.fetchall(
+        connection, 'rank_candidates',
+        (logname, logname, logname, logname, logname,
+         config['FEED_RANK_CANDIDATES']),
+    )
+    candidates = np.fromiter((tuple(row.values()) for row in rows),
+                             dtype=CANDIDATE, count=len(rows))
+    scores = score(candidates, insta4288.timestamps.request_now(),
+                   config['FEED_RANK_HALF_LIFE'], config['FEED_RANK_WEIGHTS'])
+    postids = top(candidates['postid'], scores, offset, limit)
+
+    rank = {postid: position for position, postid in enumerate(postids)}
+    posts = insta4288.feed.posts_by_id(connection, postids)
+    return sorted(posts, key=lambda post: rank[post['postid']])
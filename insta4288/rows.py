@@ -0,0 +1,156 @@
+"""Compact record rows for sqlite3 query results.
+
+Each distinct column layout gets one record class, built the first time the
+layout is seen and cached afterwards.  A record keeps the tuple sqlite3
+fetched, so materializing a row costs one small object instead of a dict.
+Records support both attribute access (``post.owner``) and mapping access
+(``post['owner']``, ``dict(post)``), which covers Jinja templates and
+existing view code.  Like dicts, they iterate over their keys; they are not
+tuples, so nothing mistakes them for a sequence of values.  The app's JSON
+provider (insta4288/model.py) serializes them as objects.
+
+Views may attach derived values (``post['comments'] = ...``); these live in a
+per-instance dict that is only allocated when first used.  Column values are
+read-only.
+"""
+import keyword
+import operator
+
+
+class Record:
+    """Base class for cached row classes; one subclass per column layout."""
+
+    __slots__ = ("_row", "__dict__")
+    _fields = ()
+    _index = {}
+
+    def __init__(self, row):
+        """Wrap one row tuple fetched by sqlite3."""
+        self._row = row
+
+    def __getitem__(self, key):
+        """Look up a column by name, or by position for integer keys."""
+        if isinstance(key, str):
+            index = self._index.get(key)
+            if index is None:
+                try:
+                    return self.__dict__[key]
+                except KeyError:
+                    raise KeyError(key) from None
+            return self._row[index]
+        return self._row[key]
+
+    def __setitem__(self, key, value):
+        """Attach a derived value that is not a column of this row."""
+        if key in self._index:
+            raise TypeError(f"column '{key}' is read-only")
+        self.__dict__[key] = value
+
+    def __getattr__(self, name):
+        """Fall back to derived values and non-identifier column names."""
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __contains__(self, key):
+        """Return True if `key` is a column or derived value."""
+        return key in self._index or key in self.__dict__
+
+    def __iter__(self):
+        """Iterate over keys, like a dict."""
+        return iter(self.keys())
+
+    def __len__(self):
+        """Return the number of keys, like a dict."""
+        return len(self._fields) + len(self.__dict__)
+
+    def __eq__(self, other):
+        """Compare equal to records and dicts with the same items."""
+        if isinstance(other, (Record, dict)):
+            return dict(self) == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        """Show the record as the dict it stands in for."""
+        return f"Record({dict(self)!r})"
+
+    def keys(self):
+        """Return column names followed by any derived keys."""
+        return self._fields + tuple(self.__dict__)
+
+    def values(self):
+        """Return values in the same order as keys()."""
+        return [value for _, value in self.items()]
+
+    def items(self):
+        """Return (key, value) pairs in the same order as keys()."""
+        pairs = [(name, self._row[self._index[name]])
+                 for name in self._fields]
+        return pairs + list(self.__dict__.items())
+
+    def get(self, key, default=None):
+        """Return the value for `key`, or `default` if absent."""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+def _build_record_class(names):
+    """Create the record class for one tuple of column names.
+
+    Duplicate names resolve to the last column, matching a dict built from
+    the same row.
+    """
+    index = {name: position for position, name in enumerate(names)}
+    fields = tuple(index)
+    namespace = {"_fields": fields, "_index": index}
+    for name, position in index.items():
+        if (name.isidentifier() and not keyword.iskeyword(name)
+                and not hasattr(Record, name)):
+            namespace[name] = property(operator.itemgetter(position))
+    return type("Record", (Record,), namespace)
+
+
+class RecordFactory:
+    """sqlite3 row factory returning cached record classes.
+
+    All rows of one result set share the same ``cursor.description`` object,
+    so the class lookup is an identity check for every row after the first.
+    """
+
+    def __init__(self):
+        """Start with an empty class cache."""
+        self._classes = {}
+        self._last = (None, None)
+
+    def __call__(self, cursor, row):
+        """Convert one database row to a record."""
+        description, record_class = self._last
+        if cursor.description is not description:
+            record_class = self.record_class(cursor.description)
+        return record_class(row)
+
+    def record_class(self, description):
+        """Return the record class for a cursor description."""
+        last_description, last_class = self._last
+        if description is last_description:
+            return last_class
+        names = tuple(column[0] for column in description)
+        record_class = self._classes.get(names)
+        if record_class is None:
+            record_class = self._classes.setdefault(
+                names, _build_record_class(names)
+            )
+        self._last = (description, record_class)
+        return record_class
+
+    def cached_layouts(self):
+        """Return the column layouts that have a cached class."""
+        return list(self._classes)
+
+
+record_factory = RecordFactory()
@@ -0,0 +1,122 @@
+"""Relative post timestamps ("3 hours ago").
+
+Templates format a post's `created` value with the reltime filter.  This
+replaces arrow.get(created).humanize() per row: each distinct `created`
+string is parsed once and cached, every timestamp in a request is measured
+from one "now", and ages under a week are looked up in a fixed bucket
+table.  Wording and thresholds follow arrow's English humanize().
+
+With TIMESTAMP_ELEMENT set the label is wrapped in <time datetime="...">
+holding the absolute UTC time, so a client script can keep labels current.
+"""
+import bisect
+import calendar
+import datetime
+import functools
+import time
+import flask
+import markupsafe
+import insta4288
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+MONTH = 30.5 * DAY
+YEAR = 365 * DAY
+
+# Ages under a week: (upper bound in seconds, timeframe, unit).  A timeframe
+# with {0} takes the age in units, but never less than 2.
+_BUCKETS = (
+    (10, 'just now', None),
+    (MINUTE, '{0} seconds', 1),
+    (2 * MINUTE, 'a minute', None),
+    (HOUR, '{0} minutes', MINUTE),
+    (2 * HOUR, 'an hour', None),
+    (DAY, '{0} hours', HOUR),
+    (2 * DAY, 'a day', None),
+    (WEEK, '{0} days', DAY),
+)
+_BOUNDS = [bucket[0] for bucket in _BUCKETS]
+
+
+@functools.lru_cache(maxsize=4096)
+def parse(created):
+    """Return a SQLite UTC timestamp ('YYYY-MM-DD HH:MM:SS') as a datetime."""
+    return datetime.datetime.fromisoformat(created).replace(
+        tzinfo=datetime.timezone.utc
+    )
+
+
+def request_now():
+    """Return the time, in epoch seconds, that this request measures from."""
+    if not flask.has_request_context():
+        return time.time()
+    return flask.g.setdefault('now', time.time())
+
+
+def humanize(created, now=None):
+    """Return how long ago `created` was, in arrow's English wording."""
+    if now is None:
+        now = request_now()
+    then = parse(created)
+    delta = round(now - then.timestamp())
+    diff = abs(delta)
+    if diff < _BOUNDS[0]:
+        return _BUCKETS[0][1]
+    if diff < WEEK:
+        _, frame, unit = _BUCKETS[bisect.bisect_right(_BOUNDS, diff)]
+        if unit is not None:
+            frame = frame.format(max(diff // unit, 2))
+    else:
+        moment = datetime.datetime.fromtimestamp(now, datetime.timezone.utc)
+        frame = _long_timeframe(diff, *sorted((then, moment)))
+    return f"{frame} ago" if delta >= 0 else f"in {frame}"
+
+
+def _long_timeframe(diff, earlier, later):
+    """Return the timeframe for a gap of at least a week."""
+    months = _calendar_months(earlier, later)
+    if months >= 1 and diff < YEAR:
+        return "a month" if months == 1 else f"{months} months"
+    if diff < 2 * WEEK:
+        return "a week"
+    if diff < MONTH:
+        return f"{max(diff // WEEK, 2)} weeks"
+    if diff < 2 * YEAR:
+        return "a year"
+    return f"{max(diff // YEAR, 2)} years"
+
+
+def _calendar_months(earlier, later):
+    """Return whole calendar months between two datetimes, capped at 12.
+
+    A remainder of more than two weeks counts as a month.
+    """
+    months = (later.year - earlier.year) * 12 + later.month - earlier.month
+    shifted = _add_months(earlier, months)
+    while later < shifted:
+        months -= 1
+        shifted = _add_months(earlier, months)
+    if (later - shifted).days > 14:
+        months += 1
+    return min(months, 12)
+
+
+def _add_months(moment, months):
+    """Return `moment` moved by whole months, clipping to the month's end."""
+    year, month = divmod(moment.month - 1 + months, 12)
+    year += moment.year
+    day = min(moment.day, calendar.monthrange(year, month + 1)[1])
+    return moment.replace(year=year, month=month + 1, day=day)
+
+
+@insta4288.app.template_filter('reltime')
+def reltime(created):
+    """Format `created` relative to now, in a <time> element if enabled."""
+    label = humanize(created)
+    if not insta4288.app.config['TIMESTAMP_ELEMENT']:
+        return label
+    return markupsafe.Markup('<time datetime="{}">{}</time>').format(
+        parse(created).isoformat(), label
+    )
@@ -0,0 +1,69 @@
+"""Starting SQLite transactions under lock contention.
+
+SQLite reports a lock it cannot get as SQLITE_BUSY.  busy_timeout already
+makes each statement wait for a while; begin() adds a retry loop on top of
+it, sleeping a random ("full jitter") exponential backoff between attempts
+so that competing workers do not retry in lockstep, and gives up with
+DatabaseBusy once the deadline has passed.
+
+Only the statements that acquire locks are retried.  A BEGIN IMMEDIATE
+transaction already holds the write lock, and a read transaction already has
+its snapshot, so the statements run after begin() returns do not hit
+SQLITE_BUSY and never need to be re-run.
+"""
+import random
+import sqlite3
+import time
+
+# Primary result codes that mean "someone else holds the lock"
+_BUSY_CODES = frozenset({sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED})
+
+
+class DatabaseBusy(Exception):
+    """The database stayed locked past the retry deadline."""
+
+
+def is_busy(error):
+    """Return True if `error` is SQLITE_BUSY or SQLITE_LOCKED."""
+    code = getattr(error, "sqlite_errorcode", None)
+    return code is not None and (code & 0xff) in _BUSY_CODES
+
+
+def backoff_delays(base, cap):
+    """Yield full-jitter exponential backoff delays, in seconds."""
+    attempt = 0
+    while True:
+        yield random.uniform(0, min(cap, base * 2 ** attempt))
+        attempt += 1
+
+
+def begin(connection, immediate, policy):
+    """Start a transaction on `connection`, retrying while it is busy.
+
+    An immediate transaction takes the write lock up front.  A deferred one
+    reads the schema page straight away, so its snapshot is pinned here,
+    where SQLITE_BUSY can be retried, rather than by the caller's first
+    query.  `policy` is (deadline, base, cap) in seconds.  Return the number
+    of retries needed.
+    """
+    deadline, base, cap = policy
+    give_up = time.monotonic() + deadline
+    for retries, delay in enumerate(backoff_delays(base, cap)):
+        try:
+            if immediate:
+                connection.execute("BEGIN IMMEDIATE")
+            else:
+                connection.execute("BEGIN")
+                connection.execute("SELECT 1 FROM sqlite_schema LIMIT 1")
+            return retries
+        except sqlite3.OperationalError as error:
+            if connection.in_transaction:
+                connection.rollback()
+            if not is_busy(error):
+                raise
+            if time.monotonic() + delay > give_up:
+                raise DatabaseBusy(
+                    f"database is locked after {retries + 1} attempts"
+                ) from error
+        time.sleep(delay)
+    return None
@@ -18,3 +18,4 @@ from insta4288.views.actions import (update_likes,
                                      update_following,
                                      accounts_ops)
 from insta4288.views.auth_gate import require_login_for_get_pages
+from insta4288.views.debug import show_stats
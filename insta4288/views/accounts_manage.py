@@ -11,14 +11,12 @@ import insta4288
 
 
 def _get_user_row(connection, username):
-    row = connection.execute(
-        """SELECT username, fullname, email, filename
-        AS user_img_url FROM users WHERE username = ?""",
-        (username,),
-    ).fetchone()
+    row = insta4288.queries.fetchone(
+        connection, 'account_detail', (username,)
+    )
     if row is None:
         flask.abort(404)
-    return dict(row)
+    return row
 
 
 @insta4288.app.route("/accounts/delete/", methods=["GET"])
@@ -33,8 +31,8 @@ def accounts_delete():
 def accounts_edit():
     """Edit account screen."""
     logname = flask.session.get('logname')
-    connection = insta4288.model.get_db()
-    user = _get_user_row(connection, logname)
+    with insta4288.model.read_scope() as connection:
+        user = _get_user_row(connection, logname)
 
     context = {
         "logname": logname,
@@ -8,6 +8,7 @@ All POST actions for Insta4288.
 - /accounts/  (login/create/delete/edit_account/update_password)
 """
 
+import contextlib
 import hashlib
 import pathlib
 import uuid
@@ -72,6 +73,22 @@ def _safe_remove_upload(basename: str) -> None:
             LOGGER.warning("Could not remove file %s: %s", target, e)
 
 
+@contextlib.contextmanager
+def _upload_kept_on_success(basename: Optional[str]):
+    """Remove the saved upload `basename` if the enclosed block raises.
+
+    Uploads are saved before the write transaction starts, so that the
+    writer is not held while a large file is written to disk.
+    """
+    kept = False
+    try:
+        yield
+        kept = True
+    finally:
+        if not kept:
+            _safe_remove_upload(basename)
+
+
 def _hash_password(password: str) -> str:
     """Return 'sha512$salt$hash' string."""
     algorithm = "sha512"
@@ -108,36 +125,35 @@ def update_likes():
         flask.abort(400)
     target = flask.request.args.get("target", "/")
 
-    connection = insta4288.model.get_db()
+    insta4288.model.run_write(
+        lambda connection: _apply_like(connection, logname, op, postid)
+    )
+    return flask.redirect(target)
 
-    existing = connection.execute(
-        "SELECT 1 FROM likes WHERE owner = ? AND postid = ?",
-        (logname, postid),
-    ).fetchone()
+
+def _apply_like(connection, logname, op, postid):
+    existing = insta4288.queries.fetchone(
+        connection, "like_exists", (logname, postid),
+    )
 
     if op == "like":
         if existing:
             flask.abort(409)
-        post_row = connection.execute(
-            "SELECT 1 FROM posts WHERE postid = ?",
-            (postid,),
-        ).fetchone()
+        post_row = insta4288.queries.fetchone(
+            connection, "post_exists", (postid,),
+        )
         if not post_row:
             flask.abort(404)
-        connection.execute(
-            "INSERT INTO likes(owner, postid) VALUES (?, ?)",
-            (logname, postid),
+        insta4288.queries.execute(
+            connection, "like_insert", (logname, postid),
         )
     else:  # unlike
         if not existing:
             flask.abort(409)
-        connection.execute(
-            "DELETE FROM likes WHERE owner = ? AND postid = ?",
-            (logname, postid),
+        insta4288.queries.execute(
+            connection, "like_delete", (logname, postid),
         )
 
-    return flask.redirect(target)
-
 
 @insta4288.app.route("/comments/", methods=["POST"])
 def update_comments():
@@ -150,42 +166,25 @@ def update_comments():
     text = flask.request.form.get("text", "")
     target = flask.request.args.get("target", "/")
 
-    connection = insta4288.model.get_db()
-
     if op == "create":
         if not postid:
             flask.abort(400)
         if text is None or text.strip() == "":
             flask.abort(400)
 
-        post_row = connection.execute(
-            "SELECT 1 FROM posts WHERE postid = ?",
-            (postid,),
-        ).fetchone()
-        if not post_row:
-            flask.abort(404)
-
-        connection.execute(
-            "INSERT INTO comments(owner, postid, text) VALUES (?, ?, ?)",
-            (logname, postid, text),
+        insta4288.model.run_write(
+            lambda connection: _create_comment(
+                connection, logname, postid, text
+            )
         )
         return flask.redirect(target)
 
     if op == "delete":
         if not commentid:
             flask.abort(400)
-        row = connection.execute(
-            "SELECT owner FROM comments WHERE commentid = ?",
-            (commentid,),
-        ).fetchone()
-        if not row:
-            flask.abort(404)
-        if row["owner"] != logname:
-            flask.abort(403)
 
-        connection.execute(
-            "DELETE FROM comments WHERE commentid = ?",
-            (commentid,),
+        insta4288.model.run_write(
+            lambda connection: _delete_comment(connection, logname, commentid)
         )
         return flask.redirect(target)
 
@@ -193,6 +192,32 @@ def update_comments():
     flask.abort(400)
 
 
+def _create_comment(connection, logname, postid, text):
+    post_row = insta4288.queries.fetchone(
+        connection, "post_exists", (postid,),
+    )
+    if not post_row:
+        flask.abort(404)
+
+    insta4288.queries.execute(
+        connection, "comment_insert", (logname, postid, text),
+    )
+
+
+def _delete_comment(connection, logname, commentid):
+    row = insta4288.queries.fetchone(
+        connection, "comment_owner", (commentid,),
+    )
+    if not row:
+        flask.abort(404)
+    if row["owner"] != logname:
+        flask.abort(403)
+
+    insta4288.queries.execute(
+        connection, "comment_delete", (commentid,),
+    )
+
+
 @insta4288.app.route("/posts/", methods=["POST"])
 def update_posts():
     """Create or delete a post."""
@@ -202,32 +227,41 @@ def update_posts():
     postid = flask.request.form.get("postid", "").strip()
     target = flask.request.args.get("target", f"/users/{logname}/")
 
-    connection = insta4288.model.get_db()
-
     if op == "create":
         # Save upload, insert post
         uuid_basename = _save_upload_and_get_filename("file")
-        connection.execute(
-            "INSERT INTO posts(owner, filename) VALUES (?, ?)",
-            (logname, uuid_basename),
-        )
+        with _upload_kept_on_success(uuid_basename), \
+                insta4288.model.write_scope() as connection:
+            postid = insta4288.queries.execute(
+                connection, "post_insert", (logname, uuid_basename),
+            ).lastrowid
+            update_feed_cache = insta4288.feed.fan_out(
+                connection, logname, postid
+            )
+        update_feed_cache()
         return flask.redirect(target)
 
     if op == "delete":
         if not postid:
             flask.abort(400)
-        row = connection.execute(
-            "SELECT owner, filename FROM posts WHERE postid = ?",
-            (postid,),
-        ).fetchone()
-        if not row:
-            flask.abort(404)
-        if row["owner"] != logname:
-            flask.abort(403)
-
+        with insta4288.model.write_scope() as connection:
+            row = insta4288.queries.fetchone(
+                connection, "post_owner", (postid,),
+            )
+            if not row:
+                flask.abort(404)
+            if row["owner"] != logname:
+                flask.abort(403)
+            update_feed_cache = insta4288.feed.post_deleted(
+                connection, logname, row["postid"]
+            )
+            insta4288.queries.execute(
+                connection, "post_delete", (row["postid"],)
+            )
+
+        # Remove the file once the delete is committed
+        update_feed_cache()
         _safe_remove_upload(row["filename"])
-        connection.execute("DELETE FROM posts WHERE postid = ?", (postid,))
-
         return flask.redirect(target)
 
     flask.abort(400)
@@ -245,36 +279,40 @@ def update_following():
     if not username or op not in {"follow", "unfollow"}:
         flask.abort(400)
 
-    connection = insta4288.model.get_db()
+    update_feed_cache = insta4288.model.run_write(
+        lambda connection: _apply_follow(connection, logname, op, username)
+    )
+    update_feed_cache()
+    return flask.redirect(target)
+
+
+def _apply_follow(connection, logname, op, username):
     # Make sure the user exists
-    exists = connection.execute(
-        "SELECT 1 FROM users WHERE username = ?",
-        (username,),
-    ).fetchone()
+    exists = insta4288.queries.fetchone(
+        connection, "account_exists", (username,),
+    )
     if not exists:
         flask.abort(404)
 
-    rel = connection.execute(
-        "SELECT 1 FROM following WHERE username1 = ? AND username2 = ?",
-        (logname, username),
-    ).fetchone()
+    rel = insta4288.queries.fetchone(
+        connection, "follow_exists", (logname, username),
+    )
 
     if op == "follow":
         if rel:
             flask.abort(409)
-        connection.execute(
-            "INSERT INTO following(username1, username2) VALUES (?, ?)",
-            (logname, username),
-        )
-    else:  # unfollow
-        if not rel:
-            flask.abort(409)
-        connection.execute(
-            "DELETE FROM following WHERE username1 = ? AND username2 = ?",
-            (logname, username),
+        insta4288.queries.execute(
+            connection, "follow_insert", (logname, username),
         )
+        return insta4288.feed.follow(connection, logname, username)
 
-    return flask.redirect(target)
+    # unfollow
+    if not rel:
+        flask.abort(409)
+    insta4288.queries.execute(
+        connection, "follow_delete", (logname, username),
+    )
+    return insta4288.feed.unfollow(connection, logname, username)
 
 
 @insta4288.app.route("/accounts/", methods=["POST"])
@@ -282,42 +320,45 @@ def accounts_ops():
     """Handle login, create, delete, edit, update_password."""
     op = flask.request.form.get("operation", "").strip()
     target = flask.request.args.get("target", "/")
-    connection = insta4288.model.get_db()
 
     handlers = {
-        "login": lambda: _op_login(connection, target),
-        "create": lambda: _op_create(connection, target),
-        "delete": lambda: _op_delete_account(connection, target),
-        "edit_account": lambda: _op_edit_account(connection, target),
-        "update_password": lambda: _op_update_password(connection, target),
+        "login": _op_login,
+        "create": _op_create,
+        "delete": _op_delete_account,
+        "edit_account": _op_edit_account,
+        "update_password": _op_update_password,
     }
 
     handler = handlers.get(op)
     if not handler:
         flask.abort(400)
-    return handler()
+    return handler(target)
 
 
 # Operation helpers
 
-def _op_login(connection, target):
+def _op_login(target):
     username = flask.request.form.get("username", "").strip()
     password = flask.request.form.get("password", "").strip()
     if not username or not password:
         flask.abort(400)
 
-    row = connection.execute(
-        "SELECT username, password FROM users WHERE username = ?",
-        (username,),
-    ).fetchone()
-    if not row or not _verify_password(password, row["password"]):
-        flask.abort(403)
+    with insta4288.model.read_scope() as connection:
+        row = insta4288.queries.fetchone(
+            connection, "account_password", (username,),
+        )
+        if not row or not _verify_password(password, row["password"]):
+            flask.abort(403)
+
+        # Have the feed ready for the redirect to /
+        if insta4288.app.config["FEED_CACHE"]:
+            insta4288.feed.warm(connection, row["username"])
 
     flask.session["logname"] = row["username"]
     return flask.redirect(target)
 
 
-def _op_create(connection, target):
+def _op_create(target):
     username = flask.request.form.get("username", "").strip()
     password = flask.request.form.get("password", "").strip()
     fullname = flask.request.form.get("fullname", "").strip()
@@ -325,43 +366,44 @@ def _op_create(connection, target):
     if not (username and password and fullname and email):
         flask.abort(400)
 
-    exists = connection.execute(
-        "SELECT 1 FROM users WHERE username = ?",
-        (username,),
-    ).fetchone()
-    if exists:
-        flask.abort(409)
-
-    photo_basename = _save_upload_and_get_filename("file")
     pwd_db = _hash_password(password)
-    connection.execute(
-        """
-        INSERT INTO users(username, password, fullname, email, filename)
-        VALUES (?, ?, ?, ?, ?)
-        """,
-        (username, pwd_db, fullname, email, photo_basename),
-    )
+    photo_basename = _save_upload_and_get_filename("file")
+    with _upload_kept_on_success(photo_basename), \
+            insta4288.model.write_scope() as connection:
+        exists = insta4288.queries.fetchone(
+            connection, "account_exists", (username,),
+        )
+        if exists:
+            flask.abort(409)
+
+        insta4288.queries.execute(
+            connection, "account_insert",
+            (username, pwd_db, fullname, email, photo_basename),
+        )
 
     flask.session["logname"] = username
     return flask.redirect(target)
 
 
-def _op_delete_account(connection, target):
+def _op_delete_account(target):
     logname = _require_login()
 
-    post_files = connection.execute(
-        "SELECT filename FROM posts WHERE owner = ?",
-        (logname,),
-    ).fetchall()
-    user_file_row = connection.execute(
-        "SELECT filename FROM users WHERE username = ?",
-        (logname,),
-    ).fetchone()
+    with insta4288.model.write_scope() as connection:
+        post_files = insta4288.queries.fetchall(
+            connection, "account_post_filenames", (logname,),
+        )
+        user_file_row = insta4288.queries.fetchone(
+            connection, "account_filename", (logname,),
+        )
 
-    # Delete user
-    connection.execute("DELETE FROM users WHERE username = ?", (logname,))
+        # Delete user
+        update_feed_cache = insta4288.feed.account_deleted(
+            connection, logname
+        )
+        insta4288.queries.execute(connection, "account_delete", (logname,))
 
     # Remove files after DB delete
+    update_feed_cache()
     for pf in post_files:
         _safe_remove_upload(pf["filename"])
     if user_file_row:
@@ -371,7 +413,7 @@ def _op_delete_account(connection, target):
     return flask.redirect(target)
 
 
-def _op_edit_account(connection, target):
+def _op_edit_account(target):
     logname = _require_login()
 
     fullname = flask.request.form.get("fullname", "").strip()
@@ -379,32 +421,34 @@ def _op_edit_account(connection, target):
     if not fullname or not email:
         flask.abort(400)
 
-    current = connection.execute(
-        "SELECT filename FROM users WHERE username = ?",
-        (logname,),
-    ).fetchone()
-    if not current:
-        flask.abort(404)
-
     file_obj = flask.request.files.get("file")
+    new_basename = None
     if file_obj and file_obj.filename:
         new_basename = _save_upload_and_get_filename("file")
-        connection.execute(
-            """UPDATE users SET fullname = ?, email = ?,
-            filename = ? WHERE username = ?""",
-            (fullname, email, new_basename, logname),
-        )
-        _safe_remove_upload(current["filename"])
-    else:
-        connection.execute(
-            "UPDATE users SET fullname = ?, email = ? WHERE username = ?",
-            (fullname, email, logname),
+    with _upload_kept_on_success(new_basename), \
+            insta4288.model.write_scope() as connection:
+        current = insta4288.queries.fetchone(
+            connection, "account_filename", (logname,),
         )
+        if not current:
+            flask.abort(404)
 
+        if new_basename:
+            insta4288.queries.execute(
+                connection, "account_update_with_photo",
+                (fullname, email, new_basename, logname),
+            )
+        else:
+            insta4288.queries.execute(
+                connection, "account_update", (fullname, email, logname),
+            )
+
+    if new_basename:
+        _safe_remove_upload(current["filename"])
     return flask.redirect(target)
 
 
-def _op_update_password(connection, target):
+def _op_update_password(target):
     logname = _require_login()
 
     old = flask.request.form.get("password", "").strip()
@@ -413,18 +457,17 @@ def _op_update_password(connection, target):
     if not (old and new1 and new2):
         flask.abort(400)
 
-    row = connection.execute(
-        "SELECT password FROM users WHERE username = ?",
-        (logname,),
-    ).fetchone()
-    if not row or not _verify_password(old, row["password"]):
-        flask.abort(403)
-    if new1 != new2:
-        flask.abort(401)
+    with insta4288.model.write_scope() as connection:
+        row = insta4288.queries.fetchone(
+            connection, "account_password", (logname,),
+        )
+        if not row or not _verify_password(old, row["password"]):
+            flask.abort(403)
+        if new1 != new2:
+            flask.abort(401)
 
-    new_db = _hash_password(new1)
-    connection.execute(
-        "UPDATE users SET password = ? WHERE username = ?",
-        (new_db, logname),
-    )
+        new_db = _hash_password(new1)
+        insta4288.queries.execute(
+            connection, "account_update_password", (new_db, logname),
+        )
     return flask.redirect(target)
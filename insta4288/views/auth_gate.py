@@ -27,6 +27,10 @@ def require_login_for_get_pages():
     if flask.session.get("logname"):
         return None
 
+    # API clients get an error they can act on, not a login page
+    if flask.request.blueprint == "api":
+        flask.abort(403)
+
     # Redirect to login if page not in allowed list
     if flask.request.method == "GET":
         if flask.request.endpoint in _PUBLIC_GET_ENDPOINTS:
@@ -0,0 +1,23 @@
+"""
+Runtime statistics for operators.
+
+URL:
+    /debug/stats/
+"""
+
+import flask
+import insta4288
+
+
+@insta4288.app.route('/debug/stats/')
+def show_stats():
+    """Return query, pool, group commit and cache counters as JSON."""
+    if not (insta4288.app.debug or insta4288.app.config['STATS_ENDPOINT']):
+        flask.abort(404)
+    return flask.jsonify(
+        queries=insta4288.queries.stats(),
+        pool=insta4288.model.pool_stats(),
+        group_commit=insta4288.model.group_commit_stats(),
+        feed_cache=insta4288.feed_cache.cache_stats(),
+        fragment_cache=insta4288.fragment_cache.cache_stats(),
+    )
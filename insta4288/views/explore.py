@@ -14,28 +14,14 @@ def show_explore():
     """Render the explore page."""
     logname = flask.session.get('logname')
 
-    connection = insta4288.model.get_db()
-
-    # Query users not followed by logname
-    rows = connection.execute(
-        """
-        SELECT u.username, u.filename AS user_img_url
-        FROM users AS u
-        WHERE u.username != ?
-          AND u.username NOT IN (
-              SELECT username2
-              FROM following
-              WHERE username1 = ?
-          )
-        ORDER BY u.username COLLATE NOCASE
-        """,
-        (logname, logname)
-    ).fetchall()
-
-    not_following = [dict(r) for r in rows]
+    with insta4288.model.read_scope() as connection:
+        # Query users not followed by logname
+        rows = insta4288.queries.fetchall(
+            connection, 'explore_users', (logname, logname)
+        )
 
     context = {
         'logname': logname,
-        'not_following': not_following,
+        'not_following': rows,
     }
     return flask.render_template('explore.html', **context)
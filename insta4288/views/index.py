@@ -6,55 +6,82 @@ URLs include:
 /likes/
 /comments/
 """
-import arrow
 import flask
 import insta4288
+from insta4288.views.paging import page_args
+from insta4288.views.streaming import render_page
+
+
+def _rank_offset():
+    """Return the ranked feed offset, or None for the chronological feed.
+
+    ?ranked=1 or ?ranked=0 picks the feed for this request, so the two can
+    be compared side by side; otherwise FEED_RANKED decides.  A ranked page
+    starts at ?offset=N in the ranking.
+    """
+    ranked = flask.request.args.get('ranked')
+    if ranked not in (None, '0', '1'):
+        flask.abort(400)
+    if ranked == '0' or (
+            ranked is None and not insta4288.app.config['FEED_RANKED']):
+        return None
+    try:
+        offset = int(flask.request.args.get('offset', 0))
+    except ValueError:
+        flask.abort(400)
+    if offset < 0:
+        flask.abort(400)
+    return offset
+
+
+def _feed_posts(logname, before, offset, limit):
+    """Yield a page of feed posts ready for index.html.
+
+    `offset` is None for the chronological feed, which pages by `before`.
+    The last post carries next_url when the feed goes on past this page.
+    """
+    # Query the database for posts, plus one to tell if there are more
+    with insta4288.model.stream_scope() as connection:
+        if offset is None:
+            posts = insta4288.feed.fetch_page(
+                connection, logname, before, limit + 1
+            )
+        else:
+            posts = insta4288.ranking.fetch_page(
+                connection, logname, offset, limit + 1
+            )
+        more = len(posts) > limit
+        posts = insta4288.feed.add_likes_and_comments(
+            connection, logname, posts[:limit]
+        )
+
+    if more:
+        cursor = ({'before': posts[-1]['postid']} if offset is None
+                  else {'offset': offset + limit})
+        posts[-1]['next_url'] = flask.url_for(
+            'show_index', **cursor,
+            ranked=flask.request.args.get('ranked'),
+            limit=flask.request.args.get('limit', type=int),
+        )
+    yield from posts
 
 
 @insta4288.app.route('/')
 def show_index():
-    """Home page for standard instagram feed."""
-    logname = flask.session.get('logname')
+    """Home page for standard instagram feed.
 
-    # Query the database for posts
-    connection = insta4288.model.get_db()
-    posts = connection.execute(
-        """
-        SELECT p.postid, p.filename as img_url, p.owner,
-               u.filename as owner_img_url, p.created as created,
-               (SELECT COUNT(*) FROM likes WHERE postid = p.postid) as likes,
-               (SELECT COUNT(*) FROM likes
-               WHERE postid = p.postid AND owner = ?) as user_liked
-        FROM posts p
-        JOIN users u ON p.owner = u.username
-        WHERE p.owner = ? OR p.owner IN (
-            SELECT username2 FROM following WHERE username1 = ?
-        )
-        ORDER BY p.postid DESC
-        """,
-        (logname, logname, logname)
-    ).fetchall()
-
-    # Convert to list of dictionaries and add comments
-    posts_list = []
-    for post in posts:
-        post_dict = dict(post)
-
-        # Format timestamp using arrow
-        post_dict['timestamp'] = arrow.get(post_dict['created']).humanize()
-
-        # Get comments for this post
-        comments = connection.execute(
-            """SELECT owner, text FROM comments
-            WHERE postid = ? ORDER BY commentid""",
-            (post_dict['postid'],)
-        ).fetchall()
-        post_dict['comments'] = [dict(comment) for comment in comments]
-
-        posts_list.append(post_dict)
-
-    context = {
-        'logname': logname,
-        'posts': posts_list
-    }
-    return flask.render_template('index.html', **context)
+    Posts are shown newest first, one page at a time: /?before=<postid>
+    continues the feed below that postid, and &limit=N sets the page size.
+    A page takes three queries however many posts it shows: the posts with
+    their like counts, which of them logname liked, and their comments.
+    When streamed, the page header is sent before the queries run.
+
+    With /?ranked=1 the posts are ranked instead (insta4288/ranking.py),
+    and pages continue with &offset=N.
+    """
+    logname = flask.session.get('logname')
+    before, limit = page_args('FEED', 'before', insta4288.feed.NEWEST)
+    return render_page(
+        'index.html', logname=logname,
+        posts=_feed_posts(logname, before, _rank_offset(), limit),
+    )
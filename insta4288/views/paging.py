@@ -0,0 +1,31 @@
+"""Cursor and page size arguments for paged lists."""
+import flask
+import insta4288
+
+# Integer cursors are bound as SQLite INTEGERs, which are signed 64-bit
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+
+def page_args(prefix, cursor, default):
+    """Return (cursor, limit) from the query string, or abort(400).
+
+    The cursor is read from ?<cursor>= and has the type of `default`; an
+    integer cursor must fit in a SQLite INTEGER.  ?limit= defaults to
+    config <prefix>_PAGE_SIZE and is capped at <prefix>_MAX_PAGE_SIZE.
+    """
+    config = insta4288.app.config
+    value = flask.request.args.get(cursor, default)
+    try:
+        limit = int(
+            flask.request.args.get('limit', config[f'{prefix}_PAGE_SIZE'])
+        )
+        if isinstance(default, int):
+            value = int(value)
+    except ValueError:
+        flask.abort(400)
+    if limit < 1:
+        flask.abort(400)
+    if isinstance(value, int) and not INT64_MIN <= value <= INT64_MAX:
+        flask.abort(400)
+    return value, min(limit, config[f'{prefix}_MAX_PAGE_SIZE'])
@@ -2,75 +2,124 @@
 Single post view.
 
 URL:
-    /posts/<postid_url_slug>/
+    /posts/<postid_url_slug>/?after=<commentid>&limit=<n>
 """
 
-import arrow
 import flask
 import insta4288
+from insta4288.views.paging import page_args
+
+
+def load_comments(connection, postid, after, limit):
+    """Return up to `limit` comments after `after`, and whether more follow."""
+    comments = insta4288.queries.fetchall(
+        connection, 'post_comments', (postid, after, limit + 1)
+    )
+    return comments[:limit], len(comments) > limit
+
+
+def load_post(connection, logname, postid, after, limit):
+    """Return a post with its like state and a page of comments.
+
+    abort(404) if there is no such post.  more_comments is set when there
+    are comments past the page.
+    """
+    post = insta4288.queries.fetchone(
+        connection, 'post_detail', (logname, postid)
+    )
+    if post is None:
+        flask.abort(404)
+    post['comments'], post['more_comments'] = load_comments(
+        connection, post['postid'], after, limit
+    )
+    return post
+
+
+def _render_fragments(post):
+    """Render the parts of a post page that are the same for every viewer."""
+    def macro(name):
+        return flask.get_template_attribute('post_fragments.html', name)
+
+    comment = macro('comment')
+    return {
+        'media': macro('media')(post['img_url'], post['owner']),
+        'author': macro('author')(post['owner'], post['owner_img_url']),
+        'likes': macro('likes')(post['likes']),
+        'comments': [
+            {
+                'commentid': row['commentid'],
+                'owner': row['owner'],
+                'html': comment(row['owner'], row['text']),
+            }
+            for row in post['comments']
+        ],
+        'owner': post['owner'],
+        'created': post['created'],
+        'more_comments': post['more_comments'],
+    }
+
+
+def _post_fragments(connection, logname, postid, after, limit):
+    """Return (postid, fragments, user_liked) for a post, or abort(404).
+
+    postid is the post's integer id as stored, whatever form the URL gave
+    it in.  Fragments come from the fragment cache while the post's and
+    its owner's data versions are unchanged; then only logname's like
+    needs a query.
+    """
+    versions = insta4288.queries.fetchone(
+        connection, 'post_version', (postid,)
+    )
+    if versions is None:
+        flask.abort(404)
+    cache = insta4288.fragment_cache.get_cache()
+    key = (versions['postid'], after, limit)
+    stamp = (versions['post_version'], versions['owner_version'])
+
+    fragments = cache.get(key, stamp) if cache is not None else None
+    if fragments is not None:
+        liked = insta4288.queries.fetchone(
+            connection, 'like_exists', (logname, versions['postid'])
+        )
+        return versions['postid'], fragments, liked is not None
+
+    post = load_post(connection, logname, versions['postid'], after, limit)
+    fragments = _render_fragments(post)
+    if cache is not None:
+        cache.put(key, stamp, fragments)
+    return versions['postid'], fragments, bool(post['user_liked'])
 
 
 @insta4288.app.route('/posts/<postid_url_slug>/')
 def show_post(postid_url_slug):
-    """Show a single post page."""
+    """Show a single post page.
+
+    Comments are paged oldest first: ?after=<commentid> continues below
+    that comment, and &limit=N sets the page size.
+    """
     logname = flask.session.get('logname')
+    after, limit = page_args('COMMENT', 'after', 0)
 
-    connection = insta4288.model.get_db()
-
-    # Fetch the post or 404
-    row = connection.execute(
-        """
-        SELECT
-            p.postid,
-            p.filename AS img_url,
-            p.owner,
-            u.filename AS owner_img_url,
-            p.created AS created,
-            (
-              SELECT COUNT(*) FROM likes WHERE postid = p.postid
-            ) AS likes,
-            (
-              SELECT COUNT(*) FROM likes WHERE postid = p.postid AND owner = ?
-            ) AS user_liked
-        FROM posts AS p
-        JOIN users AS u ON u.username = p.owner
-        WHERE p.postid = ?
-        """,
-        (logname, postid_url_slug)
-    ).fetchone()
-
-    if row is None:
-        flask.abort(404)
+    with insta4288.model.read_scope() as connection:
+        postid, fragments, user_liked = _post_fragments(
+            connection, logname, postid_url_slug, after, limit
+        )
 
-    post = dict(row)
-    post['timestamp'] = arrow.get(post['created']).humanize()
-
-    # Load comments
-    comments_rows = connection.execute(
-        """
-        SELECT commentid, owner, text
-        FROM comments
-        WHERE postid = ?
-        ORDER BY commentid
-        """,
-        (post['postid'],)
-    ).fetchall()
-
-    comments = []
-    for c in comments_rows:
-        cd = dict(c)
-        cd['is_caption'] = False
-        comments.append(cd)
+    next_url = None
+    if fragments['more_comments']:
+        next_url = flask.url_for(
+            'show_post', postid_url_slug=postid,
+            after=fragments['comments'][-1]['commentid'],
+            limit=flask.request.args.get('limit', type=int),
+        )
 
     context = {
         'logname': logname,
-        'postid': post['postid'],
-        'owner': post['owner'],
-        'owner_img_url': post['owner_img_url'],
-        'img_url': post['img_url'],
-        'likes': post['likes'],
-        'user_liked': post['user_liked'],
-        'timestamp': post['timestamp'],
-        'comments': comments,
+        'postid': postid,
+        'owner': fragments['owner'],
+        'created': fragments['created'],
+        'user_liked': user_liked,
+        'fragments': fragments,
+        'next_url': next_url,
     }
     return flask.render_template('post.html', **context)
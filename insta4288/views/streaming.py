@@ -0,0 +1,31 @@
+"""Buffered or streamed page rendering."""
+import types
+import flask
+import insta4288
+
+
+def render_page(template_name, **context):
+    """Render a page, streaming it when STREAM_TEMPLATES is set.
+
+    Streamed pages are sent as Jinja renders them, so a context value that
+    is a generator is read while the response is going out: the top of the
+    page reaches the browser before the last rows are fetched, and rows are
+    never all in memory at once.  Such generators read through
+    model.stream_scope(), and are closed when the response is, even if it
+    is never read to the end.  Buffered pages read them to lists first, so
+    no read transaction is open while the template renders.  Anything that
+    may abort the request (a 404, a 403) must happen before this is called.
+    """
+    generators = {
+        name: value for name, value in context.items()
+        if isinstance(value, types.GeneratorType)
+    }
+    if not insta4288.app.config['STREAM_TEMPLATES']:
+        context.update(
+            (name, list(value)) for name, value in generators.items()
+        )
+        return flask.render_template(template_name, **context)
+    response = flask.Response(flask.stream_template(template_name, **context))
+    for generator in generators.values():
+        response.call_on_close(generator.close)
+    return response
@@ -3,174 +3,151 @@ Insta4288 user view.
 
 URLs:
     /users/<user_url_slug>/
+    /users/<user_url_slug>/posts/
     /users/<user_url_slug>/followers/
     /users/<user_url_slug>/following/
     /posts/<postid_url_slug>/
 """
 
+import itertools
 import flask
 import insta4288
+from insta4288.views.paging import page_args
+from insta4288.views.streaming import render_page
 
 
 def _get_user_or_404(connection, username):
     """Fetch a user row or abort 404 if not found."""
-    row = connection.execute(
-        """
-        SELECT username, fullname, filename AS user_img_url
-        FROM users
-        WHERE username = ?
-        """,
-        (username,)
-    ).fetchone()
+    row = insta4288.queries.fetchone(connection, 'user_summary', (username,))
     if row is None:
         flask.abort(404)
-    return dict(row)
+    return row
 
 
-@insta4288.app.route('/users/<user_url_slug>/')
-def show_user(user_url_slug):
-    """User profile page."""
-    logname = flask.session.get('logname')
+def load_profile(connection, logname, username, before, limit):
+    """Return a user's profile and a page of thumbnails, or abort(404).
+
+    One query reads the header, logname's relationship and up to `limit`
+    posts older than `before` (see user_profile in insta4288/queries.py).
+    """
+    rows = insta4288.queries.fetchall(
+        connection, 'user_profile', (logname, before, username, limit + 1)
+    )
+    if not rows:
+        flask.abort(404)
+    user_row = rows[0]
+    posts = [row for row in rows if row['postid'] is not None]
 
-    connection = insta4288.model.get_db()
-
-    user_row = _get_user_or_404(connection, user_url_slug)
-
-    total_posts = connection.execute(
-        "SELECT COUNT(*) AS cnt FROM posts WHERE owner = ?",
-        (user_url_slug,)
-    ).fetchone()['cnt']
-
-    followers_cnt = connection.execute(
-        "SELECT COUNT(*) AS cnt FROM following WHERE username2 = ?",
-        (user_url_slug,)
-    ).fetchone()['cnt']
-
-    following_cnt = connection.execute(
-        "SELECT COUNT(*) AS cnt FROM following WHERE username1 = ?",
-        (user_url_slug,)
-    ).fetchone()['cnt']
-
-    rel_row = connection.execute(
-        """
-        SELECT 1
-        FROM following
-        WHERE username1 = ? AND username2 = ?
-        """,
-        (logname, user_url_slug)
-    ).fetchone()
-    logname_follows_username = rel_row is not None
-
-    # Post thumbnails
-    posts = connection.execute(
-        """
-        SELECT postid, filename AS img_url
-        FROM posts
-        WHERE owner = ?
-        ORDER BY postid DESC
-        """,
-        (user_row['username'],)
-    ).fetchall()
-    posts_list = [dict(p) for p in posts]
-
-    context = {
-        'logname': logname,
+    return {
         'username': user_row['username'],
         'fullname': user_row['fullname'],
-        'total_posts': total_posts,
-        'followers': followers_cnt,
-        'following': following_cnt,
-        'logname_follows_username': logname_follows_username,
-        'posts': posts_list,
+        'user_img_url': user_row['user_img_url'],
+        'total_posts': user_row['post_count'] or 0,
+        'followers': user_row['follower_count'] or 0,
+        'following': user_row['following_count'] or 0,
+        'logname_follows_username':
+            bool(user_row['logname_follows_username']),
+        'posts': posts[:limit],
+        'more_posts': len(posts) > limit,
     }
-    return flask.render_template('user.html', **context)
+
+
+def _profile_page(username):
+    """Return logname's view of a page of username's profile and grid.
+
+    The page's next_url continues the grid at the same endpoint, so the
+    profile page links to the next profile page and a grid fragment links
+    to the next fragment.
+    """
+    logname = flask.session.get('logname')
+    before, limit = page_args('PROFILE', 'before', insta4288.feed.NEWEST)
+
+    with insta4288.model.read_scope() as connection:
+        profile = load_profile(connection, logname, username, before, limit)
+
+    profile['next_url'] = None
+    if profile.pop('more_posts'):
+        profile['next_url'] = flask.url_for(
+            flask.request.endpoint, user_url_slug=username,
+            before=profile['posts'][-1]['postid'],
+            limit=flask.request.args.get('limit', type=int),
+        )
+    return dict(profile, logname=logname)
+
+
+@insta4288.app.route('/users/<user_url_slug>/')
+def show_user(user_url_slug):
+    """User profile page.
+
+    The post grid is paged newest first: ?before=<postid> continues below
+    that post, and &limit=N sets the page size.
+    """
+    return flask.render_template('user.html', **_profile_page(user_url_slug))
+
+
+@insta4288.app.route('/users/<user_url_slug>/posts/')
+def show_user_grid(user_url_slug):
+    """Return a page of the profile post grid as an HTML fragment.
+
+    Takes the same ?before= and ?limit= as the profile page.  A script can
+    append the fragment to the grid and follow its own "load more" link.
+    """
+    return flask.render_template(
+        'user_grid.html', **_profile_page(user_url_slug)
+    )
+
+
+def _people(logname, username, query):
+    """Yield a page of the accounts listed by `query` for username.
+
+    The first value is None, once username is known to exist; prime the
+    generator with next() so a missing user is a 404 before any output.
+    The page is read lazily within the same read transaction, one row
+    ahead, so that the last account can carry the next page's next_url.
+    """
+    after, limit = page_args('PEOPLE', 'after', '')
+    with insta4288.model.stream_scope() as connection:
+        # 404 if the user doesn't exist
+        _get_user_or_404(connection, username)
+        yield None
+
+        rows = insta4288.queries.iterate(
+            connection, query,
+            (logname, username, after, after, after, limit + 1),
+        )
+        page = itertools.islice(rows, limit)
+        person = next(page, None)
+        while person is not None:
+            upcoming = next(page, None)
+            if upcoming is None and next(rows, None) is not None:
+                person['next_url'] = flask.url_for(
+                    flask.request.endpoint, user_url_slug=username,
+                    after=person['username'],
+                    limit=flask.request.args.get('limit', type=int),
+                )
+            yield person
+            person = upcoming
 
 
 @insta4288.app.route('/users/<user_url_slug>/followers/')
 def show_followers(user_url_slug):
     """Followers list page: users who follow user_url_slug."""
     logname = flask.session.get('logname')
-    connection = insta4288.model.get_db()
-
-    # 404 if the user doesn't exist
-    _ = _get_user_or_404(connection, user_url_slug)
-
-    # List followers
-    rows = connection.execute(
-        """
-        SELECT u.username, u.filename AS user_img_url
-        FROM following f
-        JOIN users u ON u.username = f.username1
-        WHERE f.username2 = ?
-        ORDER BY u.username COLLATE NOCASE
-        """,
-        (user_url_slug,)
-    ).fetchall()
-
-    followers = []
-    for r in rows:
-        follower = dict(r)
-
-        rel = connection.execute(
-            """
-            SELECT 1
-            FROM following
-            WHERE username1 = ? AND username2 = ?
-            """,
-            (logname, follower['username'])
-        ).fetchone()
-        follower['logname_follows_username'] = rel is not None
-
-        followers.append(follower)
-
-    context = {
-        'logname': logname,
-        'username': user_url_slug,
-        'followers': followers,
-    }
-    return flask.render_template('followers.html', **context)
+    followers = _people(logname, user_url_slug, 'user_followers')
+    next(followers)
+    return render_page(
+        'followers.html', logname=logname, username=user_url_slug,
+        followers=followers,
+    )
 
 
 @insta4288.app.route('/users/<user_url_slug>/following/')
 def show_following(user_url_slug):
     """Following list page: users that user_url_slug is following."""
     logname = flask.session.get('logname')
-    connection = insta4288.model.get_db()
-
-    # 404 if the profile user doesn't exist
-    _ = _get_user_or_404(connection, user_url_slug)
-
-    # List accounts that user_url_slug is following
-    rows = connection.execute(
-        """
-        SELECT u.username, u.filename AS user_img_url
-        FROM following f
-        JOIN users u ON u.username = f.username2
-        WHERE f.username1 = ?
-        ORDER BY u.username COLLATE NOCASE
-        """,
-        (user_url_slug,)
-    ).fetchall()
-
-    following = []
-    for r in rows:
-        person = dict(r)
-
-        rel = connection.execute(
-            """
-            SELECT 1
-            FROM following
-            WHERE username1 = ? AND username2 = ?
-            """,
-            (logname, person['username'])
-        ).fetchone()
-        person['logname_follows_username'] = rel is not None
-
-        following.append(person)
-
-    context = {
-        'logname': logname,
-        'username': user_url_slug,
-        'following': following,
-    }
-    return flask.render_template('following.html', **context)
+    following = _people(logname, user_url_slug, 'user_following')
+    next(following)
+    return render_page(
+        'following.html', logname=logname, username=user_url_slug,
+        following=following,
+    )
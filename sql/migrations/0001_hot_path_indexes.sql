@@ -0,0 +1,21 @@
+-- Secondary indexes for the queries in insta4288/queries.py.  Each index
+-- also holds the table's rowid, so "ORDER BY postid" and "ORDER BY
+-- commentid" are satisfied by the index order.
+
+-- Feed, profile post grid and post count: posts by owner
+CREATE INDEX IF NOT EXISTS posts_owner ON posts(owner);
+
+-- Followers list and follower count.  Lookups by username1 already use the
+-- primary key (username1, username2).
+CREATE INDEX IF NOT EXISTS following_username2
+  ON following(username2, username1);
+
+-- Comments under a post, oldest first
+CREATE INDEX IF NOT EXISTS comments_postid ON comments(postid);
+
+-- Deleting a user cascades to their comments
+CREATE INDEX IF NOT EXISTS comments_owner ON comments(owner);
+
+-- Like count per post and "did logname like this post", without touching
+-- the table
+CREATE INDEX IF NOT EXISTS likes_postid_owner ON likes(postid, owner);
@@ -0,0 +1,10 @@
+-- A user likes a post at most once.  Duplicates left behind by earlier
+-- check-then-insert races are removed first, keeping the oldest like.
+DELETE FROM likes
+WHERE likeid NOT IN (
+  SELECT MIN(likeid) FROM likes GROUP BY owner, postid
+);
+
+-- Also serves like_exists and like_delete, and the cascade when a user is
+-- deleted
+CREATE UNIQUE INDEX IF NOT EXISTS likes_owner_postid ON likes(owner, postid);
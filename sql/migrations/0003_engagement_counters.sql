@@ -0,0 +1,94 @@
+-- Denormalized engagement counters.  The tables in schema.sql keep their
+-- columns, so the counters live in side tables with one row per post and
+-- per user, kept in sync by the triggers below and backfilled here.  Check
+-- them against the base tables with bin/insta4288db verify.
+
+CREATE TABLE post_stats(
+  postid INTEGER PRIMARY KEY,
+  like_count INTEGER NOT NULL DEFAULT 0,
+  comment_count INTEGER NOT NULL DEFAULT 0,
+  FOREIGN KEY (postid) REFERENCES posts(postid) ON DELETE CASCADE
+);
+
+CREATE TABLE user_stats(
+  username VARCHAR(20) PRIMARY KEY,
+  post_count INTEGER NOT NULL DEFAULT 0,
+  follower_count INTEGER NOT NULL DEFAULT 0,
+  following_count INTEGER NOT NULL DEFAULT 0,
+  FOREIGN KEY (username) REFERENCES users(username) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+INSERT INTO post_stats(postid, like_count, comment_count)
+SELECT
+  p.postid,
+  (SELECT COUNT(*) FROM likes WHERE postid = p.postid),
+  (SELECT COUNT(*) FROM comments WHERE postid = p.postid)
+FROM posts AS p;
+
+INSERT INTO user_stats(username, post_count, follower_count, following_count)
+SELECT
+  u.username,
+  (SELECT COUNT(*) FROM posts WHERE owner = u.username),
+  (SELECT COUNT(*) FROM following WHERE username2 = u.username),
+  (SELECT COUNT(*) FROM following WHERE username1 = u.username)
+FROM users AS u;
+
+-- Rows are created with their owner and removed with it by the foreign key
+-- cascade.  Updates that run after a cascade has removed the row are no-ops.
+CREATE TRIGGER users_stats_insert AFTER INSERT ON users
+BEGIN
+  INSERT INTO user_stats(username) VALUES (NEW.username);
+END;
+
+CREATE TRIGGER posts_stats_insert AFTER INSERT ON posts
+BEGIN
+  INSERT INTO post_stats(postid) VALUES (NEW.postid);
+  UPDATE user_stats SET post_count = post_count + 1
+  WHERE username = NEW.owner;
+END;
+
+CREATE TRIGGER posts_stats_delete AFTER DELETE ON posts
+BEGIN
+  UPDATE user_stats SET post_count = post_count - 1
+  WHERE username = OLD.owner;
+END;
+
+CREATE TRIGGER likes_stats_insert AFTER INSERT ON likes
+BEGIN
+  UPDATE post_stats SET like_count = like_count + 1
+  WHERE postid = NEW.postid;
+END;
+
+CREATE TRIGGER likes_stats_delete AFTER DELETE ON likes
+BEGIN
+  UPDATE post_stats SET like_count = like_count - 1
+  WHERE postid = OLD.postid;
+END;
+
+CREATE TRIGGER comments_stats_insert AFTER INSERT ON comments
+BEGIN
+  UPDATE post_stats SET comment_count = comment_count + 1
+  WHERE postid = NEW.postid;
+END;
+
+CREATE TRIGGER comments_stats_delete AFTER DELETE ON comments
+BEGIN
+  UPDATE post_stats SET comment_count = comment_count - 1
+  WHERE postid = OLD.postid;
+END;
+
+CREATE TRIGGER following_stats_insert AFTER INSERT ON following
+BEGIN
+  UPDATE user_stats SET following_count = following_count + 1
+  WHERE username = NEW.username1;
+  UPDATE user_stats SET follower_count = follower_count + 1
+  WHERE username = NEW.username2;
+END;
+
+CREATE TRIGGER following_stats_delete AFTER DELETE ON following
+BEGIN
+  UPDATE user_stats SET following_count = following_count - 1
+  WHERE username = OLD.username1;
+  UPDATE user_stats SET follower_count = follower_count - 1
+  WHERE username = OLD.username2;
+END;
@@ -0,0 +1,26 @@
+-- Precomputed home feed: one row per post in each user's feed, so a feed
+-- page is a range scan on (username, postid).  Rows are written when a post
+-- is created or a user is followed (see insta4288/feed.py) and removed by
+-- the foreign key cascades when the post or the user is deleted.  Posts by
+-- accounts with more than TIMELINE_FANOUT_LIMIT followers are not copied;
+-- they are merged in when the feed is read.
+
+CREATE TABLE timeline(
+  username VARCHAR(20) NOT NULL,
+  postid INTEGER NOT NULL,
+  PRIMARY KEY (username, postid),
+  FOREIGN KEY (username) REFERENCES users(username) ON DELETE CASCADE,
+  FOREIGN KEY (postid) REFERENCES posts(postid) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- Deleting a post cascades to its timeline rows
+CREATE INDEX IF NOT EXISTS timeline_postid ON timeline(postid);
+
+-- Backfill every feed.  Reads merge high-follower accounts with UNION, so
+-- their rows here are harmless until bin/insta4288db timeline prunes them.
+INSERT INTO timeline(username, postid)
+SELECT owner, postid FROM posts
+UNION
+SELECT f.username1, p.postid
+FROM following AS f
+JOIN posts AS p ON p.owner = f.username2;
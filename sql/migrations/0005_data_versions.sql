@@ -0,0 +1,54 @@
+-- Data versions for conditional GETs in the JSON API (insta4288/api/).
+-- Each post_stats and user_stats row carries the value of one database-wide
+-- sequence at its last change: a like or comment on the post, a post or
+-- follow by or of the user, or an edit to the user's profile.  A version is
+-- never reused, even by a username that is deleted and signed up again, so
+-- (row, version) identifies what an API response was built from.
+
+CREATE TABLE data_version(
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  version INTEGER NOT NULL
+);
+
+INSERT INTO data_version(id, version) VALUES (1, 1);
+
+ALTER TABLE post_stats ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE user_stats ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+
+CREATE TRIGGER post_stats_version_insert AFTER INSERT ON post_stats
+BEGIN
+  UPDATE data_version SET version = version + 1;
+  UPDATE post_stats SET version = (SELECT version FROM data_version)
+  WHERE postid = NEW.postid;
+END;
+
+CREATE TRIGGER post_stats_version_update
+AFTER UPDATE OF like_count, comment_count ON post_stats
+BEGIN
+  UPDATE data_version SET version = version + 1;
+  UPDATE post_stats SET version = (SELECT version FROM data_version)
+  WHERE postid = NEW.postid;
+END;
+
+CREATE TRIGGER user_stats_version_insert AFTER INSERT ON user_stats
+BEGIN
+  UPDATE data_version SET version = version + 1;
+  UPDATE user_stats SET version = (SELECT version FROM data_version)
+  WHERE username = NEW.username;
+END;
+
+CREATE TRIGGER user_stats_version_update
+AFTER UPDATE OF post_count, follower_count, following_count ON user_stats
+BEGIN
+  UPDATE data_version SET version = version + 1;
+  UPDATE user_stats SET version = (SELECT version FROM data_version)
+  WHERE username = NEW.username;
+END;
+
+CREATE TRIGGER users_version_update
+AFTER UPDATE OF fullname, email, filename ON users
+BEGIN
+  UPDATE data_version SET version = version + 1;
+  UPDATE user_stats SET version = (SELECT version FROM data_version)
+  WHERE username = NEW.username;
+END;
@@ -0,0 +1,16 @@
+-- Keyset pages of the followers and following lists, ordered by username
+-- without regard to case (see user_followers and user_following in
+-- insta4288/queries.py).  A page reads the next LIMIT entries of one of
+-- these indexes from the cursor on, instead of sorting the whole list.
+-- Usernames that differ only in case are kept apart by the trailing
+-- column.
+
+CREATE INDEX IF NOT EXISTS following_username2_nocase
+  ON following(username2, username1 COLLATE NOCASE, username1);
+
+CREATE INDEX IF NOT EXISTS following_username1_nocase
+  ON following(username1, username2 COLLATE NOCASE, username2);
+
+-- Superseded by following_username2_nocase, which also serves the follower
+-- count and the cascade when a user is deleted
+DROP INDEX IF EXISTS following_username2;
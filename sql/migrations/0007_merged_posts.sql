@@ -0,0 +1,32 @@
+-- Posts that were not copied into their followers' timelines, because their
+-- owner had more than TIMELINE_FANOUT_LIMIT followers when they were made.
+-- Feed reads merge these in for every follower, and only these, so whether
+-- a post is copied or merged is decided once, when it is created.  Follower
+-- counts that later cross the limit change nothing: a new follower's
+-- timeline gets every copied post (see insta4288/feed.py).
+
+CREATE TABLE merged_posts(
+  owner VARCHAR(20) NOT NULL,
+  postid INTEGER NOT NULL,
+  PRIMARY KEY (owner, postid),
+  FOREIGN KEY (owner) REFERENCES users(username) ON DELETE CASCADE,
+  FOREIGN KEY (postid) REFERENCES posts(postid) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- Deleting a post cascades to its row here
+CREATE INDEX IF NOT EXISTS merged_posts_postid ON merged_posts(postid);
+
+-- Until now reads merged the posts of accounts over the limit.  Any post
+-- missing from one of its owner's followers' timelines is merged from now
+-- on, so no feed loses a post whatever the limit was.
+INSERT INTO merged_posts(owner, postid)
+SELECT p.owner, p.postid
+FROM posts AS p
+WHERE EXISTS (
+  SELECT 1 FROM following AS f
+  WHERE f.username2 = p.owner
+    AND NOT EXISTS (
+      SELECT 1 FROM timeline AS t
+      WHERE t.username = f.username1 AND t.postid = p.postid
+    )
+);
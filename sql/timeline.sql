@@ -0,0 +1,29 @@
+-- Rebuild the timeline and merged_posts tables from posts and following.
+-- Run by bin/insta4288db timeline with :fanout_limit bound to the same value
+-- as TIMELINE_FANOUT_LIMIT in insta4288/config.py.  Every user sees their
+-- own posts; followers get a copy of each post by an account with at most
+-- :fanout_limit followers, and the other posts are merged in on read.
+
+BEGIN IMMEDIATE;
+
+DELETE FROM timeline;
+DELETE FROM merged_posts;
+
+INSERT INTO merged_posts(owner, postid)
+SELECT p.owner, p.postid
+FROM posts AS p
+JOIN user_stats AS s ON s.username = p.owner
+WHERE s.follower_count > :fanout_limit;
+
+INSERT INTO timeline(username, postid)
+SELECT owner, postid FROM posts
+UNION
+SELECT f.username1, p.postid
+FROM following AS f
+JOIN posts AS p ON p.owner = f.username2
+WHERE NOT EXISTS (
+  SELECT 1 FROM merged_posts AS m
+  WHERE m.owner = p.owner AND m.postid = p.postid
+);
+
+COMMIT;
@@ -0,0 +1,43 @@
+-- Report every denormalized counter that disagrees with the base tables,
+-- and every post or user missing its counter row.  No output means the
+-- counters are correct.  Run with bin/insta4288db verify.
+
+WITH post_truth AS (
+  SELECT
+    p.postid,
+    (SELECT COUNT(*) FROM likes WHERE postid = p.postid) AS like_count,
+    (SELECT COUNT(*) FROM comments WHERE postid = p.postid) AS comment_count
+  FROM posts AS p
+),
+user_truth AS (
+  SELECT
+    u.username,
+    (SELECT COUNT(*) FROM posts WHERE owner = u.username) AS post_count,
+    (SELECT COUNT(*) FROM following WHERE username2 = u.username)
+      AS follower_count,
+    (SELECT COUNT(*) FROM following WHERE username1 = u.username)
+      AS following_count
+  FROM users AS u
+)
+SELECT 'post' AS kind, t.postid AS id, 'like_count' AS counter,
+       s.like_count AS stored, t.like_count AS actual
+FROM post_truth AS t LEFT JOIN post_stats AS s USING (postid)
+WHERE s.like_count IS NOT t.like_count
+UNION ALL
+SELECT 'post', t.postid, 'comment_count', s.comment_count, t.comment_count
+FROM post_truth AS t LEFT JOIN post_stats AS s USING (postid)
+WHERE s.comment_count IS NOT t.comment_count
+UNION ALL
+SELECT 'user', t.username, 'post_count', s.post_count, t.post_count
+FROM user_truth AS t LEFT JOIN user_stats AS s USING (username)
+WHERE s.post_count IS NOT t.post_count
+UNION ALL
+SELECT 'user', t.username, 'follower_count', s.follower_count,
+       t.follower_count
+FROM user_truth AS t LEFT JOIN user_stats AS s USING (username)
+WHERE s.follower_count IS NOT t.follower_count
+UNION ALL
+SELECT 'user', t.username, 'following_count', s.following_count,
+       t.following_count
+FROM user_truth AS t LEFT JOIN user_stats AS s USING (username)
+WHERE s.following_count IS NOT t.following_count;
@@ -0,0 +1,121 @@
+"""Check the JSON API and its conditional GETs."""
+import sqlite3
+import utils
+
+
+def test_api_feed(client):
+    """The feed pages like the HTML feed, with likes and comments."""
+    utils.login(client)
+    response = client.get("/api/v1/feed/?limit=2")
+    assert response.status_code == 200
+    feed = response.get_json()
+    assert [post["postid"] for post in feed["results"]] == [3, 2]
+    assert feed["next"] == "/api/v1/feed/?before=2&limit=2"
+
+    post = feed["results"][0]
+    assert post["owner"] == "awdeorio"
+    assert post["img_url"].startswith("/uploads/")
+    assert post["likes"] == {"count": 1, "logname_likes_this": True}
+    assert [c["text"] for c in post["comments"]] == [
+        "#chickensofinstagram", "I <3 chickens", "Cute overload!",
+    ]
+
+    feed = client.get(feed["next"]).get_json()
+    assert [post["postid"] for post in feed["results"]] == [1]
+    assert feed["next"] is None
+
+
+def test_api_post_user_and_comments(client):
+    """Posts, comments and profiles come back as JSON."""
+    utils.login(client)
+    post = client.get("/api/v1/posts/3/").get_json()
+    assert post["postid"] == 3
+    assert post["post_show_url"] == "/posts/3/"
+    assert len(post["comments"]) == 3
+
+    comments = client.get("/api/v1/posts/3/comments/").get_json()
+    assert comments["comments"] == post["comments"]
+    assert comments["comments"][0]["logname_owns_this"] is True
+
+    user = client.get("/api/v1/users/jflinn/").get_json()
+    assert user["username"] == "jflinn"
+    assert user["logname_follows_username"] is True
+    assert user["total_posts"] == 1
+    assert [p["postid"] for p in user["posts"]] == [2]
+
+
+def test_api_errors(client):
+    """Errors are JSON, and the API never redirects to the login page."""
+    response = client.get("/api/v1/feed/")
+    assert response.status_code == 403
+    assert response.get_json()["status_code"] == 403
+
+    utils.login(client)
+    assert client.get("/api/v1/posts/999/").status_code == 404
+    assert client.get("/api/v1/users/nobody/").status_code == 404
+    assert client.get("/api/v1/feed/?limit=0").status_code == 400
+
+
+def test_api_not_modified(client):
+    """A matching If-None-Match gets a 304 after reading only versions."""
+    utils.login(client)
+    for url in ("/api/v1/feed/", "/api/v1/posts/3/",
+                "/api/v1/posts/3/comments/", "/api/v1/users/jflinn/"):
+        response = client.get(url)
+        etag = response.headers["ETag"]
+        assert response.headers["Cache-Control"] == "private, no-cache"
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304, url
+        assert response.headers["ETag"] == etag
+        assert utils.query_count(response) == 1
+        assert not response.data
+
+
+def test_api_etag_follows_writes(client):
+    """Writes that change a resource change its ETag."""
+    utils.login(client)
+    tags = {url: client.get(url).headers["ETag"]
+            for url in ("/api/v1/feed/", "/api/v1/posts/2/",
+                        "/api/v1/posts/1/", "/api/v1/users/jflinn/")}
+
+    # Unliking post 2 changes it, the feed showing it and nothing else
+    client.post("/likes/", data={"operation": "unlike", "postid": "2"})
+    for url, changed in (("/api/v1/feed/", True), ("/api/v1/posts/2/", True),
+                         ("/api/v1/posts/1/", False),
+                         ("/api/v1/users/jflinn/", False)):
+        response = client.get(url, headers={"If-None-Match": tags[url]})
+        assert (response.status_code == 200) == changed, url
+        tags[url] = response.headers["ETag"]
+
+    # Unfollowing changes the profile and the feed
+    client.post("/following/", data={
+        "operation": "unfollow", "username": "jflinn",
+    })
+    for url in ("/api/v1/feed/", "/api/v1/users/jflinn/"):
+        response = client.get(url, headers={"If-None-Match": tags[url]})
+        assert response.status_code == 200, url
+
+    # Each viewer gets its own ETag
+    client.post("/accounts/logout/")
+    response = client.post("/accounts/", data={
+        "username": "jflinn", "password": "password", "operation": "login",
+    })
+    assert response.status_code == 302
+    response = client.get("/api/v1/posts/1/",
+                          headers={"If-None-Match": tags["/api/v1/posts/1/"]})
+    assert response.status_code == 200
+
+
+def test_api_feed_cached_post_deleted_elsewhere(client):
+    """A page whose cached posts were deleted by another worker still pages."""
+    utils.login(client)
+    with sqlite3.connect("var/insta4288.sqlite3") as connection:
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.execute("DELETE FROM posts WHERE postid = 3")
+
+    page = client.get("/api/v1/feed/?limit=1")
+    assert page.status_code == 200
+    assert page.get_json()["next"] == "/api/v1/feed/?before=3&limit=1"
+    page = client.get(page.get_json()["next"]).get_json()
+    assert [post["postid"] for post in page["results"]] == [2]
@@ -0,0 +1,60 @@
+"""Check the denormalized like, comment, post and follow counters."""
+import sqlite3
+import subprocess
+import utils
+
+
+def verify():
+    """Run bin/insta4288db verify and return the completed process."""
+    return subprocess.run(
+        ["bin/insta4288db", "verify"],
+        check=False, capture_output=True, text=True,
+    )
+
+
+def test_counters_follow_writes(client):
+    """Counters stay equal to the ground truth through every write path."""
+    utils.login(client)
+    posts = [
+        ("/likes/", {"operation": "like", "postid": "4"}),
+        ("/likes/", {"operation": "unlike", "postid": "1"}),
+        ("/comments/", {"operation": "create", "postid": "4", "text": "hi"}),
+        ("/following/", {"operation": "follow", "username": "jag"}),
+        ("/following/", {"operation": "unfollow", "username": "jflinn"}),
+        ("/posts/", {"operation": "delete", "postid": "3"}),
+    ]
+    for url, data in posts:
+        assert client.post(url, data=data).status_code == 302
+
+    with (utils.TEST_DIR/"testdata/fox.jpg").open("rb") as picture:
+        response = client.post("/posts/", data={
+            "operation": "create", "file": picture,
+        })
+    assert response.status_code == 302
+
+    response = client.get("/users/awdeorio/")
+    assert b"<strong>2</strong> following" in response.data
+
+    result = verify()
+    assert result.returncode == 0, result.stderr
+
+    # Deleting an account cascades through every counter
+    response = client.post("/accounts/", data={"operation": "delete"})
+    assert response.status_code == 302
+    result = verify()
+    assert result.returncode == 0, result.stderr
+
+
+def test_verify_reports_drift():
+    """bin/insta4288db verify fails and names counters that drifted."""
+    subprocess.run(["bin/insta4288db", "reset"], check=True)
+    with sqlite3.connect("var/insta4288.sqlite3") as connection:
+        connection.execute(
+            "UPDATE user_stats SET follower_count = 99 "
+            "WHERE username = 'michjc'"
+        )
+    result = verify()
+    assert result.returncode == 1
+    assert "follower_count" in result.stderr
+    assert "michjc" in result.stderr
+    subprocess.run(["bin/insta4288db", "reset"], check=True)
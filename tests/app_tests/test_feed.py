@@ -0,0 +1,208 @@
+"""Check how the home feed is assembled."""
+import sqlite3
+import subprocess
+import bs4
+import pytest
+import insta4288
+import utils
+
+
+def feed_query_count(client):
+    """Load the feed and return the number of queries it ran."""
+    response = client.get("/")
+    assert response.status_code == 200
+    return utils.query_count(response)
+
+
+def test_feed_query_count_is_constant(client, monkeypatch):
+    """The feed runs the same number of queries for 3 posts as for 53."""
+    monkeypatch.setitem(insta4288.app.config, "FEED_CACHE", False)
+    utils.login(client)
+    before = feed_query_count(client)
+
+    with sqlite3.connect("var/insta4288.sqlite3") as connection:
+        for i in range(50):
+            postid = connection.execute(
+                "INSERT INTO posts(owner, filename) VALUES (?, ?)",
+                ("jflinn", "122a7d27ca1d7420a1072f695d9290fad4501a41.jpg"),
+            ).lastrowid
+            connection.execute(
+                "INSERT INTO comments(owner, postid, text) VALUES (?, ?, ?)",
+                ("michjc", postid, f"comment {i}"),
+            )
+            if i % 2:
+                connection.execute(
+                    "INSERT INTO likes(owner, postid) VALUES (?, ?)",
+                    ("awdeorio", postid),
+                )
+
+    assert feed_query_count(client) == before == 3
+
+
+def test_feed_stitches_likes_and_comments(client):
+    """Each post shows its own like state and comments in order."""
+    utils.login(client)
+    response = client.get("/")
+    text = response.get_data(as_text=True)
+    posts = text.split('<article class="post">')[1:]
+    assert len(posts) == 3
+
+    # Posts are newest first: 3 (awdeorio), 2 (jflinn), 1 (awdeorio), and
+    # awdeorio has liked all three
+    assert 'href="/posts/3/"' in posts[0]
+    assert 'value="unlike"' in posts[0]
+    assert posts[0].index("#chickensofinstagram") < \
+        posts[0].index("Cute overload!")
+    assert "Sick #crossword" in posts[1]
+    assert "2 likes" in posts[1]
+    assert 'href="/posts/1/"' in posts[2]
+    assert "3 likes" in posts[2]
+    assert posts[2].index("Walking the plank") < \
+        posts[2].index("This was after")
+    assert "Cute overload!" not in posts[2]
+
+
+def test_feed_pages(client, monkeypatch):
+    """The feed is paged by postid, with a link to the next page."""
+    monkeypatch.setitem(insta4288.app.config, "FEED_PAGE_SIZE", 2)
+    utils.login(client)
+
+    response = client.get("/")
+    soup = bs4.BeautifulSoup(response.data, "html.parser")
+    links = [a["href"] for a in soup.select("a.timestamp")]
+    assert links == ["/posts/3/", "/posts/2/"]
+    next_url = soup.select_one("a.load-more")["href"]
+    assert next_url == "/?before=2"
+
+    response = client.get(next_url)
+    soup = bs4.BeautifulSoup(response.data, "html.parser")
+    assert [a["href"] for a in soup.select("a.timestamp")] == ["/posts/1/"]
+    assert soup.select_one("a.load-more") is None
+
+    # An explicit limit is kept in the link and capped at the maximum
+    response = client.get("/?limit=1")
+    soup = bs4.BeautifulSoup(response.data, "html.parser")
+    assert soup.select_one("a.load-more")["href"] == "/?before=3&limit=1"
+    response = client.get("/?limit=1000")
+    assert response.status_code == 200
+
+    assert client.get("/?before=abc").status_code == 400
+    assert client.get("/?limit=0").status_code == 400
+
+
+def feed_postids(client):
+    """Return the postids on the first page of the feed."""
+    response = client.get("/?limit=50")
+    assert response.status_code == 200
+    soup = bs4.BeautifulSoup(response.data, "html.parser")
+    return [int(a["href"].split("/")[2]) for a in soup.select("a.timestamp")]
+
+
+def timeline_rows(username):
+    """Return the postids stored in a user's timeline."""
+    with sqlite3.connect("var/insta4288.sqlite3") as connection:
+        return [postid for postid, in connection.execute(
+            "SELECT postid FROM timeline WHERE username = ? "
+            "ORDER BY postid DESC", (username,)
+        )]
+
+
+@pytest.mark.parametrize("engine", ["timeline", "sql", "merge"])
+def test_feed_engines_follow_writes(client, monkeypatch, engine):
+    """Both feed engines reflect follows, unfollows and new posts."""
+    monkeypatch.setitem(insta4288.app.config, "FEED_ENGINE", engine)
+    monkeypatch.setitem(insta4288.app.config, "FEED_CACHE", False)
+    utils.login(client)
+    assert feed_postids(client) == [3, 2, 1]
+
+    client.post("/following/", data={
+        "operation": "follow", "username": "jag",
+    })
+    client.post("/following/", data={
+        "operation": "unfollow", "username": "jflinn",
+    })
+    with (utils.TEST_DIR/"testdata/fox.jpg").open("rb") as picture:
+        client.post("/posts/", data={"operation": "create", "file": picture})
+    client.post("/posts/", data={"operation": "delete", "postid": "1"})
+
+    assert feed_postids(client) == [5, 4, 3]
+    assert timeline_rows("awdeorio") == [5, 4, 3]
+
+    # Rebuilding gives the same timeline
+    subprocess.run(["bin/insta4288db", "timeline"], check=True,
+                   capture_output=True)
+    assert timeline_rows("awdeorio") == [5, 4, 3]
+
+
+def merged_posts():
+    """Return the postids that reads merge in instead of timeline copies."""
+    with sqlite3.connect("var/insta4288.sqlite3") as connection:
+        return [postid for postid, in connection.execute(
+            "SELECT postid FROM merged_posts ORDER BY postid"
+        )]
+
+
+def test_high_follower_accounts_merged_on_read(client, monkeypatch):
+    """Posts by accounts above the fan-out limit are not copied."""
+    monkeypatch.setitem(insta4288.app.config, "TIMELINE_FANOUT_LIMIT", 1)
+    utils.login(client)
+
+    # jag's post was copied when it was made, so a new follower gets it
+    # too, though jag now has two followers
+    client.post("/following/", data={
+        "operation": "follow", "username": "jag",
+    })
+    assert 4 in timeline_rows("awdeorio")
+    assert feed_postids(client) == [4, 3, 2, 1]
+
+    # awdeorio has two followers, so a new post is not fanned out
+    with (utils.TEST_DIR/"testdata/fox.jpg").open("rb") as picture:
+        client.post("/posts/", data={"operation": "create", "file": picture})
+    assert timeline_rows("awdeorio")[0] == 5
+    assert 5 not in timeline_rows("jflinn")
+    assert merged_posts() == [5]
+
+
+@pytest.mark.parametrize("engine", ["timeline", "sql", "merge"])
+def test_fan_out_decided_per_post(client, monkeypatch, engine):
+    """Follower counts crossing the limit never hide a post."""
+    monkeypatch.setitem(insta4288.app.config, "TIMELINE_FANOUT_LIMIT", 2)
+    monkeypatch.setitem(insta4288.app.config, "FEED_ENGINE", engine)
+    monkeypatch.setitem(insta4288.app.config, "FEED_CACHE", False)
+
+    # michjc has three followers, so this post is merged on read
+    utils.login(client, "michjc", "password")
+    with (utils.TEST_DIR/"testdata/fox.jpg").open("rb") as picture:
+        client.post("/posts/", data={"operation": "create", "file": picture})
+
+    # jflinn unfollows, leaving michjc at the limit
+    utils.login(client, "jflinn", "password")
+    client.post("/following/", data={
+        "operation": "unfollow", "username": "michjc",
+    })
+    utils.login(client, "jag", "password")
+    assert feed_postids(client) == [5, 4]
+
+    # A follower who arrives now sees both kinds of post
+    utils.login(client, "jflinn", "password")
+    client.post("/following/", data={
+        "operation": "follow", "username": "michjc",
+    })
+    assert feed_postids(client) == [5, 3, 2, 1]
+
+
+def test_feed_comment_previews(client, monkeypatch):
+    """The feed shows the newest comments and links to the rest."""
+    monkeypatch.setitem(insta4288.app.config, "FEED_COMMENT_PREVIEW", 2)
+    utils.login(client)
+    soup = bs4.BeautifulSoup(client.get("/").data, "html.parser")
+    post = soup.select("article.post")[0]
+    texts = [p.get_text(" ", strip=True)
+             for p in post.select("p.caption, p.comment")]
+    assert texts == ["jflinn I <3 chickens", "michjc Cute overload!"]
+    link = post.select_one("a.view-comments")
+    assert link["href"] == "/posts/3/"
+    assert link.get_text() == "view all 3 comments"
+
+    # Posts with no more comments than the preview have no link
+    assert len(soup.select("a.view-comments")) == 1
@@ -0,0 +1,124 @@
+"""Check the in-memory feed cache."""
+import sqlite3
+import bs4
+import pytest
+import insta4288
+from insta4288.feed_cache import FeedCache
+import utils
+
+
+def feed_postids(client, url="/?limit=50"):
+    """Return the postids on a page of the feed."""
+    response = client.get(url)
+    assert response.status_code == 200
+    soup = bs4.BeautifulSoup(response.data, "html.parser")
+    return [int(a["href"].split("/")[2]) for a in soup.select("a.timestamp")]
+
+
+def cache_stats(client):
+    """Return the feed cache counters from /debug/stats/."""
+    insta4288.app.config["STATS_ENDPOINT"] = True
+    response = client.get("/debug/stats/")
+    insta4288.app.config["STATS_ENDPOINT"] = False
+    assert response.status_code == 200
+    return response.get_json()["feed_cache"]
+
+
+def test_login_warms_cache(client):
+    """Logging in fills the cache, so the first feed page is a hit."""
+    utils.login(client)
+    assert feed_postids(client) == [3, 2, 1]
+    assert feed_postids(client, "/?limit=1&before=3") == [2]
+
+    stats = cache_stats(client)
+    assert stats["fills"] == 1
+    assert stats["hits"] == 2
+    assert stats.get("misses", 0) == 0
+    assert stats["entries"] == 1
+    assert stats["bytes"] == 3 * 8
+
+
+def test_cache_follows_writes(client):
+    """Writes update cached feeds in place instead of refilling them."""
+    utils.login(client)
+    assert feed_postids(client) == [3, 2, 1]
+
+    client.post("/following/", data={
+        "operation": "follow", "username": "jag",
+    })
+    client.post("/following/", data={
+        "operation": "unfollow", "username": "jflinn",
+    })
+    with (utils.TEST_DIR/"testdata/fox.jpg").open("rb") as picture:
+        client.post("/posts/", data={"operation": "create", "file": picture})
+    client.post("/posts/", data={"operation": "delete", "postid": "1"})
+
+    assert feed_postids(client) == [5, 4, 3]
+    stats = cache_stats(client)
+    assert stats["fills"] == 1
+    assert stats["updates"] == 4
+
+
+@pytest.mark.parametrize("engine", ["sql", "merge"])
+def test_cache_filled_with_engine(client, monkeypatch, engine):
+    """The cache is filled with FEED_ENGINE, not always from the timeline."""
+    monkeypatch.setitem(insta4288.app.config, "FEED_ENGINE", engine)
+    with sqlite3.connect("var/insta4288.sqlite3") as connection:
+        connection.execute("DELETE FROM timeline")
+    utils.login(client)
+    assert feed_postids(client) == [3, 2, 1]
+    assert cache_stats(client)["fills"] == 1
+
+
+def test_cache_disabled(client, monkeypatch):
+    """With FEED_CACHE off the feed is read from the database every time."""
+    monkeypatch.setitem(insta4288.app.config, "FEED_CACHE", False)
+    utils.login(client)
+    assert feed_postids(client) == [3, 2, 1]
+    assert insta4288.feed_cache.get_cache() is None
+
+
+def test_cache_evicts_least_recently_used():
+    """Entries beyond the byte budget are evicted oldest first."""
+    cache = FeedCache(budget=3 * 8, depth=2, ttl=60)
+    cache.put("a", [9, 8, 7], False, cache.version("a"))
+    cache.put("b", [6], True, cache.version("b"))
+    assert cache.page("a", 2 ** 63 - 1, 2) == [9, 8]
+    assert cache.page("a", 8, 2) is None
+
+    # Touching "a" makes "b" the least recently used
+    cache.put("c", [5], True, cache.version("c"))
+    assert cache.page("b", 2 ** 63 - 1, 2) is None
+    assert cache.page("c", 2 ** 63 - 1, 2) == [5]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_skips_stale_fill():
+    """A fill read before a concurrent update is not cached."""
+    cache = FeedCache(budget=1024, depth=10, ttl=60)
+    version = cache.version("a")
+    other = cache.version("b")
+    cache.insert(["a"], 4)
+    cache.put("a", [3, 2, 1], True, version)
+    assert cache.page("a", 2 ** 63 - 1, 10) is None
+    assert cache.stats()["stale_fills"] == 1
+
+    # Writes to other feeds do not spoil a fill
+    cache.put("b", [5], True, other)
+    assert cache.page("b", 2 ** 63 - 1, 10) == [5]
+
+
+def test_cache_drops_posts_deleted_elsewhere(client):
+    """Posts deleted by another worker leave no gap in a cached page."""
+    utils.login(client)
+    assert feed_postids(client) == [3, 2, 1]
+    with sqlite3.connect("var/insta4288.sqlite3") as connection:
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.execute("DELETE FROM posts WHERE postid = 3")
+
+    response = client.get("/?limit=1")
+    soup = bs4.BeautifulSoup(response.data, "html.parser")
+    assert [a["href"] for a in soup.select("a.timestamp")] == ["/posts/2/"]
+    assert soup.select_one("a.load-more")["href"] == "/?before=2&limit=1"
+    assert feed_postids(client) == [2, 1]
+    assert cache_stats(client)["fills"] == 1
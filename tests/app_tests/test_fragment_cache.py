@@ -0,0 +1,92 @@
+"""Check the cache of rendered post page fragments."""
+import bs4
+import utils
+import insta4288
+from insta4288.fragment_cache import FragmentCache
+
+
+def stats(client):
+    """Return the fragment cache and query counters from /debug/stats/."""
+    insta4288.app.config["STATS_ENDPOINT"] = True
+    response = client.get("/debug/stats/")
+    insta4288.app.config["STATS_ENDPOINT"] = False
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def post_page(client, url="/posts/3/"):
+    """Return the parsed post page."""
+    response = client.get(url)
+    assert response.status_code == 200
+    return bs4.BeautifulSoup(response.data, "html.parser")
+
+
+def test_fragment_cache_lru():
+    """Entries are replaced when their versions change and evicted LRU."""
+    cache = FragmentCache(2)
+    assert cache.get("a", (1, 1)) is None
+    cache.put("a", (1, 1), "A")
+    assert cache.get("a", (1, 1)) == "A"
+    assert cache.get("a", (2, 1)) is None
+    cache.put("b", (1, 1), "B")
+    cache.put("c", (1, 1), "C")
+    assert cache.get("a", (1, 1)) is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["hit_rate"] == 0.25
+
+
+def test_hit_needs_two_queries(client):
+    """A repeat view reads the versions and the viewer's like only."""
+    utils.login(client)
+    first = post_page(client)
+    insta4288.queries.reset_stats()
+    second = post_page(client)
+    assert second.select_one("p.likes").text == first.select_one(
+        "p.likes").text
+
+    counters = stats(client)
+    assert counters["fragment_cache"]["hits"] == 1
+    assert counters["fragment_cache"]["fills"] == 1
+    assert set(counters["queries"]) == {"post_version", "like_exists"}
+
+
+def test_writes_invalidate(client):
+    """Likes and comments stamp new versions, so the page is re-rendered."""
+    utils.login(client)
+    assert post_page(client).select_one("p.likes").text == "1 like"
+
+    utils.login(client, "jflinn", "password")
+    client.post("/likes/", data={"operation": "like", "postid": "3"})
+    assert post_page(client).select_one("p.likes").text == "2 likes"
+
+    client.post("/comments/", data={
+        "operation": "create", "postid": "3", "text": "fresh",
+    })
+    soup = post_page(client)
+    assert "fresh" in soup.select("p.comment")[-1].text
+    assert stats(client)["fragment_cache"]["stale"] == 2
+
+
+def test_viewer_overlay(client):
+    """Like buttons and delete buttons differ per viewer on a cache hit."""
+    utils.login(client)
+    soup = post_page(client)
+    assert soup.select_one("input[name=unlike]") is not None
+    assert len(soup.select("input[name=uncomment]")) == 1
+
+    utils.login(client, "jflinn", "password")
+    soup = post_page(client)
+    assert soup.select_one("input[name=like]") is not None
+    assert len(soup.select("input[name=uncomment]")) == 1
+    assert stats(client)["fragment_cache"]["hits"] == 1
+
+
+def test_cache_off(client, monkeypatch):
+    """With POST_FRAGMENT_CACHE off every view renders from the database."""
+    monkeypatch.setitem(insta4288.app.config, "POST_FRAGMENT_CACHE", False)
+    utils.login(client)
+    insta4288.queries.reset_stats()
+    assert post_page(client).select_one("p.likes").text == "1 like"
+    assert post_page(client).select_one("p.likes").text == "1 like"
+    assert stats(client)["queries"]["post_detail"]["calls"] == 2
+    assert client.get("/posts/99/").status_code == 404
@@ -0,0 +1,96 @@
+"""Check group commit for likes, comments and follows."""
+import sqlite3
+import threading
+import flask
+import pytest
+from werkzeug.exceptions import Conflict
+import insta4288
+from insta4288.group_commit import GroupCommitWriter
+from insta4288.pool import ConnectionPool
+
+
+@pytest.fixture(name="group_commit")
+def group_commit_setup():
+    """Enable group commit for one test."""
+    insta4288.app.config["GROUP_COMMIT"] = True
+    yield
+    insta4288.app.config["GROUP_COMMIT"] = False
+
+
+def test_batches_share_one_commit(tmp_path):
+    """Concurrent mutations are applied in fewer transactions than calls."""
+    db_path = tmp_path / "batch.sqlite3"
+    with sqlite3.connect(db_path) as connection:
+        connection.execute("CREATE TABLE t(x INTEGER UNIQUE)")
+    pool = ConnectionPool(
+        lambda: sqlite3.connect(db_path, check_same_thread=False), 1, 1.0
+    )
+    writer = GroupCommitWriter(
+        lambda: pool,
+        lambda connection: connection.execute("BEGIN IMMEDIATE"),
+        max_batch=8, max_delay=0.05,
+    )
+
+    def insert(value):
+        def mutation(connection):
+            if value == 3:
+                flask.abort(409)
+            connection.execute("INSERT INTO t VALUES (?)", (value,))
+            return value
+        return mutation
+
+    futures = []
+    threads = [
+        threading.Thread(target=lambda v=v: futures.append(
+            writer.submit(insert(v))
+        ))
+        for v in range(16)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result(timeout=5))
+        except Conflict:
+            results.append(None)
+    assert sorted(r for r in results if r is not None) == \
+        [v for v in range(16) if v != 3]
+
+    with sqlite3.connect(db_path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM t").fetchone() == (15,)
+    stats = writer.stats()
+    assert stats["mutations"] == 16
+    assert stats["batches"] < 16
+    assert stats["max_batch"] <= 8
+    assert sum(stats["batch_sizes"].values()) == stats["batches"]
+
+
+@pytest.mark.usefixtures("group_commit")
+def test_like_through_group_commit(client):
+    """Handlers see their mutation's result and errors as if run inline."""
+    response = client.post(
+        "/accounts/",
+        data={
+            "username": "awdeorio",
+            "password": "chickens",
+            "operation": "login"
+        },
+    )
+    assert response.status_code == 302
+
+    response = client.post("/likes/", data={
+        "operation": "like", "postid": "4",
+    })
+    assert response.status_code == 302
+    response = client.post("/likes/", data={
+        "operation": "like", "postid": "4",
+    })
+    assert response.status_code == 409
+
+    response = client.get("/posts/4/")
+    assert b"1 like" in response.data
+    assert insta4288.model.group_commit_stats()["mutations"] >= 2
@@ -0,0 +1,32 @@
+"""Check per-request SQL instrumentation."""
+import logging
+import utils
+import insta4288
+
+
+def test_server_timing_header(client):
+    """Responses report the request's query count in Server-Timing."""
+    utils.login(client)
+    response = client.get("/users/awdeorio/")
+    assert response.status_code == 200
+    timings = response.headers.getlist("Server-Timing")
+    assert timings[0].startswith("db;dur=")
+    assert 'desc="1 queries, 2 rows"' in timings[0]
+    assert timings[1].startswith("app;dur=")
+
+
+def test_query_threshold_warning(client, monkeypatch, caplog):
+    """A request over the query threshold is logged with its top query."""
+    utils.login(client)
+    monkeypatch.setitem(insta4288.app.config, "SQL_QUERY_WARN_THRESHOLD", 1)
+    with caplog.at_level(logging.INFO, logger=insta4288.app.logger.name):
+        response = client.get("/users/michjc/followers/")
+    assert response.status_code == 200
+
+    warnings = [record.getMessage() for record in caplog.records
+                if record.levelno == logging.WARNING
+                and "path=/users/" in record.getMessage()]
+    assert len(warnings) == 1
+    assert "path=/users/michjc/followers/ status=200 queries=2" in \
+        warnings[0]
+    assert "top_calls=1" in warnings[0]
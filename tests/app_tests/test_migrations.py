@@ -0,0 +1,79 @@
+"""Check versioned schema migrations run by bin/insta4288db."""
+import pathlib
+import sqlite3
+import subprocess
+from insta4288.queries import SQL
+
+MIGRATIONS = sorted(pathlib.Path("sql/migrations").glob("*.sql"))
+
+
+def test_reset_applies_all_migrations():
+    """A freshly reset database is at the latest schema version."""
+    subprocess.run(["bin/insta4288db", "reset"], check=True)
+    with sqlite3.connect("var/insta4288.sqlite3") as connection:
+        version, = connection.execute("PRAGMA user_version").fetchone()
+    assert version == len(MIGRATIONS) == int(MIGRATIONS[-1].name[:4])
+
+
+def test_migrate_upgrades_in_place():
+    """Migrating an old database adds indexes and removes duplicate likes."""
+    # Build the database the way it was before migrations existed
+    subprocess.run(["bin/insta4288db", "destroy"], check=True)
+    connection = sqlite3.connect("var/insta4288.sqlite3")
+    for script in ("sql/schema.sql", "sql/data.sql"):
+        connection.executescript(
+            pathlib.Path(script).read_text(encoding="utf-8")
+        )
+    connection.execute("INSERT INTO likes(owner, postid) VALUES "
+                       "('awdeorio', 1)")
+    connection.commit()
+    assert connection.execute("PRAGMA user_version").fetchone()[0] == 0
+
+    output = subprocess.run(
+        ["bin/insta4288db", "migrate"],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    assert f"Schema version {len(MIGRATIONS)}" in output
+    assert connection.execute("PRAGMA user_version").fetchone()[0] == \
+        len(MIGRATIONS)
+    assert connection.execute(
+        "SELECT COUNT(*) FROM likes WHERE owner = 'awdeorio' AND postid = 1"
+    ).fetchone()[0] == 1
+    assert connection.execute(
+        "SELECT like_count FROM post_stats WHERE postid = 1"
+    ).fetchone()[0] == 3
+
+    # Running it again is a no-op
+    output = subprocess.run(
+        ["bin/insta4288db", "migrate"],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    assert "Applying" not in output
+    connection.close()
+    subprocess.run(["bin/insta4288db", "reset"], check=True)
+
+
+def test_queries_use_indexes():
+    """Every keyed query searches an index instead of scanning a table."""
+    connection = sqlite3.connect(":memory:")
+    connection.executescript(
+        pathlib.Path("sql/schema.sql").read_text(encoding="utf-8")
+    )
+    for migration in MIGRATIONS:
+        connection.executescript(migration.read_text(encoding="utf-8"))
+
+    for name, sql in SQL.items():
+        if name == "explore_users" or sql.lstrip().startswith("INSERT"):
+            continue
+        plan = connection.execute(
+            f"EXPLAIN QUERY PLAN {sql}", ("x",) * sql.count("?")
+        ).fetchall()
+        # Scanning json_each() walks the parameter list, and scanning a
+        # materialized subquery or a constant row walks no table
+        subqueries = {row[3].split()[-1] for row in plan
+                      if row[3].startswith(("MATERIALIZE", "CO-ROUTINE"))}
+        scans = [row[3] for row in plan if row[3].startswith("SCAN")
+                 and "VIRTUAL TABLE" not in row[3]
+                 and row[3] != "SCAN CONSTANT ROW"
+                 and row[3].split()[1] not in subqueries]
+        assert not scans, f"{name}: {scans}"
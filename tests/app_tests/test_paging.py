@@ -0,0 +1,29 @@
+"""Check the cursor and page size arguments shared by paged lists."""
+import pytest
+import utils
+
+HUGE = str(2 ** 64)
+
+
+@pytest.mark.parametrize("url", [
+    f"/?before={HUGE}",
+    f"/?before=-{HUGE}",
+    f"/api/v1/feed/?before={HUGE}",
+    f"/posts/1/?after={HUGE}",
+    f"/api/v1/posts/1/comments/?after=-{HUGE}",
+    f"/users/awdeorio/?before={HUGE}",
+    f"/api/v1/users/awdeorio/posts/?before={HUGE}",
+    "/users/awdeorio/followers/?limit=0",
+    "/?limit=x",
+])
+def test_bad_page_args(client, url):
+    """Cursors outside SQLite's INTEGER range are a 400, not a 500."""
+    utils.login(client)
+    assert client.get(url).status_code == 400
+
+
+def test_extreme_cursors(client):
+    """The largest and smallest cursors still page normally."""
+    utils.login(client)
+    assert client.get(f"/?before={2 ** 63 - 1}").status_code == 200
+    assert client.get(f"/posts/1/?after={-2 ** 63}").status_code == 200
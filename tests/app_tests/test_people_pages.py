@@ -0,0 +1,76 @@
+"""Check paging of the followers and following lists."""
+import sqlite3
+import bs4
+import utils
+import insta4288
+
+NAMES = ["alice", "Bob", "bob", "carol", "Dave", "erin"]
+
+
+def add_followers():
+    """Make each of NAMES follow jag, and awdeorio follow some of them."""
+    with sqlite3.connect("var/insta4288.sqlite3") as connection:
+        connection.executemany(
+            "INSERT INTO users(username, fullname, email, filename, "
+            "password) VALUES (?, ?, '', 'x.jpg', 'x')",
+            [(name, name) for name in NAMES],
+        )
+        connection.executemany(
+            "INSERT INTO following(username1, username2) VALUES (?, ?)",
+            [(name, "jag") for name in NAMES]
+            + [("awdeorio", "bob"), ("awdeorio", "erin")],
+        )
+
+
+def people(client, url):
+    """Return (username, relationship) pairs and the next page's URL."""
+    response = client.get(url)
+    assert response.status_code == 200
+    soup = bs4.BeautifulSoup(response.data, "html.parser")
+    rows = [
+        (li.select_one("a.username").text,
+         li.select_one(".relationship").get_text(" ", strip=True).split()[0])
+        for li in soup.select("li.person")
+    ]
+    more = soup.select_one("a.load-more")
+    return rows, more["href"] if more else None
+
+
+def test_followers_pages(client):
+    """Pages follow username order without case, with no gaps or repeats."""
+    add_followers()
+    utils.login(client)
+    insta4288.queries.reset_stats()
+
+    seen = []
+    url = "/users/jag/followers/?limit=3"
+    while url:
+        rows, url = people(client, url)
+        assert len(rows) <= 3
+        seen.extend(rows)
+    assert [name for name, _ in seen] == \
+        ["alice", "Bob", "bob", "carol", "Dave", "erin", "michjc"]
+    assert dict(seen)["bob"] == "following"
+    assert dict(seen)["Bob"] == "not"
+    assert dict(seen)["erin"] == "following"
+
+    stats = insta4288.queries.stats()
+    assert stats["user_followers"]["calls"] == 3
+    assert "follow_exists" not in stats
+
+
+def test_following_pages(client):
+    """The following list pages the same way."""
+    utils.login(client)
+    rows, url = people(client, "/users/awdeorio/following/?limit=1")
+    assert [name for name, _ in rows] == ["jflinn"]
+    rows, url = people(client, url)
+    assert [name for name, _ in rows] == ["michjc"]
+    assert url is None
+
+
+def test_people_page_args(client):
+    """Bad page sizes are rejected."""
+    utils.login(client)
+    assert client.get("/users/jag/followers/?limit=0").status_code == 400
+    assert client.get("/users/jag/following/?limit=x").status_code == 400
@@ -0,0 +1,114 @@
+"""Check the per-worker sqlite3 connection pool."""
+import sqlite3
+import subprocess
+import pytest
+import utils
+import insta4288
+from insta4288.pool import ConnectionPool, PoolTimeout
+
+
+def test_connection_reused_between_requests(client):
+    """Consecutive requests reuse one pooled connection."""
+    utils.login(client)
+    assert client.get("/").status_code == 200
+    before = insta4288.model.pool_stats()["read"]
+    assert client.get("/explore/").status_code == 200
+    assert client.get("/users/awdeorio/").status_code == 200
+    after = insta4288.model.pool_stats()["read"]
+
+    assert after["checkouts"] == before["checkouts"] + 2
+    assert after["open"] == before["open"] == 1
+    assert after["in_use"] == 0
+    assert after["idle"] == 1
+
+
+def test_read_and_write_connections(client):
+    """GET views read through mode=ro connections; POSTs use the writer."""
+    utils.login(client)
+    with insta4288.app.test_request_context("/"):
+        reader = insta4288.model.get_db()
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            reader.execute("DELETE FROM likes")
+        with insta4288.model.write_scope() as writer:
+            assert writer.in_transaction
+        assert not writer.in_transaction
+        assert insta4288.model.pool_stats()["write"]["size"] == 1
+
+    response = client.post("/likes/", data={
+        "operation": "like", "postid": "4",
+    })
+    assert response.status_code == 302
+    stats = insta4288.model.pool_stats()
+    assert stats["write"]["in_use"] == stats["read"]["in_use"] == 0
+
+
+def test_pool_replaced_after_reset(client):
+    """A reset database is never read through a stale pooled connection."""
+    utils.login(client)
+    response = client.post("/following/", data={
+        "operation": "unfollow", "username": "jflinn",
+    })
+    assert response.status_code == 302
+    response = client.get("/users/awdeorio/")
+    assert b"<strong>1</strong> following" in response.data
+
+    # Replace the database file underneath the running app
+    subprocess.run(["bin/insta4288db", "reset"], check=True)
+    utils.login(client)
+    response = client.get("/users/awdeorio/")
+    assert b"<strong>2</strong> following" in response.data
+
+
+def test_pool_kept_across_writes(client):
+    """Writes and checkpoints do not retire the pools or the caches."""
+    utils.login(client)
+    assert client.get("/").status_code == 200
+    pools = insta4288.model.get_pools()
+    read_pool = pools["read"]
+
+    client.post("/likes/", data={"operation": "unlike", "postid": "3"})
+    with sqlite3.connect("var/insta4288.sqlite3") as connection:
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    assert client.get("/").status_code == 200
+    assert insta4288.model.get_pools()["read"] is read_pool
+    assert insta4288.feed_cache.cache_stats()["fills"] == 1
+
+
+def test_checkin_rolls_back():
+    """Open transactions are rolled back when a connection is checked in."""
+    pool = ConnectionPool(lambda: sqlite3.connect(":memory:"), 1, 0.1)
+    connection = pool.checkout()
+    connection.execute("CREATE TABLE t(x)")
+    connection.commit()
+    connection.execute("INSERT INTO t VALUES (1)")
+    pool.checkin(connection)
+
+    connection = pool.checkout()
+    assert connection.execute("SELECT COUNT(*) FROM t").fetchone() == (0,)
+    pool.checkin(connection)
+
+
+def test_checkout_timeout():
+    """Checkout waits for a free slot, then gives up."""
+    pool = ConnectionPool(lambda: sqlite3.connect(":memory:"), 1, 0.05)
+    connection = pool.checkout()
+    with pytest.raises(PoolTimeout):
+        pool.checkout()
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["in_use"] == 1
+
+    pool.checkin(connection)
+    pool.close()
+    assert pool.stats()["open"] == 0
+
+
+def test_profile_applied(client):
+    """Pooled connections use the SQLITE_PROFILE settings from config.py."""
+    utils.login(client)
+    with insta4288.app.app_context():
+        profile = insta4288.model.effective_profile(insta4288.model.get_db())
+    assert profile["journal_mode"] == "wal"
+    assert profile["busy_timeout"] == 5000
+    assert profile["synchronous"] == 1  # NORMAL
+    assert profile["temp_store"] == 2  # MEMORY
@@ -0,0 +1,73 @@
+"""Check comment pages on the single post page and in the API."""
+import bs4
+import utils
+import insta4288
+
+
+def comment_texts(response):
+    """Return the comment texts on a post page."""
+    assert response.status_code == 200
+    soup = bs4.BeautifulSoup(response.data, "html.parser")
+    return [p.get_text(" ", strip=True).split(" ", 1)[1]
+            for p in soup.select("p.comment")], soup
+
+
+def test_post_comment_pages(client, monkeypatch):
+    """Post page comments are paged oldest first by commentid."""
+    monkeypatch.setitem(insta4288.app.config, "COMMENT_PAGE_SIZE", 2)
+    utils.login(client)
+    for i in range(3):
+        client.post("/comments/", data={
+            "operation": "create", "postid": "4", "text": f"extra {i}",
+        })
+
+    texts, soup = comment_texts(client.get("/posts/4/"))
+    assert texts == ["Saw this on the diag yesterday!", "extra 0"]
+    next_url = soup.select_one("a.more-comments")["href"]
+    assert next_url.startswith("/posts/4/?after=")
+
+    texts, soup = comment_texts(client.get(next_url))
+    assert texts == ["extra 1", "extra 2"]
+    assert soup.select_one("a.more-comments") is None
+
+    texts, _ = comment_texts(client.get("/posts/4/?limit=10"))
+    assert len(texts) == 4
+    assert client.get("/posts/4/?after=x").status_code == 400
+    assert client.get("/posts/4/?limit=0").status_code == 400
+
+
+def test_api_comment_pages(client):
+    """The API pages a post's comments the same way."""
+    utils.login(client)
+    post = client.get("/api/v1/posts/3/?limit=2").get_json()
+    assert len(post["comments"]) == 2
+    assert post["next_comments"].startswith("/api/v1/posts/3/comments/")
+
+    page = client.get(post["next_comments"]).get_json()
+    assert [c["text"] for c in page["comments"]] == ["Cute overload!"]
+    assert page["next"] is None
+
+
+def test_post_page_noncanonical_postid(client):
+    """A postid the database matches but int() rejects still shows."""
+    utils.login(client)
+    canonical = client.get("/posts/1/")
+    assert comment_texts(client.get("/posts/1.0/"))[0] == \
+        comment_texts(canonical)[0]
+    assert client.get("/posts/1.5/").status_code == 404
+
+
+def test_delete_post_noncanonical_postid(client):
+    """Deleting by a postid int() rejects removes the post everywhere."""
+    utils.login(client)
+    assert client.get("/").status_code == 200
+    response = client.post(
+        "/posts/?target=/",
+        data={"operation": "delete", "postid": "1.0"},
+    )
+    assert response.status_code == 302
+    assert client.get("/posts/1/").status_code == 404
+    soup = bs4.BeautifulSoup(client.get("/").data, "html.parser")
+    links = {a.get("href") for a in soup.find_all("a")}
+    assert "/posts/3/" in links
+    assert "/posts/1/" not in links
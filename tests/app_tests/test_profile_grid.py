@@ -0,0 +1,57 @@
+"""Check paging of the profile post grid."""
+import bs4
+import utils
+
+
+def grid(client, url):
+    """Return the postids in a grid page and its "load more" URL."""
+    response = client.get(url)
+    assert response.status_code == 200
+    soup = bs4.BeautifulSoup(response.data, "html.parser")
+    images = soup.select("a.thumbnail img")
+    assert all(img["loading"] == "lazy" for img in images)
+    postids = [int(a["href"].split("/")[2])
+               for a in soup.select("a.thumbnail")]
+    more = soup.select_one("a.load-more")
+    return postids, more["href"] if more else None
+
+
+def test_profile_grid_pages(client):
+    """The profile page shows one page of posts and links to the next."""
+    utils.login(client)
+    postids, url = grid(client, "/users/awdeorio/?limit=1")
+    assert postids == [3]
+    assert url == "/users/awdeorio/?before=3&limit=1"
+    postids, url = grid(client, url)
+    assert postids == [1]
+    assert url is None
+
+    assert grid(client, "/users/awdeorio/") == ([3, 1], None)
+    assert client.get("/users/awdeorio/?before=x").status_code == 400
+    assert client.get("/users/awdeorio/?limit=0").status_code == 400
+
+
+def test_profile_grid_fragment(client):
+    """The grid endpoint returns thumbnails alone, linking to itself."""
+    utils.login(client)
+    response = client.get("/users/awdeorio/posts/?limit=1")
+    assert b"<html" not in response.data
+    postids, url = grid(client, "/users/awdeorio/posts/?limit=1")
+    assert postids == [3]
+    assert url == "/users/awdeorio/posts/?before=3&limit=1"
+    assert grid(client, url) == ([1], None)
+    assert client.get("/users/nobody/posts/").status_code == 404
+
+
+def test_profile_grid_api(client):
+    """The API pages a user's posts the same way."""
+    utils.login(client)
+    user = client.get("/api/v1/users/awdeorio/?limit=1").get_json()
+    assert [post["postid"] for post in user["posts"]] == [3]
+    assert user["total_posts"] == 2
+    assert user["next_posts"] == \
+        "/api/v1/users/awdeorio/posts/?before=3&limit=1"
+
+    page = client.get(user["next_posts"]).get_json()
+    assert [post["postid"] for post in page["posts"]] == [1]
+    assert page["next"] is None
@@ -0,0 +1,54 @@
+"""Check the named query catalog and its statistics."""
+import sqlite3
+import insta4288
+
+
+def test_catalog_compiles():
+    """Every catalog statement compiles against the current schema."""
+    connection = sqlite3.connect("var/insta4288.sqlite3")
+    for sql in insta4288.queries.SQL.values():
+        connection.execute(f"EXPLAIN {sql}", (None,) * sql.count("?"))
+    connection.close()
+
+
+def test_stats_endpoint(client):
+    """Per-query counters are reported at /debug/stats/."""
+    insta4288.app.config["STATS_ENDPOINT"] = True
+    insta4288.queries.reset_stats()
+    response = client.post(
+        "/accounts/",
+        data={
+            "username": "awdeorio",
+            "password": "chickens",
+            "operation": "login"
+        },
+    )
+    assert response.status_code == 302
+    assert client.get("/").status_code == 200
+    assert client.get("/").status_code == 200
+
+    response = client.get("/debug/stats/")
+    insta4288.app.config["STATS_ENDPOINT"] = False
+    assert response.status_code == 200
+    queries = response.get_json()["queries"]
+    assert queries["feed_timeline_ids"]["calls"] == 1
+    assert queries["feed_posts_by_id"]["calls"] == 2
+    assert queries["feed_posts_by_id"]["rows"] == 6
+    assert queries["feed_comments"]["calls"] == 2
+    assert queries["account_password"]["calls"] == 1
+    assert "user_posts" not in queries
+    assert response.get_json()["pool"]["read"]["checkouts"] >= 2
+
+
+def test_stats_endpoint_disabled(client):
+    """The stats endpoint is hidden unless enabled."""
+    response = client.post(
+        "/accounts/",
+        data={
+            "username": "awdeorio",
+            "password": "chickens",
+            "operation": "login"
+        },
+    )
+    assert response.status_code == 302
+    assert client.get("/debug/stats/").status_code == 404
@@ -0,0 +1,66 @@
+"""Check the ranked feed."""
+import bs4
+import numpy as np
+import utils
+from insta4288 import ranking
+
+WEIGHTS = {'likes': 1.0, 'comments': 1.5, 'affinity': 2.0}
+NOW = 1_700_000_000
+
+
+def candidates(*rows):
+    """Return a CANDIDATE array from (postid, age in hours, ...) rows."""
+    return np.array([
+        (postid, NOW - age * 3600, likes, comments, affinity)
+        for postid, age, likes, comments, affinity in rows
+    ], dtype=ranking.CANDIDATE)
+
+
+def rank(array, offset=0, limit=10):
+    """Return the ranked postids of a candidate array."""
+    scores = ranking.score(array, NOW, 24.0, WEIGHTS)
+    return ranking.top(array["postid"], scores, offset, limit)
+
+
+def test_score_terms():
+    """Recency, engagement and affinity each raise a post's rank."""
+    assert rank(candidates((1, 48, 0, 0, 0), (2, 1, 0, 0, 0))) == [2, 1]
+    assert rank(candidates((1, 2, 50, 5, 0), (2, 1, 0, 0, 0))) == [1, 2]
+    assert rank(candidates((1, 2, 0, 0, 9), (2, 1, 0, 0, 0))) == [1, 2]
+
+    # A day's age halves the score
+    array = candidates((1, 0, 0, 0, 0), (2, 24, 0, 0, 0))
+    scores = ranking.score(array, NOW, 24.0, WEIGHTS)
+    assert np.allclose(scores, [1.0, 0.5])
+
+
+def test_top_pages_and_ties():
+    """Pages cut the ranking in order; equal scores put newer posts first."""
+    array = candidates(*[(postid, 0, 0, 0, 0) for postid in range(1, 8)])
+    assert rank(array, 0, 3) == [7, 6, 5]
+    assert rank(array, 3, 3) == [4, 3, 2]
+    assert rank(array, 6, 3) == [1]
+    assert rank(array, 9, 3) == []
+
+
+def test_ranked_feed(client):
+    """?ranked=1 ranks the feed and pages it by offset."""
+    utils.login(client)
+    response = client.get("/?ranked=1&limit=2")
+    assert response.status_code == 200
+    soup = bs4.BeautifulSoup(response.data, "html.parser")
+    links = [a["href"] for a in soup.select("a.timestamp")]
+    assert links == ["/posts/2/", "/posts/1/"]
+    next_url = soup.select_one("a.load-more")["href"]
+    assert next_url == "/?offset=2&ranked=1&limit=2"
+
+    soup = bs4.BeautifulSoup(client.get(next_url).data, "html.parser")
+    assert [a["href"] for a in soup.select("a.timestamp")] == ["/posts/3/"]
+
+    # The chronological feed is unchanged
+    soup = bs4.BeautifulSoup(client.get("/?ranked=0").data, "html.parser")
+    links = [a["href"] for a in soup.select("a.timestamp")]
+    assert links == ["/posts/3/", "/posts/2/", "/posts/1/"]
+
+    assert client.get("/?ranked=yes").status_code == 400
+    assert client.get("/?ranked=1&offset=-1").status_code == 400
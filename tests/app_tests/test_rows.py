@@ -0,0 +1,74 @@
+"""Check the cached record row factory."""
+import json
+import sqlite3
+import flask
+import pytest
+import insta4288
+from insta4288.rows import RecordFactory
+
+
+@pytest.fixture(name="connection")
+def connection_setup():
+    """Return an in-memory connection using a fresh RecordFactory."""
+    connection = sqlite3.connect(":memory:")
+    connection.row_factory = RecordFactory()
+    yield connection
+    connection.close()
+
+
+def test_attribute_and_mapping_access(connection):
+    """Records behave like the dicts they replace."""
+    row = connection.execute(
+        "SELECT 1 AS postid, 'awdeorio' AS owner, 7 AS likes"
+    ).fetchone()
+    assert row.postid == 1
+    assert row["owner"] == "awdeorio"
+    assert dict(row) == {"postid": 1, "owner": "awdeorio", "likes": 7}
+    assert "likes" in row
+    assert "comments" not in row
+    assert row.get("comments", []) == []
+    with pytest.raises(KeyError):
+        _ = row["comments"]
+
+
+def test_derived_values(connection):
+    """Views can attach derived values but not overwrite columns."""
+    row = connection.execute("SELECT 1 AS postid").fetchone()
+    row["comments"] = []
+    assert row.comments == []
+    assert list(row.keys()) == ["postid", "comments"]
+    with pytest.raises(TypeError):
+        row["postid"] = 2
+
+
+def test_odd_column_names(connection):
+    """Non-identifier and duplicate column names resolve like a dict."""
+    row = connection.execute("SELECT 1, 2 AS a, 3 AS a").fetchone()
+    assert row["1"] == 1
+    assert row["a"] == 3
+    assert dict(row) == {"1": 1, "a": 3}
+
+
+def test_class_cached_per_layout(connection):
+    """One class is built per distinct column layout."""
+    factory = connection.row_factory
+    first = connection.execute("SELECT 1 AS a UNION SELECT 2").fetchall()
+    second = connection.execute("SELECT 3 AS a").fetchall()
+    other = connection.execute("SELECT 4 AS b").fetchone()
+    assert type(first[0]) is type(first[1]) is type(second[0])
+    assert type(other) is not type(first[0])
+    assert factory.cached_layouts() == [("a",), ("b",)]
+
+
+def test_rows_are_not_sequences(connection):
+    """Records iterate and serialize like dicts, never as bare keys."""
+    row = connection.execute("SELECT 1 AS a, 2 AS b").fetchone()
+    assert list(row) == ["a", "b"]
+    assert len(row) == 2
+    assert row == {"a": 1, "b": 2}
+    assert not isinstance(row, tuple)
+    with pytest.raises(TypeError):
+        json.dumps(row)
+    with insta4288.app.app_context():
+        assert flask.json.loads(flask.jsonify(row).data) == {"a": 1, "b": 2}
+        assert flask.json.dumps([row]) == '[{"a": 1, "b": 2}]'
@@ -0,0 +1,94 @@
+"""Check streamed page rendering."""
+import sqlite3
+import pytest
+import utils
+import insta4288
+
+
+@pytest.mark.parametrize("url", [
+    "/?limit=2",
+    "/users/awdeorio/followers/",
+    "/users/michjc/following/",
+])
+def test_streamed_pages_match_buffered(client, monkeypatch, url):
+    """A streamed page has the same HTML as the buffered one."""
+    utils.login(client)
+    buffered = client.get(url)
+    assert "Content-Length" in buffered.headers
+
+    monkeypatch.setitem(insta4288.app.config, "STREAM_TEMPLATES", True)
+    streamed = client.get(url)
+    assert streamed.status_code == 200
+    assert "Content-Length" not in streamed.headers
+    assert streamed.data == buffered.data
+
+
+@pytest.mark.parametrize("url", [
+    "/users/awdeorio/followers/",
+    "/users/michjc/following/",
+])
+def test_streamed_pages_unpooled(client, monkeypatch, url):
+    """Streams keep their connection when connections are not pooled."""
+    monkeypatch.setitem(insta4288.app.config, "DB_POOL_SIZE", 0)
+    utils.login(client)
+    buffered = client.get(url)
+    monkeypatch.setitem(insta4288.app.config, "STREAM_TEMPLATES", True)
+    streamed = client.get(url)
+    assert streamed.status_code == 200
+    assert streamed.data == buffered.data
+
+
+def test_stream_holds_its_connection(client, monkeypatch):
+    """A streamed list reads through a connection checked out until closed."""
+    monkeypatch.setitem(insta4288.app.config, "STREAM_TEMPLATES", True)
+    utils.login(client)
+    response = client.get("/users/awdeorio/followers/", buffered=False)
+    chunks = iter(response.response)
+    next(chunks)
+    assert insta4288.model.pool_stats()["read"]["in_use"] == 1
+    b"".join(chunks)
+    response.close()
+    assert insta4288.model.pool_stats()["read"]["in_use"] == 0
+
+
+def test_buffered_page_reads_before_rendering(client, monkeypatch):
+    """Buffered pages read their rows before the template renders."""
+    utils.login(client)
+    in_use = []
+    render = insta4288.views.streaming.flask.render_template
+
+    def spy(template_name, **context):
+        in_use.append(insta4288.model.pool_stats()["read"]["in_use"])
+        assert isinstance(context["followers"], list)
+        return render(template_name, **context)
+
+    monkeypatch.setattr(
+        insta4288.views.streaming.flask, "render_template", spy
+    )
+    assert client.get("/users/awdeorio/followers/").status_code == 200
+    assert in_use == [0]
+
+
+def test_streamed_page_missing_user(client, monkeypatch):
+    """A missing user is still a 404 when the list would be streamed."""
+    monkeypatch.setitem(insta4288.app.config, "STREAM_TEMPLATES", True)
+    utils.login(client)
+    assert client.get("/users/nobody/followers/").status_code == 404
+    assert client.get("/users/nobody/following/").status_code == 404
+
+
+def test_iterate_reads_lazily(monkeypatch):
+    """iterate() fetches in batches and records the call when stopped."""
+    monkeypatch.setattr(insta4288.queries, "ITERATE_BATCH", 2)
+    insta4288.queries.reset_stats()
+    connection = sqlite3.connect("var/insta4288.sqlite3")
+    connection.row_factory = sqlite3.Row
+    rows = insta4288.queries.iterate(
+        connection, "user_followers", ("jag", "michjc", "", "", "", 10)
+    )
+    assert next(rows)["username"] == "awdeorio"
+    assert insta4288.queries.stats().get("user_followers") is None
+
+    rows.close()
+    assert insta4288.queries.stats()["user_followers"]["rows"] == 2
+    connection.close()
@@ -0,0 +1,60 @@
+"""Check relative timestamps against arrow."""
+import datetime
+import arrow
+import bs4
+import pytest
+import insta4288
+from insta4288.timestamps import humanize
+
+CREATED = "2024-03-31 12:00:00"
+EPOCH = arrow.get(CREATED).timestamp()
+
+
+@pytest.mark.parametrize("age", [
+    0, 9, 10, 44, 45, 59, 60, 89, 90, 119, 120, 2699, 3599, 3600, 5400,
+    7199, 7200, 79199, 86399, 86400, 129600, 172799, 172800, 604799,
+    2 * 365 * 86400, 5 * 365 * 86400 + 7, -5, -30, -7200, -3 * 86400,
+])
+def test_humanize_matches_arrow(age):
+    """Ages under a week and over two years read as arrow words them."""
+    for fraction in (0.0, 0.4, 0.6):
+        now = EPOCH + age + fraction
+        expected = arrow.get(CREATED).humanize(
+            arrow.get(now).datetime
+        )
+        assert humanize(CREATED, now) == expected
+
+
+@pytest.mark.parametrize("days, expected", [
+    (8, "a week ago"),
+    (13, "a week ago"),
+    (14, "2 weeks ago"),
+    (15, "a month ago"),
+    (44, "a month ago"),
+    (45, "2 months ago"),
+    (200, "7 months ago"),
+    (364, "12 months ago"),
+    (365, "a year ago"),
+])
+def test_humanize_calendar_months(days, expected):
+    """Gaps of a week or more count calendar months, from March 31."""
+    assert humanize(CREATED, EPOCH + days * 86400) == expected
+
+
+def test_time_element(client, monkeypatch):
+    """Feed timestamps carry their UTC time in a <time> element."""
+    response = client.post("/accounts/", data={
+        "username": "awdeorio", "password": "chickens", "operation": "login",
+    })
+    assert response.status_code == 302
+
+    soup = bs4.BeautifulSoup(client.get("/").data, "html.parser")
+    times = soup.select("a.timestamp time")
+    assert [t.get_text() for t in times] == ["just now"] * 3
+    created = datetime.datetime.fromisoformat(times[0]["datetime"])
+    assert created.tzinfo == datetime.timezone.utc
+
+    monkeypatch.setitem(insta4288.app.config, "TIMESTAMP_ELEMENT", False)
+    soup = bs4.BeautifulSoup(client.get("/posts/1/").data, "html.parser")
+    assert soup.select_one("a.timestamp").get_text() == "just now"
+    assert soup.select_one("a.timestamp time") is None
@@ -0,0 +1,127 @@
+"""Check transaction scopes and the SQLITE_BUSY retry policy."""
+import pathlib
+import sqlite3
+import threading
+import pytest
+import utils
+import insta4288
+from insta4288.transactions import DatabaseBusy, begin
+
+
+def test_begin_retries_until_lock_released(tmp_path):
+    """BEGIN IMMEDIATE is retried while another connection writes."""
+    db_path = tmp_path / "busy.sqlite3"
+    holder = sqlite3.connect(db_path, check_same_thread=False)
+    holder.execute("CREATE TABLE t(x)")
+    holder.commit()
+    holder.execute("BEGIN IMMEDIATE")
+    waiter = sqlite3.connect(db_path, timeout=0)
+
+    timer = threading.Timer(0.1, holder.commit)
+    timer.start()
+    retries = begin(waiter, immediate=True, policy=(5.0, 0.005, 0.02))
+    timer.join()
+    assert retries > 0
+    assert waiter.in_transaction
+    waiter.rollback()
+
+    holder.execute("BEGIN IMMEDIATE")
+    with pytest.raises(DatabaseBusy):
+        begin(waiter, immediate=True, policy=(0.05, 0.005, 0.02))
+    assert not waiter.in_transaction
+
+
+def test_scopes_end_their_transactions(client):
+    """Scopes are closed by the time the view renders."""
+    utils.login(client)
+    with insta4288.app.test_request_context("/"):
+        with insta4288.model.read_scope() as reader:
+            assert reader.in_transaction
+        assert not reader.in_transaction
+
+        with pytest.raises(RuntimeError):
+            with insta4288.model.write_scope() as writer:
+                writer.execute("DELETE FROM likes")
+                raise RuntimeError
+        assert not writer.in_transaction
+        assert insta4288.model.pool_stats()["write"]["in_use"] == 0
+        count = reader.execute("SELECT COUNT(*) AS n FROM likes").fetchone()
+        assert count.n > 0
+
+
+def test_locked_database_is_503(client, monkeypatch):
+    """A write that cannot get the lock in time is answered with 503."""
+    monkeypatch.setitem(
+        insta4288.app.config["SQLITE_PROFILE"], "busy_timeout", 0
+    )
+    monkeypatch.setitem(insta4288.app.config, "DB_BUSY_DEADLINE", 0.05)
+    utils.login(client)
+
+    holder = sqlite3.connect(insta4288.app.config["DATABASE_FILENAME"])
+    holder.execute("BEGIN IMMEDIATE")
+    response = client.post("/likes/", data={
+        "operation": "like", "postid": "4",
+    })
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    holder.rollback()
+    holder.close()
+    response = client.post("/likes/", data={
+        "operation": "like", "postid": "4",
+    })
+    assert response.status_code == 302
+
+
+def test_writer_wait_timeout_is_503(client, monkeypatch):
+    """A write that cannot get the writer connection in time is a 503."""
+    monkeypatch.setitem(insta4288.app.config, "DB_WRITE_TIMEOUT", 0.05)
+    utils.login(client)
+    pool = insta4288.model.get_pools()["write"]
+    held = pool.checkout()
+    try:
+        response = client.post("/likes/", data={
+            "operation": "like", "postid": "4",
+        })
+    finally:
+        pool.checkin(held)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_group_commit_timeout_is_503(client, monkeypatch):
+    """A batched write that is not durable in time is a 503."""
+    utils.login(client)
+    monkeypatch.setitem(insta4288.app.config, "GROUP_COMMIT", True)
+    monkeypatch.setitem(insta4288.app.config, "DB_WRITE_TIMEOUT", 0.05)
+    pool = insta4288.model.get_pools()["write"]
+    held = pool.checkout()
+    try:
+        response = client.post("/likes/", data={
+            "operation": "like", "postid": "4",
+        })
+    finally:
+        pool.checkin(held)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    # The queued like still commits, ahead of later writes
+    monkeypatch.setitem(insta4288.app.config, "DB_WRITE_TIMEOUT", 10.0)
+    response = client.post("/likes/", data={
+        "operation": "like", "postid": "4",
+    })
+    assert response.status_code == 409
+
+
+def test_rejected_upload_is_removed(client):
+    """Uploads saved before a write that is rejected are deleted again."""
+    uploads = pathlib.Path(insta4288.app.config["UPLOAD_FOLDER"])
+    before = set(uploads.iterdir())
+    with (utils.TEST_DIR/"testdata/fox.jpg").open("rb") as avatar:
+        response = client.post("/accounts/", data={
+            "username": "awdeorio", "fullname": "Fake User",
+            "email": "fakeuser@umich.edu", "password": "password",
+            "file": avatar, "operation": "create",
+        })
+    assert response.status_code == 409
+    assert set(uploads.iterdir()) == before
@@ -1,6 +1,26 @@
 """P2 test suite utility functions."""
 import pathlib
+import re
 
 
 # Directory containing unit tests
 TEST_DIR = pathlib.Path(__file__).parent
+
+
+def login(client, username="awdeorio", password="chickens"):
+    """Log in as username."""
+    response = client.post(
+        "/accounts/",
+        data={
+            "username": username,
+            "password": password,
+            "operation": "login"
+        },
+    )
+    assert response.status_code == 302
+
+
+def query_count(response):
+    """Return the number of queries a response ran, from Server-Timing."""
+    timing = response.headers.getlist("Server-Timing")[0]
+    return int(re.search(r'desc="(\d+) queries', timing).group(1))